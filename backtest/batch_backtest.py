@@ -1,40 +1,17 @@
 """沪深300批量回测"""
-import backtrader as bt
-import pandas as pd
-import csv
+from backtest.parallel import backtest_frame, print_download_report, run_symbols, temporary_panel
 from data.data_loader import AShareDataLoader
+from data.universe import default_registry
 
 # 策略
-from strategy.martingale import MartingaleStrategy, MartingaleV2Strategy
+from strategy.dual_ma import DualMAStrategy
+from strategy.martingale import MartingaleStrategy
 
-
-class DualMAStrategy(bt.Strategy):
-    params = dict(fast=5, slow=20)
-    
-    def __init__(self):
-        self.fast = bt.indicators.SimpleMovingAverage(self.data.close, period=self.params.fast)
-        self.slow = bt.indicators.SimpleMovingAverage(self.data.close, period=self.params.slow)
-        
-    def next(self):
-        if len(self.data) < self.params.slow + 5:
-            return
-            
-        fast_now = self.fast[0]
-        slow_now = self.slow[0]
-        fast_prev = self.fast[-1]
-        slow_prev = self.slow[-1]
-        
-        if fast_now > slow_now and fast_prev <= slow_prev:
-            if not self.position:
-                price = self.data.close[0]
-                if price > 0:
-                    size = int(self.broker.getcash() * 0.95 / price / 100) * 100
-                    if size >= 100:
-                        self.buy(size=size)
-                    
-        elif fast_now < slow_now and fast_prev >= slow_prev:
-            if self.position:
-                self.close()
+# 结果键 -> (显示名, 策略类)
+STRATEGIES = {
+    'dual_ma': ("双均线", DualMAStrategy),
+    'martingale': ("马丁", MartingaleStrategy),
+}
 
 
 def run_backtest(code, name, strategy_class, params=None, start_date="2023-01-01"):
@@ -45,87 +22,57 @@ def run_backtest(code, name, strategy_class, params=None, start_date="2023-01-01
     if df is None or len(df) < 100:
         return None
     
-    df = df[df['date'] >= start_date][['date','open','high','low','close','volume']]
+    df = df[df['date'] >= start_date].reset_index(drop=True)
     if len(df) < 100:
         return None
-        
-    df = df.set_index('date')
-    
-    cerebro = bt.Cerebro()
-    if params:
-        cerebro.addstrategy(strategy_class, **params)
-    else:
-        cerebro.addstrategy(strategy_class)
     
-    cerebro.adddata(bt.feeds.PandasData(dataname=df))
-    cerebro.broker.setcash(1000000)
-    cerebro.broker.setcommission(commission=0.001)
-    
-    initial = cerebro.broker.getcash()
-    cerebro.run()
-    final = cerebro.broker.getvalue()
-    
-    return (final - initial) / initial * 100
+    return backtest_frame(code, df, strategy_class, params or {})
 
 
 def load_hs300_stocks():
-    """加载沪深300股票列表"""
-    stocks = []
-    try:
-        with open('data/hs300_stocks.csv', 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                stocks.append((row['code'], row['name']))
-    except FileNotFoundError:
-        print("未找到hs300_stocks.csv，使用默认股票列表")
-        stocks = [
-            ("600519", "贵州茅台"),
-            ("600036", "招商银行"),
-            ("601318", "中国平安"),
-            ("600900", "长江电力"),
-            ("000333", "美的集团"),
-        ]
-    return stocks
+    """加载沪深300股票列表（已去重）"""
+    return default_registry().stocks("HS300")
 
 
-def main():
+def main(universe="HS300", limit=50, workers=None):
+    """批量回测，universe 为股票池名称（HS300 / HS300_CORE / CSI300 / CSI500 / ALL）"""
     print("="*60)
-    print("沪深300批量回测")
+    print(f"{universe}批量回测")
     print("="*60)
     
-    stocks = load_hs300_stocks()
+    loader = AShareDataLoader()
+    stocks = default_registry().attach_loader(loader).stocks(universe)[:limit]
+    names = dict(stocks)
     print(f"共{len(stocks)}只股票\n")
     
-    results = {
-        'dual_ma': [],
-        'martingale': [],
-    }
+    results = {key: [] for key in STRATEGIES}
+    keys = {strategy_class: key for key, (_, strategy_class) in STRATEGIES.items()}
+    strategies = [(strategy_class, {}) for _, strategy_class in STRATEGIES.values()]
     
-    # 回测双均线策略
-    print("--- 双均线策略(5,20) ---")
-    for i, (code, name) in enumerate(stocks[:50], 1):
-        print(f"[{i}/{len(stocks[:50])}] {code} {name}...", end=" ")
-        ret = run_backtest(code, name, DualMAStrategy)
-        if ret is not None:
-            results['dual_ma'].append((code, name, ret))
-            print(f"{ret:+.1f}%")
-        else:
-            print("数据不足")
+    # 并发下载写成面板；每只股票读取一次、指标算一次，在一个任务中运行所有策略，结果按完成顺序输出
+    with temporary_panel(loader, list(names), "2023-01-01") as (panel, report):
+        print_download_report(report)
+        print()
+        if panel is None:
+            return results
+        
+        symbols = [code for code in names if code in panel]
+        for i, symbol_results in enumerate(run_symbols(panel, symbols, strategies, start="2023-01-01",
+                                                       workers=workers), 1):
+            for result in symbol_results:
+                code = result.job.symbol
+                key = keys[result.job.strategy]
+                label = f"[{i}/{len(symbols)}] {code} {names[code]} {STRATEGIES[key][0]}"
+                if result.error:
+                    print(f"{label} 失败: {result.error}")
+                elif result.ret is None:
+                    print(f"{label} 数据不足")
+                else:
+                    results[key].append((code, names[code], result.ret))
+                    print(f"{label} {result.ret:+.1f}%")
     
     print(f"\n完成双均线策略: {len(results['dual_ma'])}只")
-    
-    # 回测马丁策略
-    print("\n--- 马丁策略 ---")
-    for i, (code, name) in enumerate(stocks[:50], 1):
-        print(f"[{i}/{len(stocks[:50])}] {code} {name}...", end=" ")
-        ret = run_backtest(code, name, MartingaleStrategy)
-        if ret is not None:
-            results['martingale'].append((code, name, ret))
-            print(f"{ret:+.1f}%")
-        else:
-            print("数据不足")
-    
-    print(f"\n完成马丁策略: {len(results['martingale'])}只")
+    print(f"完成马丁策略: {len(results['martingale'])}只")
     
     # 输出排名
     print("\n" + "="*60)
@@ -0,0 +1,399 @@
+"""
+分层加仓策略的事件循环引擎：MartingaleStrategy、MartingaleConservative、
+DualMAWithMartingale、DualMAWithPyramid 对整个面板一次回测
+
+这些策略的加仓、均价、止盈止损依赖持仓路径，不能像信号策略那样只看信号位置
+（见 vector_engine），这里逐根K线推进，每一步对所有股票向量化：
+
+- LayerBroker 复刻 backtrader BackBroker 在本项目设置下的行为：市价单在下一根K线
+  开盘成交；提交时按下单收盘价、成交时按开盘价检查现金，不足则拒单（Margin）；
+  百分比佣金；加仓后持仓均价、账户价值的运算顺序与 backtrader 相同
+- 每个策略一个规则类，next() 与 notify() 逐句对应原策略（包括其特有的行为，
+  例如 MartingaleStrategy 的订单被拒后 pending_order 不再清空、之后不再交易；
+  双均线马丁/金字塔在成交回报里把均价改为成交价并再加一层）
+
+结果与 backtrader 逐笔成交一致，一致性检查见 backtest.parity。
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from backtest.vector_engine import BrokerConfig, VectorResult
+from strategy import kernels
+from strategy.dual_ma_martingale import DualMAWithMartingale, DualMAWithPyramid
+from strategy.feeds import strategy_params
+from strategy.martingale import MartingaleConservative, MartingaleStrategy
+
+
+class LayerBroker:
+    """向量化的 backtrader 经纪商子集，每列一个独立账户；每列同时最多一张待成交订单"""
+
+    def __init__(self, m: int, config: BrokerConfig):
+        self.config = config
+        self.cash = np.full(m, float(config.cash))
+        self.size = np.zeros(m, dtype=np.int64)
+        self.price = np.zeros(m)            # backtrader Position.price（成交价加权均价）
+        self.value = self.cash.copy()
+        self.order = np.zeros(m, dtype=np.int64)    # 待成交订单：>0 买入股数，<0 卖出股数
+        self.created = np.zeros(m)                  # 下单时的收盘价
+        self.fills = []
+
+    def submit(self, cols: np.ndarray, size: np.ndarray, close: np.ndarray):
+        self.order[cols] = size
+        self.created[cols] = close[cols]
+
+    def execute(self, i: int, open_: np.ndarray, live: np.ndarray):
+        """以开盘价撮合上一根K线的订单，返回 (买入成交, 卖出成交)"""
+        order = np.where(live, self.order, 0)
+        self.order[:] = 0
+        buy, sell = order > 0, order < 0
+        if not (buy.any() or sell.any()):
+            return buy, sell
+        comm = self.config.commission
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # 提交时按下单价预演，成交时按开盘价扣款，任一步现金为负都拒单
+            submitted = self.cash - order * self.created - order * comm * self.created
+            after = self.cash - order * open_ - order * comm * open_
+            bought = buy & (submitted >= 0.0) & (after >= 0.0)
+            new_size = self.size + order
+            avg = np.where(self.size == 0, open_, (self.price * self.size + order * open_) / new_size)
+
+            qty = -order
+            proceeds = self.cash + (qty * self.price + qty * (open_ - self.price) * 1.0) - qty * comm * open_
+
+        for mask in (bought, sell):
+            if mask.any():
+                cols = np.flatnonzero(mask)
+                self.fills.append((cols, i, order[cols], open_[cols], np.abs(order[cols]) * comm * open_[cols]))
+        self.cash = np.where(bought, after, np.where(sell, proceeds, self.cash))
+        self.price = np.where(bought, avg, np.where(sell, 0.0, self.price))
+        self.size = np.where(bought | sell, new_size, self.size)
+        return bought, sell
+
+    def mark(self, close: np.ndarray, live: np.ndarray):
+        """按收盘价计算账户价值（与 backtrader 的运算顺序相同）"""
+        unrealized = self.size * (close - self.price) * 1.0
+        value = self.cash + ((self.size * close - unrealized) / 1.0 + unrealized)
+        self.value = np.where(live, value, self.value)
+
+
+class MartingaleRules:
+    """MartingaleStrategy：亏损到阈值按当前持仓量加倍，盈利到阈值全部卖出，超过层数止损"""
+
+    def __init__(self, p: dict, close: np.ndarray):
+        m = close.shape[1]
+        self.p = p
+        self.close = close
+        self.buy_price = np.zeros(m)
+        self.layers = np.zeros(m, dtype=np.int64)
+        self.pending = np.zeros(m, dtype=bool)
+
+    def notify(self, bought, sold, price):
+        # 只有成交才清空 pending_order；被拒的订单不会清空，之后不再交易
+        self.pending &= ~(bought | sold)
+
+    def next(self, i: int, broker: LayerBroker, live: np.ndarray):
+        p, close = self.p, self.close[i]
+        active = live & ~self.pending & (close > 0)
+        pos = broker.size > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pnl = np.where(pos, (close - self.buy_price) / self.buy_price, 0.0)
+
+        take = active & pos & (pnl >= p["take_profit_rate"])
+        self._close(take, broker, close)
+        active &= ~take
+
+        losing = active & pos & (pnl < p["max_loss_rate"])
+        can_add = losing & (self.layers < p["max_layers"])
+        available = broker.value - broker.size * close
+        new_size = broker.size
+        add = can_add & (new_size * close < available * 0.95)
+        cols = np.flatnonzero(add)
+        if len(cols):
+            broker.submit(cols, new_size[cols], close)
+            size = broker.size[cols]
+            self.buy_price[cols] = (self.buy_price[cols] * size + close[cols] * new_size[cols]) / (size + new_size[cols])
+            self.layers[cols] += 1
+            self.pending[cols] = True
+        self._close(losing & ~can_add, broker, close)
+        active &= ~losing
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            size = np.where(active, broker.cash * p["initial_pct"] / close / 100, 0).astype(np.int64) * 100
+        cols = np.flatnonzero(active & ~pos & (self.layers == 0) & (size >= 100))
+        if len(cols):
+            broker.submit(cols, size[cols], close)
+            self.buy_price[cols] = close[cols]
+            self.layers[cols] = 1
+            self.pending[cols] = True
+
+    def _close(self, mask, broker, close):
+        cols = np.flatnonzero(mask)
+        if len(cols):
+            broker.submit(cols, -broker.size[cols], close)
+            self.buy_price[cols] = 0
+            self.layers[cols] = 0
+            self.pending[cols] = True
+
+
+class MartingaleConservativeRules(MartingaleRules):
+    """
+    MartingaleConservative：亏损超过止损线时按现金比例加仓（最多 3 层），否则止损；盈利到阈值卖出
+
+    原策略只处理已有持仓，没有建仓逻辑，因此不会产生任何交易；这里照原样保留。
+    """
+
+    def next(self, i: int, broker: LayerBroker, live: np.ndarray):
+        p, close = self.p, self.close[i]
+        pos = broker.size > 0
+        active = live & ~self.pending & (close > 0) & pos
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pnl = np.where(active, (close - self.buy_price) / self.buy_price, 0.0)
+
+        take = active & (pnl >= p["take_profit"])
+        self._close(take, broker, close)
+        active &= ~take
+
+        losing = active & (pnl < p["stop_loss"])
+        can_add = losing & (self.layers < 3)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            size = np.where(can_add, broker.cash * p["add_pct"] / close / 100, 0).astype(np.int64) * 100
+        cols = np.flatnonzero(can_add & (size >= 100))
+        if len(cols):
+            broker.submit(cols, size[cols], close)
+            held = broker.size[cols]
+            self.buy_price[cols] = (self.buy_price[cols] * held + close[cols] * size[cols]) / (held + size[cols])
+            self.layers[cols] += 1
+            self.pending[cols] = True
+        self._close(losing & ~can_add, broker, close)
+
+
+class DualMAWithMartingaleRules:
+    """
+    DualMAWithMartingale：金叉建仓，亏损到阈值按持仓量加倍，止盈/止损/层数超限/死叉卖出
+
+    与原策略相同，任何订单回报都会清空 self.order（下一根K线不会被挡住）；
+    买单成交时均价改为该笔成交价、层数再加 1。
+    """
+
+    def __init__(self, p: dict, close: np.ndarray):
+        m = close.shape[1]
+        self.p = p
+        self.close = close
+        # 均线周期可以每列不同（见 run_params），相同周期的列一起计算
+        fast, slow = (np.broadcast_to(p[key], m) for key in ("fast_period", "slow_period"))
+        self.sign = np.empty(close.shape)
+        for f, s in set(zip(fast.tolist(), slow.tolist())):
+            cols = (fast == f) & (slow == s)
+            self.sign[:, cols] = kernels.sma_sign(close[:, cols], f, s)
+        self.warm = slow + 5    # len(self) 达到 slow_period + 5 后才判断金叉
+        self.avg_price = np.zeros(m)
+        self.layers = np.zeros(m, dtype=np.int64)
+        self.prev_cross = np.zeros(m, dtype=np.int64)
+
+    def notify(self, bought, sold, price):
+        self.avg_price = np.where(bought, price, self.avg_price)
+        self.layers += bought
+
+    def _exits(self, i, broker, close, active, pos, pnl):
+        """止盈、止损、死叉；返回仍需继续判断的列"""
+        p = self.p
+        take = active & pos & (pnl >= p["martingale_profit"])
+        stop = active & pos & ~take & ((pnl < p["stop_loss"]) | (self.layers > p["martingale_layers"]))
+        self._close(take | stop, broker, close)
+        active &= ~(take | stop)
+
+        with np.errstate(invalid="ignore"):
+            death = active & pos & (self.prev_cross > 0) & (self.sign[i] <= 0)
+        self._close(death, broker, close)
+        self.prev_cross[death] = 0
+        return active & ~death
+
+    def _entries(self, i, broker, close, active, pos):
+        """空仓时金叉按 90% 现金建仓；返回仍需继续判断的列"""
+        flat = active & ~pos
+        if i >= 1:
+            with np.errstate(invalid="ignore"):
+                golden = flat & (i + 1 >= self.warm) & (self.sign[i] > 0) & (self.sign[i - 1] <= 0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                size = np.where(golden, broker.cash * 0.9 / close / 100, 0).astype(np.int64) * 100
+            cols = np.flatnonzero(golden & (size >= 100))
+            if len(cols):
+                broker.submit(cols, size[cols], close)
+                self.avg_price[cols] = close[cols]
+                self.layers[cols] = 1
+                self.prev_cross[cols] = 1
+        return active & ~flat
+
+    def next(self, i: int, broker: LayerBroker, live: np.ndarray):
+        p, close = self.p, self.close[i]
+        pos = broker.size > 0
+        active = live & (close > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pnl = np.where(pos & (self.avg_price > 0), (close - self.avg_price) / self.avg_price, 0.0)
+        active = self._exits(i, broker, close, active, pos, pnl)
+        active = self._entries(i, broker, close, active, pos)
+
+        add = active & pos & (pnl < p["martingale_loss"]) & (self.layers < p["martingale_layers"])
+        new_size = broker.size
+        cols = np.flatnonzero(add & (new_size * close < broker.cash * 0.9))
+        if len(cols):
+            broker.submit(cols, new_size[cols], close)
+            held = broker.size[cols]
+            total = held + new_size[cols]
+            self.avg_price[cols] = (self.avg_price[cols] * held + close[cols] * new_size[cols]) / total
+            self.layers[cols] += 1
+
+    def _close(self, mask, broker, close):
+        cols = np.flatnonzero(mask)
+        if len(cols):
+            broker.submit(cols, -broker.size[cols], close)
+            self.avg_price[cols] = 0
+            self.layers[cols] = 0
+
+
+class DualMAWithPyramidRules(DualMAWithMartingaleRules):
+    """DualMAWithPyramid：金叉建仓，下跌 5% 按现金比例加仓（最多 max_adds 次），止盈/止损/死叉卖出"""
+
+    def __init__(self, p: dict, close: np.ndarray):
+        super().__init__(p, close)
+        self.add_count = self.layers    # 同一个数组：建仓、成交回报、清仓对层数的处理与父类相同
+
+    def _exits(self, i, broker, close, active, pos, pnl):
+        p = self.p
+        take = active & pos & (pnl >= p["take_profit"])
+        stop = active & pos & ~take & (pnl < p["stop_loss"])
+        self._close(take | stop, broker, close)
+        active &= ~(take | stop)
+
+        with np.errstate(invalid="ignore"):
+            death = active & pos & (self.prev_cross > 0) & (self.sign[i] <= 0)
+        self._close(death, broker, close)
+        self.prev_cross[death] = 0
+        return active & ~death
+
+    def next(self, i: int, broker: LayerBroker, live: np.ndarray):
+        p, close = self.p, self.close[i]
+        pos = broker.size > 0
+        active = live & (close > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pnl = np.where(pos & (self.avg_price > 0), (close - self.avg_price) / self.avg_price, 0.0)
+        active = self._exits(i, broker, close, active, pos, pnl)
+        active = self._entries(i, broker, close, active, pos)
+
+        add = active & pos & (pnl < -0.05) & (self.add_count < p["max_adds"])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            size = np.where(add, broker.cash * p["add_pct"] / close / 100, 0).astype(np.int64) * 100
+        cols = np.flatnonzero(add & (size >= 100))
+        if len(cols):
+            broker.submit(cols, size[cols], close)
+            held = broker.size[cols]
+            total = held + size[cols]
+            self.avg_price[cols] = (self.avg_price[cols] * held + close[cols] * size[cols]) / total
+            self.add_count[cols] += 1
+
+
+# 策略类 -> 规则类
+LAYERED_RULES = {
+    MartingaleStrategy: MartingaleRules,
+    MartingaleConservative: MartingaleConservativeRules,
+    DualMAWithMartingale: DualMAWithMartingaleRules,
+    DualMAWithPyramid: DualMAWithPyramidRules,
+}
+
+
+def simulate(strategy_class, open_: np.ndarray, close: np.ndarray, params: dict | None = None,
+             config: BrokerConfig | None = None, counts: np.ndarray | None = None) -> VectorResult:
+    """
+    逐根K线运行分层策略，每一列是一只股票的独立账户
+
+    params 覆盖策略类的默认参数，取值也可以是每列一个的数组；counts 为每列有效K线数
+    （见 kernels.compact_columns）。
+    """
+    config = config or BrokerConfig()
+    open_, close = np.asarray(open_, dtype=float), np.asarray(close, dtype=float)
+    if close.ndim == 1:
+        open_, close = open_[:, None], close[:, None]
+    n, m = close.shape
+    counts = np.full(m, n) if counts is None else np.asarray(counts)
+
+    rules = LAYERED_RULES[strategy_class](strategy_params(strategy_class, params), close)
+    broker = LayerBroker(m, config)
+    equity = np.full((n, m), np.nan)
+    shares = np.zeros((n, m), dtype=np.int64)
+    for i in range(n):
+        live = i < counts
+        if broker.order.any():
+            bought, sold = broker.execute(i, open_[i], live)
+            rules.notify(bought, sold, open_[i])
+        broker.mark(close[i], live)
+        equity[i] = np.where(live, broker.value, np.nan)
+        shares[i] = np.where(live, broker.size, 0)
+        rules.next(i, broker, live)
+
+    if broker.fills:
+        cols, rows, sizes, prices, comms = zip(*broker.fills)
+        fills = pd.DataFrame({
+            "column": np.concatenate(cols),
+            "row": np.concatenate([np.full(len(c), r) for c, r in zip(cols, rows)]),
+            "size": np.concatenate(sizes),
+            "price": np.concatenate(prices),
+            "commission": np.concatenate(comms),
+        }).sort_values(["column", "row"], kind="stable", ignore_index=True)
+    else:
+        fills = pd.DataFrame(columns=["column", "row", "size", "price", "commission"])
+    return VectorResult(equity, shares, fills, float(config.cash))
+
+
+def run_frame(df: pd.DataFrame, strategy_class, params: dict | None = None,
+              config: BrokerConfig | None = None) -> VectorResult:
+    """单只股票日线 DataFrame（与传给 Cerebro 的数据相同）的回测"""
+    return simulate(strategy_class, df["open"].to_numpy(dtype=float), df["close"].to_numpy(dtype=float),
+                    params, config)
+
+
+def run_params(df: pd.DataFrame, strategy_class, param_sets, config: BrokerConfig | None = None) -> VectorResult:
+    """
+    单只股票上一次运行多组参数，结果的第 k 列对应 param_sets[k]
+
+    每组参数各占一列（各自独立的账户），与逐组调用 run_frame 的结果相同；
+    逐K线循环的开销与列数基本无关，参数扫描时比逐组运行快得多。
+    """
+    merged = [strategy_params(strategy_class, params) for params in param_sets]
+    params = {name: np.array([values[name] for values in merged]) for name in merged[0]}
+    open_, close = (np.repeat(df[field].to_numpy(dtype=float)[:, None], len(merged), axis=1)
+                    for field in ("open", "close"))
+    return simulate(strategy_class, open_, close, params, config)
+
+
+def run_panel(panel, strategy_class, params: dict | None = None, start=None, end=None,
+              config: BrokerConfig | None = None) -> tuple[pd.DataFrame, VectorResult]:
+    """
+    面板中所有股票一次回测，每只股票按 panel.frame(symbol, start, end) 的序列独立计算
+
+    返回值与 vector_engine.run_panel 相同。
+    """
+    rows = panel.date_slice(start, end)
+    close = np.asarray(panel["close"][rows])
+    order, counts = kernels.compact_columns(~np.isnan(close))
+    open_, close = (np.take_along_axis(np.asarray(panel[field][rows]), order, axis=0).astype(float)
+                    for field in ("open", "close"))
+    result = simulate(strategy_class, open_, close, params, config, counts)
+
+    fills = result.fills
+    sells = fills["column"].to_numpy(dtype=np.int64)[fills["size"].to_numpy() < 0] if len(fills) else []
+    summary = pd.DataFrame({
+        "symbol": panel.symbols,
+        "bars": counts,
+        "trades": np.bincount(sells, minlength=close.shape[1]),
+        "final_value": result.final_value,
+        "return": result.total_return,
+    })
+    if len(fills):
+        cols = fills["column"].to_numpy(dtype=np.int64)
+        fills["row"] = order[fills["row"].to_numpy(dtype=np.int64), cols] + rows.start
+    result.equity = kernels.scatter_columns(result.equity, order, counts)
+    result.shares = kernels.scatter_columns(result.shares, order, counts, fill=0)
+    return summary, result
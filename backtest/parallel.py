@@ -0,0 +1,293 @@
+"""
+多进程批量回测：(股票, 策略, 参数) 任务分发到进程池，结果按完成顺序逐个返回
+
+行情先写成内存映射面板（见 data.panel / AShareDataLoader.build_panel），工作进程启动时按路径
+打开同一面板，每个任务只从面板取出自己那只股票的序列，DataFrame 不经过进程间序列化；
+所有进程共享操作系统的页缓存，行情在内存中只有一份。任务之间没有共享状态，
+CPU 密集的回测随核数近似线性扩展。
+
+- run_jobs: 每个 (股票, 策略, 参数) 一个任务
+- run_symbols: 每只股票一个任务，行情与指标只准备一次，依次运行所有策略；
+  result_matrix 把结果整理成 股票 × 策略 的收益率矩阵
+
+面板的价格以 float64 存放，回测结果与直接使用日线 DataFrame 时相同。
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+import backtrader as bt
+import pandas as pd
+
+from data.data_loader import AShareDataLoader
+from data.panel import Panel
+from data.providers import get_provider
+from strategy.dual_ma import BreakoutStrategy, DualMAStrategy
+from strategy.dual_ma_martingale import DualMAWithMartingale, DualMAWithPyramid
+from strategy.feeds import SharedBars, cached_feed, shared_indicators
+from strategy.martingale import MartingaleConservative, MartingaleStrategy
+from strategy.supertrend import SupertrendStrategy
+from strategy.vegas import VegasTunnelStrategy
+
+# 策略注册表：任务中的策略名 -> backtrader 策略类
+STRATEGIES = {
+    "dual_ma": DualMAStrategy,
+    "breakout": BreakoutStrategy,
+    "martingale": MartingaleStrategy,
+    "martingale_conservative": MartingaleConservative,
+    "dual_ma_martingale": DualMAWithMartingale,
+    "dual_ma_pyramid": DualMAWithPyramid,
+    "supertrend": SupertrendStrategy,
+    "vegas": VegasTunnelStrategy,
+}
+
+
+def make_cerebro(feed, StrategyClass, params):
+    """一个数据源、一个策略的 Cerebro：100 万初始资金，0.1% 佣金"""
+    cerebro = bt.Cerebro()
+    cerebro.addstrategy(StrategyClass, **params)
+    cerebro.adddata(feed)
+    cerebro.broker.setcash(1000000)
+    cerebro.broker.setcommission(commission=0.001)
+    return cerebro
+
+
+def _total_return(cerebro) -> float:
+    initial = cerebro.broker.getcash()
+    cerebro.run()
+    return (cerebro.broker.getvalue() - initial) / initial * 100
+
+
+def build_cerebro(code, df, StrategyClass, params):
+    """一只股票、一个策略的 Cerebro：100 万初始资金，0.1% 佣金"""
+    # 均线从共享缓存读取，同一只股票的多个策略只计算一次
+    return make_cerebro(cached_feed(code, df, [StrategyClass], [params]), StrategyClass, params)
+
+
+def backtest_frame(code, df, StrategyClass, params):
+    """用 backtrader 回测一只股票的日线，返回总收益率（%）"""
+    return _total_return(build_cerebro(code, df, StrategyClass, params))
+
+
+def backtest_bars(bars: SharedBars, StrategyClass, params):
+    """在已准备好的 SharedBars 上回测，返回总收益率（%），与 backtest_frame 结果相同"""
+    return _total_return(make_cerebro(bars.feed(), StrategyClass, params))
+
+
+@dataclass
+class Job:
+    """
+    一个回测任务
+
+    strategy 为 STRATEGIES 中的名称、backtrader 策略类，或模块级函数 fn(df, **params) -> 收益率（%）；
+    类和函数按引用传给工作进程，必须能从模块导入。
+    """
+
+    symbol: str
+    strategy: str | type | Callable
+    params: dict = field(default_factory=dict)
+
+    @property
+    def strategy_name(self) -> str:
+        if isinstance(self.strategy, str):
+            return self.strategy
+        return self.strategy.__name__
+
+
+@dataclass
+class JobResult:
+    """任务结果；数据不足时 ret 为 None，出错时 error 为异常描述"""
+
+    job: Job
+    ret: float | None
+    bars: int
+    elapsed: float
+    error: str | None = None
+
+
+def resolve_strategy(strategy):
+    """策略名解析为注册表中的类，类和函数原样返回"""
+    if isinstance(strategy, str):
+        try:
+            return STRATEGIES[strategy]
+        except KeyError:
+            raise ValueError(f"未知策略: {strategy}，可选 {', '.join(STRATEGIES)}") from None
+    return strategy
+
+
+def strategy_label(strategy, params: dict | None = None) -> str:
+    """结果矩阵的列名，如 dual_ma(fast=5, slow=20)"""
+    name = strategy if isinstance(strategy, str) else strategy.__name__
+    if not params:
+        return name
+    return f"{name}({', '.join(f'{key}={value}' for key, value in params.items())})"
+
+
+def is_backtrader_strategy(strategy) -> bool:
+    return isinstance(strategy, type) and issubclass(strategy, bt.Strategy)
+
+
+def run_job(panel: Panel, job: Job, start=None, end=None, min_bars: int = 100) -> JobResult:
+    """在当前进程中执行一个任务"""
+    started = time.perf_counter()
+    try:
+        df = panel.frame(job.symbol, start, end)
+        if len(df) < min_bars:
+            return JobResult(job, None, len(df), time.perf_counter() - started)
+        strategy = resolve_strategy(job.strategy)
+        if is_backtrader_strategy(strategy):
+            ret = backtest_frame(job.symbol, df, strategy, job.params)
+        else:
+            ret = strategy(df, **job.params)
+        return JobResult(job, ret, len(df), time.perf_counter() - started)
+    except Exception as e:
+        return JobResult(job, None, 0, time.perf_counter() - started, f"{type(e).__name__}: {e}")
+
+
+def run_symbol(panel: Panel, symbol: str, strategies, start=None, end=None,
+               min_bars: int = 100) -> list[JobResult]:
+    """
+    一只股票上依次运行多个策略，strategies 为 [(策略, 参数字典)]
+
+    行情只从面板读取一次，所有策略需要的指标合并后只计算一次，数据源的准备
+    （SharedBars）也只做一次；每个策略仍在各自的 Cerebro 中独立回测。
+    """
+    jobs = [Job(symbol, strategy, dict(params or {})) for strategy, params in strategies]
+    started = time.perf_counter()
+    try:
+        df = panel.frame(symbol, start, end)
+        if len(df) < min_bars:
+            return [JobResult(job, None, len(df), time.perf_counter() - started) for job in jobs]
+        classes = [resolve_strategy(job.strategy) for job in jobs]
+        bt_jobs = [(cls, job.params) for cls, job in zip(classes, jobs) if is_backtrader_strategy(cls)]
+        bars = SharedBars(df, shared_indicators(symbol, df, *zip(*bt_jobs)) if bt_jobs else None)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        return [JobResult(job, None, 0, time.perf_counter() - started, error) for job in jobs]
+
+    results = []
+    for strategy, job in zip(classes, jobs):
+        try:
+            ret = backtest_bars(bars, strategy, job.params) if is_backtrader_strategy(strategy) else strategy(df, **job.params)
+            results.append(JobResult(job, ret, len(df), time.perf_counter() - started))
+        except Exception as e:
+            results.append(JobResult(job, None, len(df), time.perf_counter() - started, f"{type(e).__name__}: {e}"))
+        started = time.perf_counter()
+    return results
+
+
+# 工作进程内打开的面板（由 _init_worker 设置）
+_panel = None
+
+
+def _init_worker(root: str):
+    global _panel
+    _panel = Panel(root)
+
+
+def _call_in_worker(func, *args):
+    return func(_panel, *args)
+
+
+def map_panel(panel: Panel, func, tasks: list, workers: int | None = None):
+    """
+    func(panel, *task) 逐个执行，按完成顺序产出结果
+
+    func 必须是模块级函数；工作进程中的 panel 是按路径重新打开的同一面板。
+    workers 为 1 时在当前进程中执行。
+    """
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            yield func(panel, *task)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(str(panel.root),)) as pool:
+        queue = iter(tasks)
+        running = set()
+        while True:
+            for task in queue:
+                running.add(pool.submit(_call_in_worker, func, *task))
+                if len(running) >= workers * 4:
+                    break
+            if not running:
+                return
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def run_jobs(panel: Panel, jobs, start=None, end=None, min_bars: int = 100,
+             workers: int | None = None) -> Iterator[JobResult]:
+    """
+    并行执行任务，按完成顺序逐个产出 JobResult
+
+    workers 默认为 CPU 核数；为 1 时在当前进程中顺序执行（便于调试）。
+    同时在途的任务数限制为 workers 的 4 倍，任务很多时不会一次全部提交。
+    """
+    return map_panel(panel, run_job, [(job, start, end, min_bars) for job in jobs], workers)
+
+
+def run_symbols(panel: Panel, symbols, strategies, start=None, end=None, min_bars: int = 100,
+                workers: int | None = None) -> Iterator[list[JobResult]]:
+    """
+    每只股票一个任务（见 run_symbol），并行执行，按完成顺序逐只产出该股票所有策略的结果
+
+    数据读取与数据源准备的开销只与股票数成正比，与策略数无关。
+    """
+    strategies = [(strategy, dict(params or {})) for strategy, params in strategies]
+    return map_panel(panel, run_symbol, [(symbol, strategies, start, end, min_bars) for symbol in symbols], workers)
+
+
+def result_matrix(results) -> pd.DataFrame:
+    """JobResult（或按股票分组的列表）整理成 股票 × 策略 的收益率矩阵（%），没有结果为 NaN"""
+    rows = {}
+    for result in results:
+        for item in (result if isinstance(result, list) else [result]):
+            label = strategy_label(item.job.strategy, item.job.params)
+            rows.setdefault(item.job.symbol, {})[label] = item.ret
+    return pd.DataFrame.from_dict(rows, orient="index", dtype=float)
+
+
+def jobs_for(symbols, strategies) -> list[Job]:
+    """股票 × 策略 的任务列表，strategies 为 [(策略, 参数字典)]；同一只股票的任务相邻"""
+    return [Job(symbol, strategy, dict(params or {})) for symbol in symbols for strategy, params in strategies]
+
+
+@contextmanager
+def temporary_panel(loader, symbols, start, end=None):
+    """
+    下载（或读取缓存）股票日线写成临时面板，退出时删除
+
+    产出 (Panel, DownloadReport)；没有任何股票下载成功时 Panel 为 None（见 build_panel）。
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        panel, report = loader.build_panel(symbols, f"{tmp}/panel", start, end)
+        yield panel, report
+        del panel
+
+
+def cli_loader(provider=None) -> AShareDataLoader:
+    """
+    命令行脚本的数据加载器，provider 为数据源名称或实例，默认取环境变量 ASTOCK_PROVIDER（未设置时为 akshare）
+
+    离线数据源（假数据、夹具）不使用本地缓存、不限速，与 parity 相同。
+    """
+    provider = get_provider(provider) if provider is None or isinstance(provider, str) else provider
+    if provider.offline:
+        return AShareDataLoader(provider=provider, use_cache=False, rate_limit=0)
+    return AShareDataLoader(provider=provider)
+
+
+def print_download_report(report):
+    """打印下载汇总与每只失败股票的原因"""
+    print(f"数据下载: {report.summary()}")
+    for failure in report.failed:
+        print(f"  {failure.symbol}: {failure.error}")
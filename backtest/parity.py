@@ -0,0 +1,172 @@
+"""
+向量化回测与 backtrader 的一致性检查
+
+    python -m backtest.parity [数据源] [股票数]
+
+数据源默认 fake（离线假数据），也可以是 akshare / tushare / fixture。逐只股票比较：
+- run_backtest.run_test 的 backtrader 收益率 与 vector_engine.run_frame 的收益率（要求完全相等）
+- 分层加仓策略：backtrader 的逐笔成交（K线、股数、价格）与收益率 与 layer_engine.run_frame 的结果
+- 同一批股票写成面板后 run_panel 与逐只 run_frame 的账户价值曲线（两个引擎都检查）
+任何不一致都会列出并以非零状态退出。
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+
+import backtrader as bt
+import numpy as np
+
+from backtest import layer_engine, vector_engine
+from backtest.parallel import backtest_frame, build_cerebro
+from data.data_loader import AShareDataLoader
+from data.panel import write_panel
+from data.universe import default_registry
+from strategy.signals import as_signal_strategy
+from strategy.dual_ma import BreakoutStrategy, DualMAStrategy
+from strategy.dual_ma_martingale import DualMAWithMartingale, DualMAWithPyramid
+from strategy.martingale import MartingaleConservative, MartingaleStrategy
+
+# (策略类, 参数)；参数覆盖默认值与几组常见的周期
+CASES = [
+    (DualMAStrategy, {"fast": 5, "slow": 20}),
+    (DualMAStrategy, {"fast": 10, "slow": 60}),
+    (BreakoutStrategy, {"period": 20}),
+    (BreakoutStrategy, {"period": 60}),
+]
+
+LAYERED_CASES = [
+    (MartingaleStrategy, {}),
+    (MartingaleStrategy, {"max_layers": 3, "take_profit_rate": 0.05}),
+    (MartingaleConservative, {}),
+    (DualMAWithMartingale, {}),
+    (DualMAWithMartingale, {"fast_period": 10, "slow_period": 60}),
+    (DualMAWithPyramid, {}),
+    (DualMAWithPyramid, {"fast_period": 10, "slow_period": 30, "max_adds": 5}),
+]
+
+START = "2014-01-01"
+
+
+class FillRecorder(bt.Analyzer):
+    """记录每笔成交：(K线序号, 股数（卖出为负）, 成交价)"""
+
+    def start(self):
+        self.fills = []
+
+    def notify_order(self, order):
+        if order.status == order.Completed:
+            self.fills.append((len(self.strategy) - 1, order.executed.size, order.executed.price))
+
+    def get_analysis(self):
+        return self.fills
+
+
+def load_frames(loader, symbols, start=START):
+    """与 run_test 相同的数据准备：至少 500 根K线，从 start 开始"""
+    frames = {}
+    for symbol in symbols:
+        df = loader.get_daily_bars(symbol, start)
+        if df is None or len(df) < 500:
+            continue
+        frames[symbol] = df[df["date"] >= start].reset_index(drop=True)
+    return frames
+
+
+def check_frames(frames, cases=CASES) -> list[str]:
+    """逐只股票比较 backtrader 与向量化回测的收益率，返回不一致的描述"""
+    failures = []
+    for strategy_class, params in cases:
+        _, signal, signal_params = as_signal_strategy(strategy_class, params)
+        for symbol, df in frames.items():
+            expected = backtest_frame(symbol, df, strategy_class, params)
+            got = float(vector_engine.run_frame(df, signal, **signal_params).total_return[0])
+            if got != expected:
+                failures.append(f"{strategy_class.__name__}{params} {symbol}: backtrader {expected!r} 向量化 {got!r}")
+    return failures
+
+
+def check_layered(frames, cases=LAYERED_CASES) -> list[str]:
+    """逐只股票逐笔比较 backtrader 与 layer_engine 的成交，并比较收益率"""
+    failures = []
+    for strategy_class, params in cases:
+        for symbol, df in frames.items():
+            cerebro = build_cerebro(symbol, df, strategy_class, params)
+            cerebro.addanalyzer(FillRecorder, _name="fills")
+            initial = cerebro.broker.getcash()
+            expected = cerebro.run()[0].analyzers.fills.get_analysis()
+            expected_return = (cerebro.broker.getvalue() - initial) / initial * 100
+
+            result = layer_engine.run_frame(df, strategy_class, params)
+            got = list(zip(result.fills["row"].tolist(), result.fills["size"].tolist(),
+                           result.fills["price"].tolist()))
+            name = f"{strategy_class.__name__}{params} {symbol}"
+            if got != expected:
+                diff = next(k for k, pair in enumerate(zip(got + [None], expected + [None])) if pair[0] != pair[1])
+                failures.append(f"{name}: 第 {diff + 1} 笔成交不同（backtrader {len(expected)} 笔，引擎 {len(got)} 笔）")
+            elif float(result.total_return[0]) != expected_return:
+                failures.append(f"{name}: backtrader {expected_return!r} 引擎 {float(result.total_return[0])!r}")
+    return failures
+
+
+def _vector_runner(strategy_class, params):
+    """(面板回测, 单只回测) 两个函数，都返回 VectorResult"""
+    _, signal, signal_params = as_signal_strategy(strategy_class, params)
+    return (lambda panel: vector_engine.run_panel(panel, signal, **signal_params)[1],
+            lambda df: vector_engine.run_frame(df, signal, **signal_params))
+
+
+def _layered_runner(strategy_class, params):
+    return (lambda panel: layer_engine.run_panel(panel, strategy_class, params)[1],
+            lambda df: layer_engine.run_frame(df, strategy_class, params))
+
+
+def check_panel(frames, cases=CASES, runner=_vector_runner) -> list[str]:
+    """面板一次回测与逐只回测的账户价值曲线比较"""
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        panel = write_panel(f"{tmp}/panel", frames)
+        for strategy_class, params in cases:
+            run_panel, run_frame = runner(strategy_class, params)
+            result = run_panel(panel)
+            for symbol in panel.symbols:
+                df = panel.frame(symbol)
+                single = run_frame(df).equity[:, 0]
+                j = panel.column(symbol)
+                curve = result.equity[:, j]
+                curve = curve[~np.isnan(curve)]
+                if not np.array_equal(curve, single):
+                    failures.append(f"{strategy_class.__name__}{params} {symbol}: 面板与逐只回测的账户价值不同")
+        del panel
+    return failures
+
+
+def main(provider="fake", limit=20):
+    loader = AShareDataLoader(provider=provider, use_cache=False, rate_limit=0)
+    symbols = [code for code, _ in default_registry().stocks("HS300")[:limit]]
+    frames = load_frames(loader, symbols)
+    print(f"数据源 {provider}，{len(frames)} 只股票，{len(CASES) + len(LAYERED_CASES)} 组策略参数")
+
+    started = time.perf_counter()
+    failures = check_frames(frames)
+    print(f"backtrader 对比: {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    failures += check_layered(frames)
+    print(f"分层加仓 backtrader 逐笔对比: {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    failures += check_panel(frames)
+    failures += check_panel(frames, LAYERED_CASES, _layered_runner)
+    print(f"面板对比: {time.perf_counter() - started:.1f}s")
+
+    for failure in failures:
+        print(f"  不一致 {failure}")
+    print("全部一致" if not failures else f"{len(failures)} 项不一致")
+    return not failures
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    ok = main(args[0] if args else "fake", int(args[1]) if len(args) > 1 else 20)
+    sys.exit(0 if ok else 1)
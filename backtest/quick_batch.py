@@ -1,10 +1,10 @@
-"""沪深300快速回测 - 使用tushare Pro"""
-import tushare as ts
-import pandas as pd
-import csv
+"""沪深300快速回测（数据源可选：Tushare Pro / AkShare / 本地夹具）"""
+import os
+from pathlib import Path
 
-# Tushare token (需要设置)
-token = None
+from backtest.parallel import Job, print_download_report, run_jobs, temporary_panel
+from data.data_loader import AShareDataLoader
+from data.universe import default_registry
 
 def get_hs300_akshare():
     """用akshare获取沪深300"""
@@ -18,16 +18,8 @@ def get_hs300_akshare():
         return None
 
 def get_hs300_from_file():
-    """从文件读取"""
-    stocks = []
-    try:
-        with open('data/hs300_stocks.csv', 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                stocks.append((row['code'], row['name']))
-    except:
-        pass
-    return stocks
+    """从文件读取（已去重）"""
+    return default_registry().stocks("HS300")
 
 def quick_backtest_martingale(prices):
     """快速回测马丁策略（无backtrader）
@@ -91,68 +83,64 @@ def quick_backtest_martingale(prices):
     return (cash - 1000000) / 1000000 * 100
 
 
-def get_stock_data(symbol, days=250):
-    """快速获取股票数据"""
-    try:
-        df = ts.pro_bar(ts_code=f"{symbol}.SH" if symbol.startswith('6') else f"{symbol}.SZ", 
-                       asset='E', start_date='20250101', end_date='20260216')
-        if df is not None and len(df) > 50:
-            return df['close'].tolist()
-    except Exception as e:
-        pass
-    return None
+def quick_martingale_frame(df):
+    """并行任务入口：日线 DataFrame 上的 quick_backtest_martingale"""
+    return quick_backtest_martingale(df['close'].tolist())
 
 
-def main():
-    # 尝试获取tushare token
-    global token
-    try:
-        token = open('.token').read().strip() if open('.token').read().strip() else None
-    except:
-        pass
+def default_provider():
+    """显式设置 ASTOCK_PROVIDER 时用它；否则有 tushare token 用 tushare，没有用 akshare"""
+    if os.environ.get("ASTOCK_PROVIDER"):
+        return os.environ["ASTOCK_PROVIDER"]
+    if os.environ.get("TUSHARE_TOKEN") or (Path('.token').exists() and Path('.token').read_text().strip()):
+        return "tushare"
+    print("未设置tushare token，使用akshare...")
+    return "akshare"
+
+
+def main(provider=None, workers=None):
+    """provider 为数据源名称（tushare / akshare / fixture / fake）或 DataProvider 实例"""
+    loader = AShareDataLoader(provider=provider or default_provider())
+    # 使用本地股票列表
+    stocks = get_hs300_from_file()
+    if not stocks:
+        print("使用默认股票列表")
+        stocks = [
+            ("600519", "贵州茅台"),
+            ("600036", "招商银行"),
+            ("601318", "中国平安"),
+            ("600900", "长江电力"),
+            ("000333", "美的集团"),
+        ]
     
-    if token:
-        ts.set_token(token)
-        pro = ts.pro_api()
-    else:
-        print("未设置tushare token，尝试akshare...")
-        # 使用本地股票列表
-        stocks = get_hs300_from_file()
-        if not stocks:
-            print("使用默认股票列表")
-            stocks = [
-                ("600519", "贵州茅台"),
-                ("600036", "招商银行"),
-                ("601318", "中国平安"),
-                ("600900", "长江电力"),
-                ("000333", "美的集团"),
-            ]
-        
-        print(f"共{len(stocks)}只股票，开始回测...")
-        
-        results = []
-        for i, (code, name) in enumerate(stocks, 1):
-            print(f"[{i}/{len(stocks)}] {code} {name}...", end=" ", flush=True)
-            prices = get_stock_data(code)
-            if prices:
-                ret = quick_backtest_martingale(prices)
-                if ret is not None:
-                    results.append((code, name, ret))
-                    print(f"{ret:+.1f}%")
-                else:
-                    print("数据不足")
+    print(f"共{len(stocks)}只股票，开始回测...")
+    
+    names = dict(stocks)
+    results = []
+    with temporary_panel(loader, list(names), '20250101', '20260216') as (panel, report):
+        print_download_report(report)
+        if panel is None:
+            return
+        jobs = [Job(code, quick_martingale_frame) for code in names if code in panel]
+        # 超过 50 根K线才回测
+        for i, result in enumerate(run_jobs(panel, jobs, min_bars=51, workers=workers), 1):
+            code = result.job.symbol
+            print(f"[{i}/{len(jobs)}] {code} {names[code]}...", end=" ")
+            if result.ret is not None:
+                results.append((code, names[code], result.ret))
+                print(f"{result.ret:+.1f}%")
             else:
-                print("获取失败")
+                print(result.error or "数据不足")
+    
+    if results:
+        results.sort(key=lambda x: x[2], reverse=True)
+        print("\n=== 马丁策略收益排名 ===")
+        for i, (code, name, ret) in enumerate(results[:15], 1):
+            print(f"{i}. {code} {name}: {ret:+.1f}%")
         
-        if results:
-            results.sort(key=lambda x: x[2], reverse=True)
-            print("\n=== 马丁策略收益排名 ===")
-            for i, (code, name, ret) in enumerate(results[:15], 1):
-                print(f"{i}. {code} {name}: {ret:+.1f}%")
-            
-            avg = sum(r[2] for r in results) / len(results)
-            wins = sum(1 for r in results if r[2] > 0)
-            print(f"\n平均: {avg:+.1f}% 正收益: {wins}/{len(results)}")
+        avg = sum(r[2] for r in results) / len(results)
+        wins = sum(1 for r in results if r[2] > 0)
+        print(f"\n平均: {avg:+.1f}% 正收益: {wins}/{len(results)}")
 
 
 if __name__ == "__main__":
@@ -1,99 +1,21 @@
 """10年回测 - 修复版"""
 
-import backtrader as bt
-import pandas as pd
+from backtest.parallel import backtest_frame, print_download_report, run_symbols, temporary_panel
 from data.data_loader import AShareDataLoader
-
-# ============== 策略1: 双均线金叉死叉 ==============
-class DualMAStrategy(bt.Strategy):
-    params = dict(fast=5, slow=20)
-    
-    def __init__(self):
-        self.fast = bt.indicators.SimpleMovingAverage(self.data.close, period=self.params.fast)
-        self.slow = bt.indicators.SimpleMovingAverage(self.data.close, period=self.params.slow)
-        self.prev_fast = 0
-        
-    def next(self):
-        if len(self.data) < self.params.slow + 5:
-            return
-            
-        fast_now = self.fast[0]
-        slow_now = self.slow[0]
-        fast_prev = self.fast[-1]
-        slow_prev = self.slow[-1]
-        
-        # 金叉买入
-        if fast_now > slow_now and fast_prev <= slow_prev:
-            if not self.position:
-                price = self.data.close[0]
-                if price > 0:
-                    size = int(self.broker.getcash() * 0.95 / price / 100) * 100
-                    if size >= 100:
-                        self.buy(size=size)
-                    
-        # 死叉卖出
-        elif fast_now < slow_now and fast_prev >= slow_prev:
-            if self.position:
-                self.close()
-                
-        self.prev_fast = fast_now
-
-
-# ============== 策略2: 突破20日均线 ==============
-class BreakoutStrategy(bt.Strategy):
-    params = dict(period=20)
-    
-    def __init__(self):
-        self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.params.period)
-        
-    def next(self):
-        if len(self.data) < self.params.period + 5:
-            return
-            
-        close = self.data.close[0]
-        prev_close = self.data.close[-1]
-        sma_now = self.sma[0]
-        sma_prev = self.sma[-1]
-        
-        # 突破买入
-        if prev_close <= sma_prev and close > sma_now:
-            if not self.position:
-                size = int(self.broker.getcash() * 0.95 / close / 100) * 100
-                if size >= 100:
-                    self.buy(size=size)
-                    
-        # 跌破卖出
-        elif prev_close >= sma_prev and close < sma_now:
-            if self.position:
-                self.close()
+from strategy.dual_ma import BreakoutStrategy, DualMAStrategy
 
 
-def run_test(code, name, StrategyClass, params):
-    loader = AShareDataLoader()
+def run_test(code, name, StrategyClass, params, loader=None):
+    loader = loader or AShareDataLoader()
     df = loader.get_daily_bars(code, "2014-01-01")
     if df is None or len(df) < 500:
         return None
     
-    df = df[df['date'] >= '2014-01-01'][['date','open','high','low','close','volume']]
-    df = df.set_index('date')
-    
-    cerebro = bt.Cerebro()
-    cerebro.addstrategy(StrategyClass, **params)
-    cerebro.adddata(bt.feeds.PandasData(dataname=df))
-    cerebro.broker.setcash(1000000)
-    cerebro.broker.setcommission(commission=0.001)
-    
-    initial = cerebro.broker.getcash()
-    cerebro.run()
-    return (cerebro.broker.getvalue() - initial) / initial * 100
+    df = df[df['date'] >= '2014-01-01'].reset_index(drop=True)
+    return backtest_frame(code, df, StrategyClass, params)
 
 
-# 主程序
-print("="*60)
-print("10年回测 (2014-01-01 至今)")
-print("="*60)
-
-stocks = [
+STOCKS = [
     ("601318", "中国平安"),
     ("600036", "招商银行"),
     ("600519", "贵州茅台"),
@@ -101,11 +23,41 @@ stocks = [
     ("000333", "美的集团"),
 ]
 
-for code, name in stocks:
-    print(f"\n{code} {name}")
-    
-    r1 = run_test(code, name, DualMAStrategy, {'fast': 5, 'slow': 20})
-    r2 = run_test(code, name, BreakoutStrategy, {'period': 20})
-    
-    print(f"  双均线(5,20): {r1:+.1f}%")
-    print(f"  突破20日均线: {r2:+.1f}%")
\ No newline at end of file
+
+CASES = [
+    ("双均线(5,20)", DualMAStrategy, {'fast': 5, 'slow': 20}),
+    ("突破20日均线", BreakoutStrategy, {'period': 20}),
+]
+
+
+def main(workers=None):
+    print("="*60)
+    print("10年回测 (2014-01-01 至今)")
+    print("="*60)
+
+    loader = AShareDataLoader()
+    names = dict(STOCKS)
+    labels = {StrategyClass: label for label, StrategyClass, _ in CASES}
+    strategies = [(StrategyClass, params) for _, StrategyClass, params in CASES]
+    with temporary_panel(loader, list(names), "2014-01-01") as (panel, report):
+        print_download_report(report)
+        if panel is None:
+            return
+        # 每只股票只读取一次，所有策略在同一个任务中运行，按完成顺序输出
+        symbols = [code for code in names if code in panel]
+        for results in run_symbols(panel, symbols, strategies, start="2014-01-01", min_bars=500,
+                                   workers=workers):
+            code = results[0].job.symbol
+            print(f"\n{code} {names[code]}")
+            for result in results:
+                label = labels[result.job.strategy]
+                if result.error:
+                    print(f"  {label}: 失败 {result.error}")
+                elif result.ret is None:
+                    print(f"  {label}: 数据不足")
+                else:
+                    print(f"  {label}: {result.ret:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
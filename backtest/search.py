@@ -0,0 +1,259 @@
+"""
+大参数空间的预算搜索：逐级减半（successive halving）与 Hyperband
+
+全网格 × 全市场 × 全历史的回测量太大时，先在小预算上（部分股票、最近一段历史）评估所有参数组合，
+每一级只保留排名前 1/eta 的组合，预算乘以 eta 后继续评估，最后一级在完整股票池、完整区间上运行。
+每一级都用 sweep() 计算（并行、行情与指标按股票只准备一次）。
+
+预算 fraction ∈ (0, 1] 按 resource 分配：
+- "symbols": 按固定随机顺序取前 fraction 比例的股票，各级的股票集合逐级包含，
+  已评估过的 (参数组合, 股票) 直接复用，只计算新加入的股票
+- "history": 使用区间内最近 fraction 比例的交易日
+- "both": 两者同时缩小
+
+计算量按实际回测的K线数（每组参数每只股票的K线数之和）统计，与穷举网格的K线数对比。
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from backtest.parallel import cli_loader, print_download_report, temporary_panel
+from backtest.sweep import DEFAULT_SPACES, grid, ordered_periods, random_search, summarize, sweep
+from data.panel import Panel
+from data.universe import default_registry
+
+
+@dataclass
+class SearchResult:
+    """搜索结果；cost 与 exhaustive_cost 的单位为回测的K线数"""
+
+    best: dict
+    leaderboard: pd.DataFrame   # 最后一级（完整预算）各组合的汇总，按得分排序
+    rungs: pd.DataFrame         # 每一级：bracket, rung, fraction, configs, symbols, start, cost, seconds
+    table: pd.DataFrame         # 所有实际评估过的结果行（sweep 结果表加 bracket、rung 列）
+    cost: int
+    exhaustive_cost: int
+    configs: int                # 参与搜索的参数组合总数
+
+    @property
+    def saved(self) -> float:
+        """相对穷举网格节省的计算量比例"""
+        return 1 - self.cost / self.exhaustive_cost if self.exhaustive_cost else 0.0
+
+    def report(self) -> str:
+        lines = [f"{'bracket':>7} {'rung':>4} {'预算':>6} {'组合':>6} {'股票':>6} {'起始日':>10} {'K线数':>14} {'耗时':>8}"]
+        for row in self.rungs.itertuples(index=False):
+            lines.append(f"{row.bracket:>7} {row.rung:>4} {row.fraction:>6.3f} {row.configs:>6} "
+                         f"{row.symbols:>6} {str(row.start)[:10]:>10} {row.cost:>14,} {row.seconds:>7.1f}s")
+        lines.append(f"实际计算 {self.cost:,} 根K线，穷举 {self.configs} 组参数需 {self.exhaustive_cost:,} 根，"
+                     f"节省 {self.saved:.1%}")
+        lines.append(f"最优参数: {self.best}")
+        return "\n".join(lines)
+
+
+def _params_key(params: dict) -> tuple:
+    return tuple(sorted(params.items()))
+
+
+def _window_start(dates: np.ndarray, fraction: float):
+    """dates 中最近 fraction 比例交易日的起始日"""
+    count = max(1, math.ceil(len(dates) * fraction))
+    return pd.Timestamp(dates[len(dates) - count])
+
+
+def _bars(panel: Panel, symbols, start, end, min_bars: int) -> dict[str, int]:
+    """每只股票在区间内的有效K线数（不足 min_bars 的不计，与 sweep 相同）"""
+    rows = panel.date_slice(start, end)
+    close = panel["close"][rows]
+    counts = {}
+    for symbol in symbols:
+        n = int(np.count_nonzero(~np.isnan(close[:, panel.column(symbol)])))
+        if n >= min_bars:
+            counts[symbol] = n
+    return counts
+
+
+class _Budget:
+    """把预算比例换算成 (股票子集, 起始日, 最少K线数)"""
+
+    def __init__(self, panel: Panel, symbols, start, end, resource: str, min_bars: int, seed: int):
+        if resource not in ("symbols", "history", "both"):
+            raise ValueError(f"未知的预算类型: {resource}")
+        self.panel, self.end, self.resource, self.min_bars = panel, end, resource, min_bars
+        self.start = start
+        self.symbols = list(symbols)
+        # 固定的随机顺序：股票子集逐级包含，不偏向列表前面的股票
+        random.Random(seed).shuffle(self.symbols)
+        self.dates = panel.dates[panel.date_slice(start, end)]
+
+    def __call__(self, fraction: float):
+        symbols, start, min_bars = self.symbols, self.start, self.min_bars
+        if self.resource in ("symbols", "both"):
+            symbols = self.symbols[:max(1, math.ceil(len(self.symbols) * fraction))]
+        if self.resource in ("history", "both") and fraction < 1:
+            start = _window_start(self.dates, fraction)
+            min_bars = max(1, int(self.min_bars * fraction))
+        return symbols, start, min_bars
+
+
+def successive_halving(panel: Panel, strategy, param_sets, symbols=None, start=None, end=None,
+                       eta: int = 3, min_fraction: float | None = None, resource: str = "both",
+                       metric: str = "mean_return", min_bars: int = 100, workers: int | None = None,
+                       seed: int = 0) -> SearchResult:
+    """
+    逐级减半搜索
+
+    每一级评估当前保留的组合，按 summarize() 的 metric 列（越大越好）排序，保留前 1/eta；
+    预算从 min_fraction 开始每级乘以 eta，最后一级为完整预算。min_fraction 默认取
+    eta 的负幂次，使最后一级只剩不超过 eta 个组合。
+
+    某一级没有任何可用结果（股票的K线都不足 min_bars，或全部出错）时保留上一级的组合进入下一级，
+    最后一级也没有结果时 best / leaderboard 取最后一个有结果的级别（见 rungs）；
+    没有任何一级能排名时抛出 ValueError。
+    """
+    param_sets = [dict(params) for params in param_sets]
+    if not param_sets:
+        raise ValueError("没有参数组合")
+    budget = _Budget(panel, list(panel.symbols if symbols is None else symbols), start, end, resource,
+                     min_bars, seed)
+    if min_fraction is None:
+        levels = max(0, math.ceil(math.log(len(param_sets), eta)) - 1) if len(param_sets) > 1 else 0
+        min_fraction = eta ** -levels
+    result = _halving(panel, strategy, param_sets, budget, eta, min_fraction, metric, workers)
+    if result is None:
+        raise ValueError(f"没有参数组合得到有效结果：所选股票的K线都不足 min_bars={min_bars}，或回测全部出错")
+    return result
+
+
+def _halving(panel: Panel, strategy, param_sets, budget: _Budget, eta: int, min_fraction: float,
+             metric: str, workers: int | None, bracket: int = 0) -> SearchResult | None:
+    """逐级减半的实现；没有任何一级能排名时返回 None"""
+    levels = max(0, round(math.log(1 / min_fraction, eta)))
+    end = budget.end
+    names = list(param_sets[0])
+    survivors = param_sets
+    evaluated = {}      # (参数, 股票, 起始日) -> 结果行，按股票分配预算时各级复用
+    tables, rungs = [], []
+    cost = 0
+    ranked = order = None
+    for rung in range(levels + 1):
+        fraction = min(1.0, min_fraction * eta ** rung)
+        rung_symbols, rung_start, rung_min_bars = budget(fraction)
+        done = {symbol for key, symbol, s in evaluated if s == rung_start}
+        new_symbols = [symbol for symbol in rung_symbols if symbol not in done]
+        started = time.perf_counter()
+        table = sweep(panel, strategy, survivors, new_symbols, rung_start, end, rung_min_bars, workers)
+        for row in table.to_dict("records"):
+            evaluated[(_params_key({name: row[name] for name in names}), row["symbol"], rung_start)] = row
+        rung_cost = int(table["bars"].sum())
+        cost += rung_cost
+        tables.append(table.assign(bracket=bracket, rung=rung))
+
+        # 当前级的排名用该级全部股票的结果（包括复用的）
+        rung_set, by_key = set(rung_symbols), {_params_key(p): p for p in survivors}
+        rows = [row for (key, symbol, s), row in evaluated.items()
+                if s == rung_start and symbol in rung_set and key in by_key]
+        rung_ranked = summarize(pd.DataFrame(rows), names) if rows else pd.DataFrame()
+        if len(rung_ranked):
+            ranked = rung_ranked.sort_values(metric, ascending=False, kind="stable")
+            order = [by_key[_params_key({name: row[name] for name in names})] for row in ranked.to_dict("records")]
+        rungs.append({"bracket": bracket, "rung": rung, "fraction": fraction, "configs": len(survivors),
+                      "symbols": len(rung_symbols), "start": rung_start if rung_start is not None else budget.dates[0],
+                      "cost": rung_cost, "seconds": time.perf_counter() - started})
+        if rung == levels:
+            break
+        # 这一级没有可用结果时保留原有组合，用下一级更大的预算再评估
+        if len(rung_ranked):
+            survivors = order[:max(1, len(survivors) // eta)]
+
+    if order is None:
+        return None
+    full = _bars(panel, budget.symbols, budget.start, end, budget.min_bars)
+    return SearchResult(
+        best=order[0],
+        leaderboard=ranked.reset_index(drop=True),
+        rungs=pd.DataFrame(rungs),
+        table=pd.concat(tables, ignore_index=True),
+        cost=cost,
+        exhaustive_cost=len(param_sets) * sum(full.values()),
+        configs=len(param_sets),
+    )
+
+
+def hyperband(panel: Panel, strategy, space: dict, symbols=None, start=None, end=None, eta: int = 3,
+              max_levels: int = 4, resource: str = "both", metric: str = "mean_return", min_bars: int = 100,
+              workers: int | None = None, seed: int = 0, where=None) -> SearchResult:
+    """
+    Hyperband：多组不同起始预算的逐级减半，参数组合由 random_search(space) 抽取
+
+    第 s 组（s = max_levels..0）抽取约 (max_levels+1)/(s+1) × eta^s 组参数，从预算 eta^-s 开始减半；
+    各组的最后一级都是完整预算，最优参数取所有组最后一级中 metric 最大的。
+    穷举计算量按所有抽取到的（不重复）参数组合计。没有任何一组能排名时抛出 ValueError。
+    """
+    budget = _Budget(panel, list(panel.symbols if symbols is None else symbols), start, end, resource,
+                     min_bars, seed)
+    results = []
+    for bracket, s in enumerate(range(max_levels, -1, -1)):
+        n = math.ceil((max_levels + 1) / (s + 1) * eta ** s)
+        param_sets = random_search(space, n, seed=seed + bracket, where=where)
+        if not param_sets:
+            continue
+        result = _halving(panel, strategy, param_sets, budget, eta, eta ** -s, metric, workers, bracket)
+        if result is not None:
+            results.append(result)
+    if not results:
+        raise ValueError(f"没有参数组合得到有效结果：所选股票的K线都不足 min_bars={min_bars}，或回测全部出错")
+
+    leaderboard = pd.concat([result.leaderboard.assign(bracket=i) for i, result in enumerate(results)],
+                            ignore_index=True).sort_values(metric, ascending=False, kind="stable")
+    best = max(results, key=lambda result: result.leaderboard[metric].iloc[0]).best
+    configs = {_params_key(dict(zip(space, row))) for result in results
+               for row in result.table[list(space)].drop_duplicates().itertuples(index=False)}
+    full = _bars(panel, budget.symbols, budget.start, budget.end, budget.min_bars)
+    return SearchResult(
+        best=best,
+        leaderboard=leaderboard.reset_index(drop=True),
+        rungs=pd.concat([result.rungs for result in results], ignore_index=True),
+        table=pd.concat([result.table for result in results], ignore_index=True),
+        cost=sum(result.cost for result in results),
+        exhaustive_cost=len(configs) * sum(full.values()),
+        configs=len(configs),
+    )
+
+
+def main(strategy="martingale", provider=None, limit=30, resource="both", workers=None):
+    """
+    python -m backtest.search [策略] [数据源] [股票数] [预算类型]：在 sweep 的默认网格上逐级减半
+
+    数据源默认取 ASTOCK_PROVIDER（见 cli_loader），离线数据源不写入本地缓存。
+    """
+    loader = cli_loader(provider)
+    symbols = [code for code, _ in default_registry().stocks("HS300")[:limit]]
+    param_sets = grid(DEFAULT_SPACES[strategy], where=ordered_periods)
+    with temporary_panel(loader, symbols, "2014-01-01") as (panel, report):
+        print_download_report(report)
+        if panel is None:
+            return None
+        try:
+            result = successive_halving(panel, strategy, param_sets, start="2014-01-01", min_bars=500,
+                                        resource=resource, workers=workers)
+        except ValueError as e:
+            print(e)
+            return None
+    print(result.report())
+    print(result.leaderboard.to_string(index=False))
+    return result
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(args[0] if args else "martingale", args[1] if len(args) > 1 else None,
+         int(args[2]) if len(args) > 2 else 30, args[3] if len(args) > 3 else "both")
@@ -0,0 +1,272 @@
+"""
+参数扫描：网格或随机搜索 × 股票池，并行回测，输出整洁的结果表
+
+    table = sweep(panel, "dual_ma", grid({"fast": [5, 10], "slow": [20, 60]}, where=lambda p: p["fast"] < p["slow"]))
+
+每只股票一个任务（见 parallel.map_panel）：行情从面板读取一次，所有参数组合需要的指标
+合并后只计算一次，之后每组参数只重新运行策略本身。cerebro.optstrategy 每组参数都要
+重新加载数据、重新计算指标，这里的数据开销只与股票数成正比。
+
+engine="auto" 时，有等价快速引擎的策略（DualMA/Breakout 用 vector_engine，马丁/金字塔类用
+layer_engine）直接用数组引擎计算，结果与 backtrader 逐位一致（见 backtest.parity）；
+其余策略用 backtrader。engine="backtrader" 时全部用 backtrader。
+
+结果表每行一个 (参数组合, 股票)：参数各占一列，另有 symbol、bars、return（总收益率 %）、
+drawdown（最大回撤 %）、trades（已平仓交易数）。
+"""
+
+from __future__ import annotations
+
+import itertools
+import random
+import sys
+import time
+from pathlib import Path
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from backtest import layer_engine, vector_engine
+from backtest.parallel import (cli_loader, is_backtrader_strategy, make_cerebro, map_panel, print_download_report,
+                               resolve_strategy, temporary_panel)
+from data.panel import Panel
+from data.universe import default_registry
+from strategy.feeds import SharedBars, shared_indicators
+from strategy.signals import as_signal_strategy
+
+RESULT_COLUMNS = ["symbol", "bars", "return", "drawdown", "trades"]
+
+
+def grid(space: dict, where=None) -> list[dict]:
+    """
+    参数网格：space 为 {参数名: 取值序列}，返回所有组合
+
+    where 为可选的过滤条件 fn(params) -> bool，如 lambda p: p["fast"] < p["slow"]。
+    """
+    names = list(space)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    return [params for params in combos if where is None or where(params)]
+
+
+def random_search(space: dict, n: int, seed: int = 0, where=None, max_tries: int | None = None) -> list[dict]:
+    """
+    随机搜索：最多 n 组不重复的参数
+
+    space 的取值为列表/range 时从中随机选一个；为 (下限, 上限) 元组时在区间内均匀取值
+    （两端都是整数时取整数，含上限）。不满足 where 的组合丢弃重抽，最多尝试 max_tries 次
+    （默认 n 的 20 倍）。
+    """
+    rng = random.Random(seed)
+
+    def draw(values):
+        if isinstance(values, tuple):
+            lo, hi = values
+            if isinstance(lo, int) and isinstance(hi, int):
+                return rng.randint(lo, hi)
+            return rng.uniform(lo, hi)
+        return rng.choice(list(values))
+
+    seen, combos = set(), []
+    for _ in range(max_tries or n * 20):
+        if len(combos) >= n:
+            break
+        params = {name: draw(values) for name, values in space.items()}
+        key = tuple(params.items())
+        if key in seen or (where is not None and not where(params)):
+            continue
+        seen.add(key)
+        combos.append(params)
+    return combos
+
+
+class SweepStats(bt.Analyzer):
+    """最大回撤（%，按每根K线的账户价值）与已平仓交易数"""
+
+    def start(self):
+        self.peak = -np.inf
+        self.drawdown = 0.0
+        self.trades = 0
+
+    def notify_cashvalue(self, cash, value):
+        if value > self.peak:
+            self.peak = value
+        self.drawdown = max(self.drawdown, 100 * (self.peak - value) / self.peak)
+
+    def notify_trade(self, trade):
+        if trade.isclosed:
+            self.trades += 1
+
+    def get_analysis(self):
+        return {"drawdown": self.drawdown, "trades": self.trades}
+
+
+def _backtrader_stats(bars: SharedBars, strategy_class, params) -> dict:
+    cerebro = make_cerebro(bars.feed(), strategy_class, params)
+    cerebro.addanalyzer(SweepStats, _name="stats")
+    initial = cerebro.broker.getcash()
+    stats = cerebro.run()[0].analyzers.stats.get_analysis()
+    return {"return": (cerebro.broker.getvalue() - initial) / initial * 100, **stats}
+
+
+def _engine_stats(result: vector_engine.VectorResult, column: int = 0) -> dict:
+    """数组引擎结果中一列的同口径统计（回撤的运算顺序与 SweepStats 相同）"""
+    equity = result.equity[:, column]
+    peak = np.maximum.accumulate(equity)
+    drawdown = float((100 * (peak - equity) / peak).max())
+    fills = result.fills
+    trades = int(((fills["column"].to_numpy() == column) & (fills["size"].to_numpy() < 0)).sum()) if len(fills) else 0
+    return {"return": float(result.total_return[column]), "drawdown": drawdown, "trades": trades}
+
+
+def _error(e: Exception) -> dict:
+    return {"error": f"{type(e).__name__}: {e}"}
+
+
+def evaluate(df: pd.DataFrame, symbol: str, strategy_class, param_sets, engine: str = "auto") -> list[dict]:
+    """
+    一只股票的日线上评估多组参数，返回结果行（参数、symbol、bars、return、drawdown、trades）
+
+    分层加仓策略的所有参数组合在一次 layer_engine.run_params 中运行（每组一列）；
+    走 backtrader 的参数组合共享同一份 SharedBars（指标合并后只算一次）。
+    """
+    rows = [{**params, "symbol": symbol, "bars": len(df)} for params in param_sets]
+    if engine == "auto" and strategy_class in layer_engine.LAYERED_RULES:
+        try:
+            result = layer_engine.run_params(df, strategy_class, param_sets)
+        except Exception as e:
+            return [{**row, **_error(e)} for row in rows]
+        return [{**row, **_engine_stats(result, k)} for k, row in enumerate(rows)]
+
+    signals = [as_signal_strategy(strategy_class, params) if engine == "auto" else None for params in param_sets]
+    slow = [params for signal, params in zip(signals, param_sets) if signal is None]
+    bars = SharedBars(df, shared_indicators(symbol, df, [strategy_class] * len(slow), slow)) if slow else None
+    for row, params, signal in zip(rows, param_sets, signals):
+        try:
+            if signal is None:
+                row.update(_backtrader_stats(bars, strategy_class, params))
+            else:
+                _, name, signal_params = signal
+                row.update(_engine_stats(vector_engine.run_frame(df, name, **signal_params)))
+        except Exception as e:
+            row.update(_error(e))
+    return rows
+
+
+def evaluate_symbol(panel: Panel, symbol: str, strategy, param_sets, start=None, end=None,
+                    min_bars: int = 100, engine: str = "auto") -> list[dict]:
+    """面板中一只股票上评估所有参数组合（map_panel 的任务函数）；数据不足时返回空列表"""
+    df = panel.frame(symbol, start, end)
+    if len(df) < min_bars:
+        return []
+    return evaluate(df, symbol, resolve_strategy(strategy), param_sets, engine)
+
+
+def sweep(panel: Panel, strategy, param_sets, symbols=None, start=None, end=None, min_bars: int = 100,
+          workers: int | None = None, engine: str = "auto", output: str | Path | None = None) -> pd.DataFrame:
+    """
+    参数扫描，返回结果表（按股票、参数组合排序；数据不足的股票没有结果行）
+
+    strategy 为 parallel.STRATEGIES 中的名称或 backtrader 策略类；param_sets 为参数字典列表
+    （grid / random_search 的返回值）；symbols 默认为面板中所有股票。
+    output 为 .csv 或 .parquet 路径时同时写出结果表。
+    """
+    strategy_class = resolve_strategy(strategy)
+    if not is_backtrader_strategy(strategy_class):
+        raise ValueError("参数扫描只支持 backtrader 策略类")
+    if engine not in ("auto", "backtrader"):
+        raise ValueError(f"未知引擎: {engine}")
+    param_sets = [dict(params) for params in param_sets]
+    symbols = list(panel.symbols if symbols is None else symbols)
+
+    tasks = [(symbol, strategy_class, param_sets, start, end, min_bars, engine) for symbol in symbols]
+    # 结果按完成顺序返回，整理成按股票、再按参数组合的顺序
+    position = {symbol: i for i, symbol in enumerate(symbols)}
+    results = sorted(map_panel(panel, evaluate_symbol, tasks, workers), key=lambda rows: position[rows[0]["symbol"]]
+                     if rows else -1)
+    rows = [row for result in results for row in result]
+
+    names = list(dict.fromkeys(name for params in param_sets for name in params))
+    errors = ["error"] if any("error" in row for row in rows) else []
+    table = pd.DataFrame(rows, columns=names + RESULT_COLUMNS + errors)
+
+    if output is not None:
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        if output.suffix == ".csv":
+            table.to_csv(output, index=False, encoding="utf-8")
+        else:
+            table.to_parquet(output, index=False)
+    return table
+
+
+def summarize(table: pd.DataFrame, params=None) -> pd.DataFrame:
+    """
+    按参数组合汇总：股票数、平均/中位收益率、平均回撤、正收益比例、平均交易数
+
+    params 为参数列名，默认取结果表中除固定列以外的所有列；按平均收益率从高到低排序。
+    """
+    params = list(params or [col for col in table.columns if col not in RESULT_COLUMNS + ["error"]])
+    grouped = table.dropna(subset=["return"]).groupby(params, sort=False)
+    summary = grouped.agg(
+        symbols=("symbol", "count"),
+        mean_return=("return", "mean"),
+        median_return=("return", "median"),
+        mean_drawdown=("drawdown", "mean"),
+        win_rate=("return", lambda r: float((r > 0).mean())),
+        mean_trades=("trades", "mean"),
+    )
+    return summary.sort_values("mean_return", ascending=False).reset_index()
+
+
+# 命令行默认的搜索空间
+DEFAULT_SPACES = {
+    "dual_ma": {"fast": [5, 10, 20], "slow": [20, 30, 60, 120]},
+    "breakout": {"period": [10, 20, 40, 60, 120]},
+    "martingale": {"max_loss_rate": [-0.03, -0.05, -0.08], "take_profit_rate": [0.03, 0.05, 0.1],
+                   "max_layers": [3, 4, 5]},
+    "dual_ma_martingale": {"fast_period": [5, 10], "slow_period": [20, 60], "martingale_loss": [-0.05, -0.08],
+                           "martingale_profit": [0.03, 0.05]},
+    "dual_ma_pyramid": {"fast_period": [5, 10], "slow_period": [20, 60], "max_adds": [2, 3, 5],
+                        "take_profit": [0.1, 0.2]},
+    "vegas": {"ema_fast": [144, 169], "ema_mid": [169, 288], "ema_slow": [576, 676]},
+}
+
+# 周期必须严格递增的参数组，参数组合中没有的参数不检查
+ORDERED_PERIODS = [("fast", "slow"), ("fast_period", "slow_period"), ("ema_fast", "ema_mid", "ema_slow")]
+
+
+def ordered_periods(params: dict) -> bool:
+    """快线周期小于慢线周期（维加斯隧道 ema_fast < ema_mid < ema_slow），用作 grid 的 where 条件"""
+    for names in ORDERED_PERIODS:
+        values = [params[name] for name in names if name in params]
+        if any(a >= b for a, b in zip(values, values[1:])):
+            return False
+    return True
+
+
+def main(strategy="dual_ma", provider=None, limit=20, output=None, workers=None):
+    """
+    python -m backtest.sweep [策略] [数据源] [股票数] [输出文件]：沪深300 前 limit 只、2014 年至今
+
+    数据源默认取 ASTOCK_PROVIDER（见 cli_loader），离线数据源不写入本地缓存。
+    """
+    loader = cli_loader(provider)
+    symbols = [code for code, _ in default_registry().stocks("HS300")[:limit]]
+    param_sets = grid(DEFAULT_SPACES[strategy], where=ordered_periods)
+    with temporary_panel(loader, symbols, "2014-01-01") as (panel, report):
+        print_download_report(report)
+        if panel is None:
+            return None
+        started = time.perf_counter()
+        table = sweep(panel, strategy, param_sets, start="2014-01-01", min_bars=500, workers=workers, output=output)
+        print(f"{strategy}: {len(param_sets)} 组参数 × {table['symbol'].nunique()} 只股票，"
+              f"耗时 {time.perf_counter() - started:.1f}s")
+    print(summarize(table).head(10).to_string(index=False))
+    return table
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(args[0] if args else "dual_ma", args[1] if len(args) > 1 else None,
+         int(args[2]) if len(args) > 2 else 20, args[3] if len(args) > 3 else None)
@@ -0,0 +1,188 @@
+"""
+向量化回测引擎：无状态信号策略（DualMAStrategy / BreakoutStrategy）对整个面板一次回测
+
+信号由 strategy.signals 的数组版本算出（entry/exit，日期 × 股票），撮合规则与
+run_backtest.run_test 中的 backtrader 设置逐位一致：
+- 第 i 根K线收盘产生信号，第 i+1 根K线开盘价成交（市价单）
+- 空仓且出现 entry 时买入 int(现金 × 95% / 收盘价 / 100) × 100 股，不足 100 股不买
+- 持仓且出现 exit 时全部卖出；佣金为成交额的 0.1%
+- 开盘成交时现金不足（跳空高开）则订单作废，与 backtrader 的 Margin 拒单相同
+- 账户价值按每根K线收盘价计算，最后一根K线上产生的订单不成交
+
+状态只在有信号的位置变化，因此只遍历有信号的K线，每一行只处理当天有信号的股票。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from strategy import kernels
+from strategy.signals import SIGNAL_ARRAYS
+
+
+@dataclass
+class BrokerConfig:
+    """与 run_backtest 中 Cerebro 一致的资金与交易设置。"""
+
+    cash: float = 1000000.0
+    commission: float = 0.001
+    lot: int = 100
+    invest: float = 0.95    # 买入时使用的现金比例
+
+
+@dataclass
+class VectorResult:
+    """回测结果，数组均为 日期 × 股票"""
+
+    equity: np.ndarray      # 每根K线收盘后的账户价值，无行情的位置为 NaN
+    shares: np.ndarray      # 每根K线收盘后的持仓股数
+    fills: pd.DataFrame     # 成交记录：column, row, size（卖出为负）, price, commission
+    initial: float
+
+    @property
+    def final_value(self) -> np.ndarray:
+        """每只股票最后一根有行情K线上的账户价值"""
+        valid = ~np.isnan(self.equity)
+        last = len(valid) - 1 - np.argmax(valid[::-1], axis=0)
+        value = self.equity[last, np.arange(self.equity.shape[1])]
+        return np.where(valid.any(axis=0), value, np.nan)
+
+    @property
+    def total_return(self) -> np.ndarray:
+        """总收益率（%），与 run_test 的计算方式相同"""
+        return (self.final_value - self.initial) / self.initial * 100
+
+
+def _forward_fill(values: np.ndarray, changed: np.ndarray) -> np.ndarray:
+    """沿时间轴把 changed 位置的值向后填充（第 0 行必须全部 changed）"""
+    rows = np.where(changed, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(values, rows, axis=0)
+
+
+def simulate(entries: np.ndarray, exits: np.ndarray, open_: np.ndarray, close: np.ndarray,
+             config: BrokerConfig | None = None, counts: np.ndarray | None = None) -> VectorResult:
+    """
+    按信号撮合，每一列是一只股票的独立账户
+
+    counts 为每列有效K线数（之后的行视为无数据，见 kernels.compact_columns），默认全部有效。
+    一维输入按单只股票处理。
+    """
+    config = config or BrokerConfig()
+    entries, exits, open_, close = (np.asarray(a) for a in (entries, exits, open_, close))
+    if close.ndim == 1:
+        entries, exits, open_, close = (a[:, None] for a in (entries, exits, open_, close))
+    open_, close = open_.astype(float), close.astype(float)
+    n, m = close.shape
+    counts = np.full(m, n) if counts is None else np.asarray(counts)
+
+    cash = np.full(m, float(config.cash))
+    shares = np.zeros(m, dtype=np.int64)
+    price = np.zeros(m)
+    # 状态变化的行（成交所在K线）记录新值，最后向后填充成完整路径
+    cash_path = np.empty((n, m))
+    shares_path = np.zeros((n, m), dtype=np.int64)
+    price_path = np.zeros((n, m))
+    changed = np.zeros((n, m), dtype=bool)
+    cash_path[0], changed[0] = cash, True
+    fills = []
+
+    # 按行遍历有信号的位置（np.nonzero 的结果按行排序），每行只处理有信号的股票
+    sig_rows, sig_cols = np.nonzero((entries | exits)[:n - 1])
+    bounds = np.flatnonzero(np.r_[True, sig_rows[1:] != sig_rows[:-1], True])
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        i = sig_rows[lo]
+        cols = sig_cols[lo:hi]
+        cols = cols[i + 1 < counts[cols]]
+        is_entry = entries[i, cols]
+        buy = cols[is_entry & (shares[cols] == 0)]
+        sell = cols[~is_entry & exits[i, cols] & (shares[cols] > 0)]
+
+        if len(buy):
+            size = (cash[buy] * config.invest / close[i, buy] / config.lot).astype(np.int64) * config.lot
+            px = open_[i + 1, buy]
+            comm = size * config.commission * px
+            after = cash[buy] - size * px - comm
+            # 不足一手不下单；开盘价成交后现金为负则拒单
+            ok = (size >= config.lot) & (after >= 0.0)
+            buy, size, px, comm = buy[ok], size[ok], px[ok], comm[ok]
+            cash[buy], shares[buy], price[buy] = after[ok], size, px
+            fills.append((buy, i + 1, size, px, comm))
+
+        if len(sell):
+            size, px, cost = shares[sell], open_[i + 1, sell], price[sell]
+            comm = size * config.commission * px
+            cash[sell] = cash[sell] + (size * cost + size * (px - cost) * 1.0) - comm
+            shares[sell], price[sell] = 0, 0.0
+            fills.append((sell, i + 1, -size, px, comm))
+
+        done = np.concatenate([buy, sell])
+        cash_path[i + 1, done] = cash[done]
+        shares_path[i + 1, done] = shares[done]
+        price_path[i + 1, done] = price[done]
+        changed[i + 1, done] = True
+
+    cash_path = _forward_fill(cash_path, changed)
+    shares_path = _forward_fill(shares_path, changed)
+    price_path = _forward_fill(price_path, changed)
+    # 与 backtrader 计算账户价值的运算顺序相同
+    unrealized = shares_path * (close - price_path) * 1.0
+    equity = cash_path + ((shares_path * close - unrealized) / 1.0 + unrealized)
+    valid = np.arange(n)[:, None] < counts[None, :]
+    equity = np.where(valid, equity, np.nan)
+
+    if fills:
+        cols, rows, sizes, prices, comms = zip(*fills)
+        fills = pd.DataFrame({
+            "column": np.concatenate(cols),
+            "row": np.concatenate([np.full(len(c), r) for c, r in zip(cols, rows)]),
+            "size": np.concatenate(sizes),
+            "price": np.concatenate(prices),
+            "commission": np.concatenate(comms),
+        }).sort_values(["column", "row"], kind="stable", ignore_index=True)
+    else:
+        fills = pd.DataFrame(columns=["column", "row", "size", "price", "commission"])
+    return VectorResult(equity, np.where(valid, shares_path, 0), fills, float(config.cash))
+
+
+def run_frame(df: pd.DataFrame, signal: str, config: BrokerConfig | None = None, **params) -> VectorResult:
+    """单只股票日线 DataFrame（与传给 Cerebro 的数据相同）的向量化回测"""
+    close = df["close"].to_numpy(dtype=float)
+    entries, exits = SIGNAL_ARRAYS[signal](close, **params)
+    return simulate(entries, exits, df["open"].to_numpy(dtype=float), close, config)
+
+
+def run_panel(panel, signal: str, start=None, end=None, config: BrokerConfig | None = None,
+              **params) -> tuple[pd.DataFrame, VectorResult]:
+    """
+    面板中所有股票的向量化回测，每只股票按 panel.frame(symbol, start, end) 的序列独立计算
+
+    返回 (汇总表 symbol/bars/trades/final_value/return, VectorResult)；
+    VectorResult 中的数组已放回面板的日期行（无行情的日期 equity 为 NaN）。
+    """
+    rows = panel.date_slice(start, end)
+    close = np.asarray(panel["close"][rows])
+    order, counts = kernels.compact_columns(~np.isnan(close))
+    open_, close = (np.take_along_axis(np.asarray(panel[field][rows]), order, axis=0).astype(float)
+                    for field in ("open", "close"))
+    entries, exits = SIGNAL_ARRAYS[signal](close, **params)
+    result = simulate(entries, exits, open_, close, config, counts)
+
+    trades = np.bincount(result.fills["column"].to_numpy(dtype=np.int64)[result.fills["size"].to_numpy() < 0],
+                         minlength=close.shape[1]) if len(result.fills) else np.zeros(close.shape[1], dtype=int)
+    summary = pd.DataFrame({
+        "symbol": panel.symbols,
+        "bars": counts,
+        "trades": trades,
+        "final_value": result.final_value,
+        "return": result.total_return,
+    })
+    if len(result.fills):
+        cols = result.fills["column"].to_numpy(dtype=np.int64)
+        result.fills["row"] = order[result.fills["row"].to_numpy(dtype=np.int64), cols] + rows.start
+    result.equity = kernels.scatter_columns(result.equity, order, counts)
+    result.shares = kernels.scatter_columns(result.shares, order, counts, fill=0)
+    return summary, result
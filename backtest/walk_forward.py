@@ -0,0 +1,313 @@
+"""
+滚动前推（walk-forward）优化：训练窗口上选参数，紧随其后的测试窗口上评估
+
+    folds = rolling_folds(panel.dates, train=750, test=250)
+    result = walk_forward(panel, "martingale", grid(space), folds)
+
+在单一区间上挑出的最优参数（如 web 页面中的全样本收益）含有前视偏差；滚动前推中每个测试窗口的
+参数只用它之前的数据选出，各测试窗口首尾相接的收益才是样本外表现。
+
+窗口之间的复用：每只股票只读取一次完整区间的行情，指标在完整序列上只计算一次，每组参数只
+从头到尾回测一次（分层加仓策略所有参数在一次 run_params 中运行），记录每根K线的账户价值和
+卖出成交。各折训练/测试窗口的收益、回撤、交易数都从这条曲线上切片得到，不再重新回测。
+N 折的计算量是 参数组数 × 完整区间，而逐窗口独立回测是 N × 参数组数 × 训练窗口，
+且每个窗口都要重新准备数据、重新预热指标。
+
+窗口内的统计相当于策略一直在运行：窗口开始时指标已经预热，也可能已有持仓；收益按窗口开始前
+最后一根K线的账户价值计算。
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from dataclasses import dataclass
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from backtest import layer_engine, vector_engine
+from backtest.parallel import (cli_loader, is_backtrader_strategy, make_cerebro, map_panel, print_download_report,
+                               resolve_strategy, temporary_panel)
+from backtest.sweep import DEFAULT_SPACES, grid, ordered_periods, summarize
+from data.panel import Panel
+from data.universe import default_registry
+from strategy.feeds import SharedBars, shared_indicators
+from strategy.signals import as_signal_strategy
+
+
+@dataclass
+class Fold:
+    """一折：训练窗口 [train_start, test_start)，测试窗口 [test_start, test_end)；test_end 为 None 时到区间末尾"""
+
+    index: int
+    train_start: pd.Timestamp
+    test_start: pd.Timestamp
+    test_end: pd.Timestamp | None
+
+    def windows(self, dates: np.ndarray) -> tuple[int, int, int]:
+        """在一只股票的日期序列上的 (训练起点, 测试起点, 测试终点) 行号"""
+        a, b = np.searchsorted(dates, np.array([self.train_start, self.test_start], dtype="datetime64[ns]"))
+        c = len(dates) if self.test_end is None else np.searchsorted(dates, np.datetime64(self.test_end, "ns"))
+        return int(a), int(b), int(c)
+
+
+def rolling_folds(dates, train: int = 750, test: int = 250, step: int | None = None,
+                  anchored: bool = False) -> list[Fold]:
+    """
+    按交易日切分滚动窗口：训练 train 根K线，随后测试 test 根，每折向后移动 step（默认 test）
+
+    anchored=True 时训练窗口都从第一天开始（扩张窗口）。最后一折的测试窗口可能不足 test 根。
+    """
+    dates = pd.DatetimeIndex(dates)
+    step = step or test
+    folds = []
+    for i in range(0, len(dates) - train, step):
+        end = i + train + test
+        folds.append(Fold(len(folds), dates[0] if anchored else dates[i], dates[i + train],
+                          dates[end] if end < len(dates) else None))
+    return folds
+
+
+class EquityCurve(bt.Analyzer):
+    """每根K线的账户价值与卖出成交所在的K线序号（与数组引擎的 equity / fills 相同口径）"""
+
+    def start(self):
+        self.values = []
+        self.sells = []
+
+    def notify_cashvalue(self, cash, value):
+        self.values.append(value)
+
+    def notify_order(self, order):
+        if order.status == order.Completed and order.executed.size < 0:
+            self.sells.append(len(self.strategy) - 1)
+
+    def get_analysis(self):
+        return {"values": self.values, "sells": self.sells}
+
+
+def _engine_curves(result: vector_engine.VectorResult, columns: int) -> tuple[np.ndarray, list[np.ndarray]]:
+    fills = result.fills
+    sold = fills[fills["size"].to_numpy() < 0] if len(fills) else fills
+    sells = [sold["row"].to_numpy(dtype=np.int64)[sold["column"].to_numpy() == k] for k in range(columns)]
+    return result.equity, sells
+
+
+def equity_curves(df: pd.DataFrame, symbol: str, strategy_class, param_sets,
+                  engine: str = "auto") -> tuple[np.ndarray, list[np.ndarray]]:
+    """
+    一只股票上每组参数完整区间回测一次，返回 (账户价值 K线 × 参数组, 每组参数卖出成交的K线序号)
+
+    引擎的选择与 sweep.evaluate 相同；走 backtrader 的参数组合共享同一份 SharedBars。
+    """
+    if engine == "auto" and strategy_class in layer_engine.LAYERED_RULES:
+        return _engine_curves(layer_engine.run_params(df, strategy_class, param_sets), len(param_sets))
+
+    equity = np.full((len(df), len(param_sets)), np.nan)
+    sells = []
+    signals = [as_signal_strategy(strategy_class, params) if engine == "auto" else None for params in param_sets]
+    slow = [params for signal, params in zip(signals, param_sets) if signal is None]
+    bars = SharedBars(df, shared_indicators(symbol, df, [strategy_class] * len(slow), slow)) if slow else None
+    for k, (params, signal) in enumerate(zip(param_sets, signals)):
+        if signal is None:
+            cerebro = make_cerebro(bars.feed(), strategy_class, params)
+            cerebro.addanalyzer(EquityCurve, _name="curve")
+            curve = cerebro.run()[0].analyzers.curve.get_analysis()
+            equity[:, k] = curve["values"][-len(df):]
+            sells.append(np.asarray(curve["sells"], dtype=np.int64))
+        else:
+            _, name, signal_params = signal
+            values, (column_sells,) = _engine_curves(vector_engine.run_frame(df, name, **signal_params), 1)
+            equity[:, k] = values[:, 0]
+            sells.append(column_sells)
+    return equity, sells
+
+
+def window_stats(equity: np.ndarray, sells: list[np.ndarray], start: int, end: int,
+                 initial: float) -> dict[str, np.ndarray]:
+    """
+    曲线在 [start, end) 行上的收益率（%）、最大回撤（%）、卖出次数，每组参数一个值
+
+    基准为窗口开始前最后一根K线的账户价值（第一根K线之前为初始资金）。
+    """
+    base = equity[start - 1] if start > 0 else np.full(equity.shape[1], initial)
+    window = np.vstack([base, equity[start:end]])
+    peak = np.maximum.accumulate(window, axis=0)
+    return {
+        "return": (window[-1] - base) / base * 100,
+        "drawdown": (100 * (peak - window) / peak).max(axis=0),
+        "trades": np.array([np.count_nonzero((rows >= start) & (rows < end)) for rows in sells]),
+    }
+
+
+def walk_forward_symbol(panel: Panel, symbol: str, strategy, param_sets, folds, start=None, end=None,
+                        min_bars: int = 100, engine: str = "auto") -> tuple[list[dict], int]:
+    """
+    一只股票的所有折（map_panel 的任务函数）
+
+    每组参数完整回测一次后，每折产出训练窗口与测试窗口上所有参数组合的统计行
+    （phase 为 "train" / "test"）；训练窗口不足 min_bars 根或测试窗口为空的折跳过。
+    返回 (统计行, 实际回测的K线数)。
+    """
+    df = panel.frame(symbol, start, end)
+    if len(df) == 0:
+        return [], 0
+    dates = df["date"].to_numpy(dtype="datetime64[ns]")
+    equity, sells = equity_curves(df, symbol, resolve_strategy(strategy), param_sets, engine)
+    initial = vector_engine.BrokerConfig().cash
+    rows = []
+    for fold in folds:
+        a, b, c = fold.windows(dates)
+        if b - a < min_bars or c <= b:
+            continue
+        for phase, lo, hi in (("train", a, b), ("test", b, c)):
+            stats = window_stats(equity, sells, lo, hi, initial)
+            rows.extend({**params, "fold": fold.index, "phase": phase, "symbol": symbol, "bars": hi - lo,
+                         **{key: float(values[k]) for key, values in stats.items()}}
+                        for k, params in enumerate(param_sets))
+    return rows, len(df) * len(param_sets)
+
+
+@dataclass
+class WalkForwardResult:
+    """滚动前推结果；cost 与 independent_cost 的单位为回测的K线数"""
+
+    folds: pd.DataFrame         # 每折（按股票选参时每折每只股票）：选出的参数、训练得分、测试窗口统计
+    oos: pd.DataFrame           # 每只股票：各测试窗口首尾相接的样本外收益，与同一区间上事后最优参数的收益
+    table: pd.DataFrame         # 所有 (折, 阶段, 参数组合, 股票) 的统计行
+    cost: int
+    independent_cost: int
+
+    @property
+    def saved(self) -> float:
+        """相对逐窗口独立回测节省的计算量比例"""
+        return 1 - self.cost / self.independent_cost if self.independent_cost else 0.0
+
+    def report(self) -> str:
+        lines = [self.folds.to_string(index=False), "",
+                 self.oos.to_string(index=False, float_format=lambda x: f"{x:+.1f}"), "",
+                 f"样本外平均收益 {self.oos['oos_return'].mean():+.1f}%，"
+                 f"事后最优参数平均收益 {self.oos['hindsight_return'].mean():+.1f}%",
+                 f"实际计算 {self.cost:,} 根K线，逐窗口独立回测需 {self.independent_cost:,} 根，节省 {self.saved:.1%}"]
+        return "\n".join(lines)
+
+
+def _select(train: pd.DataFrame, names, metric: str, per_symbol: bool) -> pd.DataFrame:
+    """每折（per_symbol 时每折每只股票）训练窗口上 metric 最大的参数组合"""
+    keys = ["fold", "symbol"] if per_symbol else ["fold"]
+    chosen = []
+    for key, rows in train.groupby(keys, sort=True):
+        ranked = summarize(rows, names).sort_values(metric, ascending=False, kind="stable")
+        best = ranked.to_dict("records")[0]
+        chosen.append({**dict(zip(keys, key if isinstance(key, tuple) else (key,))),
+                       **{name: best[name] for name in names}, "train_score": float(best[metric])})
+    return pd.DataFrame(chosen)
+
+
+def walk_forward(panel: Panel, strategy, param_sets, folds=None, symbols=None, start=None, end=None,
+                 metric: str = "mean_return", per_symbol: bool = False, min_bars: int = 100,
+                 workers: int | None = None, engine: str = "auto", train: int = 750,
+                 test: int = 250) -> WalkForwardResult:
+    """
+    滚动前推优化
+
+    folds 默认为 rolling_folds(区间内交易日, train, test)。每折在训练窗口上按 summarize() 的
+    metric 列（越大越好）选参数：默认所有股票共用一组参数，per_symbol=True 时每只股票单独选；
+    再取该参数在测试窗口上的统计。每只股票一个任务，按 map_panel 并行。
+
+    区间内交易日不足 train + 1 根（切不出一折），或所有股票在每折的训练窗口都不足 min_bars 根
+    （没有可选参数的折）时抛出 ValueError。
+    """
+    strategy_class = resolve_strategy(strategy)
+    if not is_backtrader_strategy(strategy_class):
+        raise ValueError("滚动前推只支持 backtrader 策略类")
+    param_sets = [dict(params) for params in param_sets]
+    names = list(param_sets[0])
+    symbols = list(panel.symbols if symbols is None else symbols)
+    if folds is None:
+        dates = panel.dates[panel.date_slice(start, end)]
+        folds = rolling_folds(dates, train, test)
+        if not folds:
+            raise ValueError(f"区间内只有 {len(dates)} 个交易日，至少需要 train + 1 = {train + 1} 个"
+                             f"才能切出一折（训练 {train} 根、测试最多 {test} 根）")
+    if not folds:
+        raise ValueError("folds 为空")
+
+    tasks = [(symbol, strategy_class, param_sets, folds, start, end, min_bars, engine) for symbol in symbols]
+    rows, cost = [], 0
+    for symbol_rows, simulated in map_panel(panel, walk_forward_symbol, tasks, workers):
+        rows.extend(symbol_rows)
+        cost += simulated
+    table = pd.DataFrame(rows, columns=names + ["fold", "phase", "symbol", "bars", "return", "drawdown", "trades"])
+    table = table.sort_values(["fold", "phase", "symbol"], kind="stable",
+                              key=lambda col: col.map({s: i for i, s in enumerate(symbols)})
+                              if col.name == "symbol" else col, ignore_index=True)
+    train_rows, test_rows = table[table["phase"] == "train"], table[table["phase"] == "test"]
+    if train_rows.empty:
+        raise ValueError(f"{len(folds)} 折的训练窗口里没有股票达到 min_bars={min_bars} 根K线，无法选参数")
+
+    # 逐窗口独立回测：每折每只股票所有参数组合跑一遍训练窗口，选出的参数再跑一遍测试窗口
+    per_fold = train_rows.groupby(["fold", "symbol"])["bars"].first()
+    independent_cost = int(per_fold.sum() * len(param_sets)
+                           + test_rows.groupby(["fold", "symbol"])["bars"].first().sum())
+
+    chosen = _select(train_rows, names, metric, per_symbol)
+    keys = ["fold", "symbol"] if per_symbol else ["fold"]
+    picked = test_rows.merge(chosen, on=keys + names)
+    summary = picked.groupby(keys, sort=False).agg(
+        test_start=("fold", lambda f: folds[f.iloc[0]].test_start.date()),
+        symbols=("symbol", "count"),
+        test_return=("return", "mean"),
+        test_drawdown=("drawdown", "mean"),
+        test_trades=("trades", "mean"),
+    ).reset_index()
+    folds_table = chosen.merge(summary, on=keys)
+
+    # 样本外：各测试窗口收益连乘；事后最优：同样的测试窗口上，每组参数的连乘收益取最大
+    compound = lambda r: (np.prod(1 + r / 100) - 1) * 100
+    oos = picked.groupby("symbol", sort=False)["return"].agg(compound).rename("oos_return")
+    hindsight = test_rows.groupby(["symbol"] + names, sort=False)["return"].agg(compound)
+    best = hindsight.groupby(level="symbol", sort=False).idxmax()
+    oos_table = pd.DataFrame({
+        "folds": picked.groupby("symbol", sort=False).size(),
+        "oos_return": oos,
+        "hindsight_return": hindsight.groupby(level="symbol", sort=False).max(),
+        "hindsight_params": best.map(lambda key: dict(zip(names, key[1:]))),
+    }).reindex([s for s in symbols if s in oos.index]).rename_axis("symbol").reset_index()
+
+    return WalkForwardResult(folds_table, oos_table, table, cost, independent_cost)
+
+
+def main(strategy="martingale", provider=None, limit=20, train=750, test=250, per_symbol=False, workers=None):
+    """
+    python -m backtest.walk_forward [策略] [数据源] [股票数] [训练K线数] [测试K线数]：沪深300 前 limit 只、2014 年至今
+
+    数据源默认取 ASTOCK_PROVIDER（见 cli_loader），离线数据源不写入本地缓存。
+    """
+    loader = cli_loader(provider)
+    symbols = [code for code, _ in default_registry().stocks("HS300")[:limit]]
+    param_sets = grid(DEFAULT_SPACES[strategy], where=ordered_periods)
+    with temporary_panel(loader, symbols, "2014-01-01") as (panel, report):
+        print_download_report(report)
+        if panel is None:
+            return None
+        started = time.perf_counter()
+        try:
+            result = walk_forward(panel, strategy, param_sets, start="2014-01-01", train=train, test=test,
+                                  per_symbol=per_symbol, workers=workers)
+        except ValueError as e:
+            print(e)
+            return None
+        print(f"{strategy}: {len(param_sets)} 组参数 × {len(result.folds['fold'].unique())} 折，"
+              f"耗时 {time.perf_counter() - started:.1f}s")
+    print(result.report())
+    return result
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(args[0] if args else "martingale", args[1] if len(args) > 1 else None,
+         int(args[2]) if len(args) > 2 else 20, int(args[3]) if len(args) > 3 else 750,
+         int(args[4]) if len(args) > 4 else 250)
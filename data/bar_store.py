@@ -0,0 +1,185 @@
+"""日线数据本地缓存：按 (复权方式, 股票代码) 分文件存储为 Parquet，另存后复权因子。"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+
+# 默认缓存目录，可用环境变量 ASTOCK_CACHE_DIR 覆盖
+DEFAULT_CACHE_DIR = Path(os.environ.get("ASTOCK_CACHE_DIR", Path(__file__).resolve().parent / "cache"))
+
+ONE_DAY = timedelta(days=1)
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+
+class BarStore:
+    """
+    持久化日线缓存
+
+    目录结构: <root>/<adjust>/<symbol>.parquet，另有同名 .json 记录已覆盖的日期区间。
+    AShareDataLoader 以 <缓存目录>/<数据源名称> 为 root，各数据源的缓存互相隔离。
+    覆盖区间记录的是"已经向数据源请求过"的范围（含停牌、节假日），
+    这样重复请求同一区间时不会因为没有K线而反复访问网络。
+
+    复权数据不直接缓存：只保存不复权K线 (<root>/none) 与后复权因子 (<root>/factors)，
+    读取时用 adjust_prices 在本地还原，避免前复权价格随除权除息日整体变化而过期。
+    """
+
+    def __init__(self, root: str | Path | None = None):
+        self.root = Path(root) if root else DEFAULT_CACHE_DIR
+
+    def _path(self, symbol: str, adjust: str) -> Path:
+        return self.root / (adjust or "none") / f"{symbol}.parquet"
+
+    def _meta_path(self, symbol: str, adjust: str) -> Path:
+        return self._path(symbol, adjust).with_suffix(".json")
+
+    def coverage(self, symbol: str, adjust: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+        """返回已缓存的 (起始日, 结束日)，无缓存时返回 None"""
+        meta_path = self._meta_path(symbol, adjust)
+        if not meta_path.exists() or not self._path(symbol, adjust).exists():
+            return None
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        return pd.Timestamp(meta["start"]), pd.Timestamp(meta["end"])
+
+    def missing_ranges(self, symbol: str, adjust: str, start, end) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """计算 [start, end] 中尚未缓存的区间，保证合并后覆盖区间仍然连续"""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        covered = self.coverage(symbol, adjust)
+        if covered is None:
+            return [(start, end)]
+
+        cov_start, cov_end = covered
+        ranges = []
+        if start < cov_start:
+            ranges.append((start, cov_start - ONE_DAY))
+        if end > cov_end:
+            ranges.append((cov_end + ONE_DAY, end))
+        return ranges
+
+    def read(self, symbol: str, adjust: str, start=None, end=None) -> pd.DataFrame:
+        """读取缓存，按日期区间过滤"""
+        path = self._path(symbol, adjust)
+        if not path.exists():
+            return pd.DataFrame()
+
+        filters = []
+        if start is not None:
+            filters.append(("date", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("date", "<=", pd.Timestamp(end)))
+        df = pd.read_parquet(path, filters=filters or None)
+        return df.reset_index(drop=True)
+
+    def write(self, symbol: str, adjust: str, df: pd.DataFrame, start, end):
+        """合并写入新数据，并扩展覆盖区间"""
+        path = self._path(symbol, adjust)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        # 当天的K线可能尚未收盘，不计入覆盖区间，下次请求时会重新拉取
+        today = pd.Timestamp(datetime.now().date())
+        end = min(end, today - ONE_DAY)
+
+        existing = self.read(symbol, adjust)
+        merged = pd.concat([existing, df], ignore_index=True) if len(existing) else df
+        if len(merged) == 0:
+            return
+        merged = merged.drop_duplicates("date", keep="last").sort_values("date")
+        merged.reset_index(drop=True).to_parquet(path, index=False)
+
+        covered = self.coverage(symbol, adjust)
+        if covered is not None:
+            start, end = min(start, covered[0]), max(end, covered[1])
+        if end < start:
+            return
+        meta = {"start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d")}
+        self._meta_path(symbol, adjust).write_text(json.dumps(meta), encoding="utf-8")
+
+    def _factor_path(self, symbol: str) -> Path:
+        return self.root / "factors" / f"{symbol}.parquet"
+
+    def read_factors(self, symbol: str) -> pd.DataFrame | None:
+        """读取后复权因子表 (date, hfq_factor)，无缓存时返回 None"""
+        path = self._factor_path(symbol)
+        if not path.exists():
+            return None
+        return pd.read_parquet(path)
+
+    def write_factors(self, symbol: str, factors: pd.DataFrame):
+        """整表覆盖写入后复权因子（因子表很小，每次同步全量替换）"""
+        path = self._factor_path(symbol)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        factors.to_parquet(path, index=False)
+
+    def _quarantine_path(self, symbol: str) -> Path:
+        return self.root / "quarantine" / f"{symbol}.parquet"
+
+    def write_quarantine(self, symbol: str, rows: pd.DataFrame):
+        """追加入库清洗时被隔离的K线（按股票分文件，并发入库时互不干扰）"""
+        if len(rows) == 0:
+            return
+        path = self._quarantine_path(symbol)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows = rows.assign(symbol=symbol)
+        if path.exists():
+            rows = pd.concat([pd.read_parquet(path), rows], ignore_index=True)
+            rows = rows.drop_duplicates(["date", "reason"], keep="last")
+        rows.to_parquet(path, index=False)
+
+    def read_quarantine(self, symbols=None) -> pd.DataFrame:
+        """读取隔离表，symbols 为空时返回全部"""
+        folder = self.root / "quarantine"
+        if symbols is None:
+            paths = sorted(folder.glob("*.parquet")) if folder.exists() else []
+        else:
+            paths = [p for p in (self._quarantine_path(s) for s in symbols) if p.exists()]
+        if not paths:
+            return pd.DataFrame()
+        return pd.concat([pd.read_parquet(p) for p in paths], ignore_index=True)
+
+    def symbols(self, adjust: str = "") -> list[str]:
+        """已缓存的股票代码"""
+        folder = self.root / (adjust or "none")
+        return sorted(p.stem for p in folder.glob("*.parquet")) if folder.exists() else []
+
+    def clear(self, symbol: str, adjust: str):
+        """删除某只股票的缓存"""
+        for path in (self._path(symbol, adjust), self._meta_path(symbol, adjust)):
+            if path.exists():
+                path.unlink()
+
+
+def adjust_prices(raw: pd.DataFrame, factors: pd.DataFrame, adjust: str = "qfq") -> pd.DataFrame:
+    """
+    用后复权因子把不复权K线还原为复权价格
+
+    hfq: 价格 × 当日因子
+    qfq: 价格 × 当日因子 / 最新因子（每出现新的除权除息日，历史价格整体重算）
+    成交量不做调整。
+    """
+    if not adjust or len(raw) == 0:
+        return raw
+
+    factors = factors.sort_values("date")
+    dates = raw[["date"]].astype("datetime64[ns]")
+    factor_table = factors[["date", "hfq_factor"]].astype({"date": "datetime64[ns]", "hfq_factor": float})
+    factor = pd.merge_asof(dates, factor_table, on="date", direction="backward")["hfq_factor"]
+    # 早于第一条因子记录的K线沿用第一条因子
+    factor = factor.fillna(factor_table["hfq_factor"].iloc[0]).to_numpy()
+    if adjust == "qfq":
+        factor = factor / factor_table["hfq_factor"].iloc[-1]
+    elif adjust != "hfq":
+        raise ValueError(f"不支持的复权方式: {adjust}")
+
+    adjusted = raw.copy()
+    for col in PRICE_COLUMNS:
+        if col in adjusted.columns:
+            adjusted[col] = adjusted[col] * factor
+    return adjusted
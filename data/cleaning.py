@@ -0,0 +1,102 @@
+"""入库清洗：一次性向量化检查日线，异常行写入隔离表而不是在每次读取时重复过滤。"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from data.bar_store import adjust_prices
+from data.universe import board_of
+
+
+# 创业板注册制改革后涨跌幅放宽到 20%
+CHINEXT_REFORM_DATE = np.datetime64("2020-08-24")
+# 1996-12-16 起沪深两市实行涨跌停制度
+PRICE_LIMIT_START = np.datetime64("1996-12-16")
+# 涨跌停价按分取整、复权因子存在舍入，留 1% 余量
+JUMP_TOLERANCE = 0.01
+# 新股上市初期（前5个交易日）不设或放宽涨跌幅
+NEW_LISTING_DAYS = 5
+# 开高低收互相校验时允许的舍入误差
+PRICE_TOLERANCE = 1e-6
+
+QUARANTINE_REASONS = ("bad_price", "zero_volume", "limit_jump")
+
+
+def limit_band(symbol: str, dates) -> np.ndarray:
+    """每个交易日的涨跌幅限制（小数），无涨跌停限制的日期为 inf"""
+    days = np.asarray(dates, dtype="datetime64[D]")
+    board = board_of(symbol)
+    if board == "科创板":
+        band = np.full(len(days), 0.2)
+    elif board == "创业板":
+        band = np.where(days >= CHINEXT_REFORM_DATE, 0.2, 0.1)
+    elif board == "北交所":
+        band = np.full(len(days), 0.3)
+    else:
+        band = np.full(len(days), 0.1)
+    return np.where(days >= PRICE_LIMIT_START, band, np.inf)
+
+
+def clean_bars(df: pd.DataFrame, symbol: str, factors: pd.DataFrame | None = None,
+               previous: pd.DataFrame | None = None, adjusted: bool = False,
+               following: pd.DataFrame | None = None,
+               new_listing: bool | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    向量化清洗一段不复权日线，返回 (干净数据, 隔离数据)
+
+    隔离原因（reason 列）:
+    - bad_price: 价格缺失或非正、最高价低于最低价、开盘/收盘价超出高低价范围
+    - zero_volume: 成交量为 0（停牌日的占位数据）
+    - limit_jump: 后复权收盘价单日涨跌幅超出该板块涨跌停范围、且次日反向越界跳回（孤立的错误报价）。
+      持续性的跳变（通常是缺失的除权因子）不隔离：删掉一根K线并不能修复之后的序列。
+
+    factors 为后复权因子，用于剔除除权除息造成的价格跳变；df 已是复权价格时传 adjusted=True，
+    两者都没有时跳过涨跌幅检查。
+    previous 为这段数据之前已入库的最后一根K线，用于检查第一根K线的涨跌幅；
+    following 为这段数据之后已入库的第一根K线（向前补下载时），用于检查衔接处的涨跌幅。
+    new_listing 为真时视为新股，前 NEW_LISTING_DAYS 根K线不检查涨跌幅；默认为 previous 为空。
+    """
+    if len(df) == 0:
+        return df, df.assign(reason=pd.Series(dtype=object))
+    df = df.sort_values("date").drop_duplicates("date", keep="last").reset_index(drop=True)
+
+    o, h, l, c = (df[col].to_numpy(dtype=float) for col in ("open", "high", "low", "close"))
+    valid_price = (o > 0) & (h > 0) & (l > 0) & (c > 0)
+    consistent = ((h >= l) & (c <= h * (1 + PRICE_TOLERANCE)) & (c >= l * (1 - PRICE_TOLERANCE))
+                  & (o <= h * (1 + PRICE_TOLERANCE)) & (o >= l * (1 - PRICE_TOLERANCE)))
+    bad_price = ~(valid_price & consistent)
+    zero_volume = ~(df["volume"].to_numpy(dtype=float) > 0)
+
+    bad_jump = np.zeros(len(df), dtype=bool)
+    checked = ~bad_price & ~zero_volume
+    can_check = adjusted or (factors is not None and len(factors) > 0)
+    if can_check and checked.any():
+        has_previous = previous is not None and len(previous) > 0
+        has_following = following is not None and len(following) > 0
+        if new_listing is None:
+            new_listing = not has_previous
+        parts = [previous.tail(1)] if has_previous else []
+        parts += [df[checked]] + ([following.head(1)] if has_following else [])
+        series = pd.concat(parts, ignore_index=True) if len(parts) > 1 else df[checked]
+        dates = series["date"].to_numpy()[int(has_previous):]
+        if not adjusted:
+            series = adjust_prices(series[["date", "close"]], factors, "hfq")
+        close = series["close"].to_numpy(dtype=float)
+        ret = close[1:] / close[:-1] - 1
+        if not has_previous:
+            ret = np.r_[np.nan, ret]
+
+        band = limit_band(symbol, dates) + JUMP_TOLERANCE
+        with np.errstate(invalid="ignore"):
+            out = np.abs(ret) > band
+        # 尖刺：今天越界、明天反向越界，只隔离今天（following 已入库，不参与隔离）
+        spike = out & np.r_[out[1:], False] & (np.sign(ret) != np.r_[np.sign(ret[1:]), 0])
+        if new_listing:
+            spike[:NEW_LISTING_DAYS] = False
+        bad_jump[checked] = spike[:checked.sum()]
+
+    reason = np.select([bad_price, zero_volume, bad_jump], QUARANTINE_REASONS, default="")
+    flagged = reason != ""
+    quarantine = df[flagged].assign(reason=reason[flagged]).reset_index(drop=True)
+    return df[~flagged].reset_index(drop=True), quarantine
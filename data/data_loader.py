@@ -2,10 +2,19 @@
 
 from __future__ import annotations
 from datetime import datetime
+from pathlib import Path
 
-import akshare as ak
 import pandas as pd
 
+from data.bar_store import DEFAULT_CACHE_DIR, ONE_DAY, BarStore, adjust_prices
+from data.cleaning import clean_bars
+from data.downloader import InsufficientData, RetryPolicy, TokenBucket, download_many
+from data.fundamentals import SnapshotCache, mark_missing
+from data.minute_store import MinuteBarStore
+from data.panel import write_panel
+from data.providers import get_provider
+from data.trade_calendar import TradingCalendar
+
 
 # 测试用的大盘股列表
 TEST_STOCKS = [
@@ -21,75 +30,229 @@ TEST_STOCKS = [
     ("002594", "比亚迪"),
 ]
 
-
 class AShareDataLoader:
     """A股数据加载器"""
 
-    def __init__(self):
-        self.cache = {}
+    def __init__(self, cache_dir: str | None = None, use_cache: bool = True,
+                 provider=None, rate_limit: float = 5.0):
+        # 数据源：DataProvider 实例或名称（akshare/tushare/fixture/fake），默认取环境变量 ASTOCK_PROVIDER
+        self.provider = get_provider(provider) if provider is None or isinstance(provider, str) else provider
+        # 日线缓存：已下载的区间直接从本地读取，只对缺失区间访问网络；
+        # 每个数据源一个子目录，假数据、夹具数据不会被当作真实行情读出
+        self.cache = BarStore(Path(cache_dir or DEFAULT_CACHE_DIR) / self.provider.name) if use_cache else None
+        self.minutes = MinuteBarStore(self.cache.root) if use_cache else None
+        # 所有网络请求共享一个令牌桶，批量并发下载时也不会超过 rate_limit 次/秒
+        self.limiter = TokenBucket(rate_limit) if rate_limit else None
+
+    def _fetch_bars(self, symbol: str, start: str, end: str, adjust: str = "qfq") -> pd.DataFrame:
+        if self.limiter:
+            self.limiter.acquire()
+        return self.provider.bars(symbol, start, end, adjust)
+
+    def _fetch_factors(self, symbol: str) -> pd.DataFrame:
+        if self.limiter:
+            self.limiter.acquire()
+        return self.provider.factors(symbol)
+
+    def _refresh_factors(self, symbol: str) -> pd.DataFrame:
+        factors = self._fetch_factors(symbol)
+        self.cache.write_factors(symbol, factors)
+        return factors
+
+    def _sync_range(self, symbol: str, start, end) -> tuple[int, pd.DataFrame | None]:
+        """
+        下载缓存中缺失的不复权区间，清洗后入库
+
+        返回 (新增K线数量, 后复权因子)。有新K线时因子会刷新（可能出现新的除权除息日），
+        刷新失败时返回的因子为 None。
+        """
+        # 本次同步前没有任何缓存时，下载的第一段才可能是新股上市初期
+        covered = self.cache.coverage(symbol, "")
+        fetched = [(missing_start, missing_end,
+                    self._fetch_bars(symbol, missing_start.strftime("%Y%m%d"),
+                                     missing_end.strftime("%Y%m%d"), adjust=""))
+                   for missing_start, missing_end in self.cache.missing_ranges(symbol, "", start, end)]
+
+        factors = self.cache.read_factors(symbol)
+        if any(len(df) for _, _, df in fetched) or factors is None:
+            try:
+                factors = self._refresh_factors(symbol)
+            except Exception as e:
+                print(f"获取 {symbol} 复权因子失败: {e}")
+                factors = None
+
+        added = 0
+        for missing_start, missing_end, df in fetched:
+            if len(df):
+                # 入库时一次性清洗，异常K线写入隔离表，之后读取不再重复过滤
+                previous = self.cache.read(symbol, "", end=missing_start - ONE_DAY).tail(1)
+                # 向前补下载时，与已缓存的第一根K线衔接处也要检查
+                following = self.cache.read(symbol, "", start=missing_end + ONE_DAY).head(1)
+                df, quarantine = clean_bars(df, symbol, factors, previous, following=following,
+                                            new_listing=covered is None)
+                self.cache.write_quarantine(symbol, quarantine)
+            self.cache.write(symbol, "", df, missing_start, missing_end)
+            added += len(df)
+        return added, factors
+
+    def _load_bars(self, symbol: str, start: str, end: str, adjust: str = "qfq") -> pd.DataFrame:
+        """优先读取本地缓存，仅下载缺失的日期区间；复权价格由不复权K线和复权因子在本地还原"""
+        if self.cache is None:
+            return clean_bars(self._fetch_bars(symbol, start, end, adjust), symbol, adjusted=bool(adjust))[0]
 
-    def get_daily_bars(self, symbol: str, start: str = "20200101", end: str = None) -> pd.DataFrame:
-        """获取单只股票日线数据"""
-        # 转换symbol格式：600519 -> 1.600519 (上海) 或 0.000001 (深圳)
-        if symbol.startswith("6"):
-            ak_symbol = f"1.{symbol}"
-        else:
-            ak_symbol = f"0.{symbol}"
+        _, factors = self._sync_range(symbol, start, end)
+        raw = self.cache.read(symbol, "", start, end)
+        if not adjust:
+            return raw
+        if factors is None:
+            # 因子不可用时不能混用新旧复权口径，直接下载复权数据
+            return clean_bars(self._fetch_bars(symbol, start, end, adjust), symbol, adjusted=True)[0]
+        return adjust_prices(raw, factors, adjust)
 
+    def sync(self, symbols, start: str = "20050101", end: str = None) -> pd.DataFrame:
+        """
+        增量同步日线缓存（适合每日收盘后运行）
+
+        已缓存的股票只下载最后一根K线之后的数据，有新K线时刷新复权因子；
+        前复权价格在读取时按最新因子重算，因此新的除权除息日不会留下过期数据。
+        返回每只股票的新增K线数与新出现的除权除息日。
+        """
+        if self.cache is None:
+            raise ValueError("增量同步需要启用本地缓存")
         end = end or datetime.now().strftime("%Y%m%d")
 
+        report = []
+        for symbol in symbols:
+            covered = self.cache.coverage(symbol, "")
+            sync_start = covered[0] if covered else start
+            try:
+                old_factors = self.cache.read_factors(symbol)
+                added, factors = self._sync_range(symbol, sync_start, end)
+                if factors is None:
+                    raise RuntimeError("复权因子获取失败")
+                if old_factors is None:
+                    new_ex_dates = []
+                else:
+                    known = set(pd.to_datetime(old_factors["date"]))
+                    new_ex_dates = [d for d in factors["date"] if d not in known]
+                report.append({"symbol": symbol, "new_bars": added,
+                               "new_ex_dates": new_ex_dates, "error": None})
+            except Exception as e:
+                print(f"同步 {symbol} 失败: {e}")
+                report.append({"symbol": symbol, "new_bars": 0, "new_ex_dates": [], "error": str(e)})
+        return pd.DataFrame(report)
+
+    def clean_cache(self, symbols=None) -> pd.DataFrame:
+        """
+        对已缓存的全部历史重新执行入库清洗（用于清洗规则上线前建立的缓存）
+
+        返回本次新隔离的K线。
+        """
+        if self.cache is None:
+            raise ValueError("清洗缓存需要启用本地缓存")
+        quarantined = []
+        for symbol in symbols if symbols is not None else self.cache.symbols(""):
+            covered = self.cache.coverage(symbol, "")
+            if covered is None:
+                continue
+            clean, quarantine = clean_bars(self.cache.read(symbol, ""), symbol, self.cache.read_factors(symbol))
+            if len(quarantine):
+                self.cache.clear(symbol, "")
+                self.cache.write(symbol, "", clean, *covered)
+                self.cache.write_quarantine(symbol, quarantine)
+                quarantined.append(quarantine.assign(symbol=symbol))
+        return pd.concat(quarantined, ignore_index=True) if quarantined else pd.DataFrame()
+
+    def get_daily_bars(self, symbol: str, start: str = "20200101", end: str = None,
+                       adjust: str = "qfq") -> pd.DataFrame:
+        """获取单只股票日线数据（优先读取本地缓存）"""
         try:
-            df = ak.stock_zh_a_hist(symbol=symbol, period="daily", 
-                                   start_date=start, end_date=end, adjust="qfq")
-            
-            # 标准化字段
-            rename_map = {
-                "日期": "date",
-                "开盘": "open",
-                "最高": "high",
-                "最低": "low",
-                "收盘": "close",
-                "成交量": "volume",
-            }
-            df = df.rename(columns=rename_map)
-            if "date" in df.columns:
-                df["date"] = pd.to_datetime(df["date"])
-                df = df.sort_values("date").reset_index(drop=True)
-            
-            # 过滤异常数据
-            if "close" in df.columns and "date" in df.columns:
-                # 转换日期并排序
-                df["date"] = pd.to_datetime(df["date"])
-                df = df.sort_values("date").reset_index(drop=True)
-                
-                # 先按日期过滤，确保只保留指定日期之后的数据
-                try:
-                    start_dt = pd.to_datetime(start) if isinstance(start, str) else start
-                    if start_dt:
-                        df = df[df["date"] >= start_dt]
-                except:
-                    pass
-                
-                # 过滤负价格和接近0的价格
-                df = df[df["close"] > 0]
-                
-                # 连续过滤异常波动（使用更宽松的阈值30%）
-                prev = df["close"].shift(1)
-                ratio = df["close"] / prev
-                # 过滤单日涨跌幅超过40%的数据（可能是数据错误）
-                # 但保留NaN（第一行没有prev）
-                mask = (ratio > 0.6) | (ratio.isna()) | (ratio < 1.4)
-                df = df[mask].reset_index(drop=True)
-                
-                # 只保留足够的数据
-                if len(df) < 50:
-                    return pd.DataFrame()
-            
-            return df
+            return self._get_daily_bars(symbol, start, end, adjust)
+        except InsufficientData:
+            return pd.DataFrame()
         except Exception as e:
             print(f"获取 {symbol} 数据失败: {e}")
             return pd.DataFrame()
+
+    def _get_daily_bars(self, symbol: str, start: str = "20200101", end: str = None,
+                        adjust: str = "qfq") -> pd.DataFrame:
+        """get_daily_bars 的实现：失败时抛出异常，数据不足时抛出 InsufficientData"""
+        end = end or datetime.now().strftime("%Y%m%d")
+
+        # 数据在入库时已清洗（见 data.cleaning），这里直接使用
+        df = self._load_bars(symbol, start, end, adjust)
+        if len(df) < 50:
+            raise InsufficientData(f"仅有 {len(df)} 根K线")
+        return df
+
+    def get_daily_bars_many(self, symbols, start: str = "20200101", end: str = None,
+                            adjust: str = "qfq", max_workers: int = 8,
+                            retry: RetryPolicy | None = None):
+        """
+        并发获取多只股票日线
+
+        请求经由共享令牌桶限流，网络错误按指数退避加抖动重试。
+        返回 ({symbol: DataFrame}, DownloadReport)，失败的股票及原因记录在 report.failed 中。
+        """
+        return download_many(lambda symbol: self._get_daily_bars(symbol, start, end, adjust),
+                             symbols, max_workers=max_workers, retry=retry)
     
+    def build_panel(self, symbols, path, start: str = "20050101", end: str = None,
+                    adjust: str = "qfq", max_workers: int = 8):
+        """
+        下载（或读取缓存）多只股票日线并写成内存映射面板
+
+        面板的日期轴是交易日历，所有股票按同一组交易日对齐，停牌日价格为 NaN。
+        返回 (Panel, DownloadReport)；之后用 Panel(path) 直接打开，无需再读取任何 DataFrame。
+        没有任何股票下载成功（如网络不可用）或区间内没有交易日时不写面板，Panel 为 None，
+        失败原因见 DownloadReport。
+        """
+        frames, report = self.get_daily_bars_many(symbols, start, end, adjust, max_workers=max_workers)
+        dates = TradingCalendar.load().sessions(start, end or datetime.now().strftime("%Y%m%d"))
+        if not frames or len(dates) == 0:
+            return None, report
+        return write_panel(path, frames, dates=dates), report
+
+    def _minute_chunks(self, symbol: str, start, end, period: str, chunk_days: int):
+        """按 chunk_days 个交易日一段逐段下载分钟线（生成器，一次只持有一段）"""
+        sessions = TradingCalendar.load().sessions(start, end)
+        for i in range(0, len(sessions), chunk_days):
+            window = sessions[i:i + chunk_days]
+            if self.limiter:
+                self.limiter.acquire()
+            yield self.provider.minute_bars(symbol, str(window[0]), str(window[-1]), period)
+
+    def ingest_minute_bars(self, symbol: str, start: str, end: str = None, period: str = "1",
+                           chunk_days: int = 20) -> int:
+        """
+        流式下载分钟线并写入按月分区的本地存储，返回写入的行数
+
+        已入库的股票从最后一根分钟线所在交易日继续下载。
+        """
+        if self.minutes is None:
+            raise ValueError("分钟线入库需要启用本地缓存")
+        end = end or datetime.now().strftime("%Y%m%d")
+        last = self.minutes.last_timestamp(symbol, period)
+        if last is not None:
+            start = max(pd.Timestamp(start), last.normalize())
+        written = 0
+        for chunk in self._minute_chunks(symbol, start, end, period, chunk_days):
+            written += self.minutes.append(symbol, chunk, period)
+        return written
+
+    def get_minute_bars(self, symbol: str, start: str, end: str = None, minutes: int = 5,
+                        period: str = "1") -> pd.DataFrame:
+        """
+        获取 minutes 分钟线：先增量入库 period 分钟线，再逐月读取并聚合
+
+        minutes 须为 period 的整数倍，如 period='1' 时可取 1/5/15/30/60/240。
+        """
+        if minutes % int(period):
+            raise ValueError(f"{minutes} 分钟线无法由 {period} 分钟线聚合得到")
+        self.ingest_minute_bars(symbol, start, end, period)
+        end_of_day = pd.Timestamp(end or datetime.now().strftime("%Y%m%d")) + pd.Timedelta(hours=23, minutes=59)
+        return self.minutes.read(symbol, start, end_of_day, minutes, period)
+
     def get_backtrader_data(self, symbol: str, start: str = "20200101", end: str = None):
         """获取backtrader-compatible的数据格式"""
         df = self.get_daily_bars(symbol, start, end)
@@ -107,69 +270,36 @@ class AShareDataLoader:
         df = df.sort_values('date').reset_index(drop=True)
         return df
 
-    def load_factor_universe(self) -> pd.DataFrame:
+    def load_factor_universe(self, symbols=None, ttl: float = 6 * 3600,
+                             refresh: bool = False) -> pd.DataFrame:
         """
-        加载选股因子数据库
-        使用简化版：基于已知的大盘股
+        加载选股因子数据库（全市场快照）
+
+        一次批量拉取全市场的市值、PE、股息率、ROE，本地缓存 ttl 秒。
+        缺失的因子保持为 NaN，并在 missing 列中注明，不再填充假设值。
+        symbols 不为空时只返回这些股票。
         """
-        result = []
-        
-        for code, name in TEST_STOCKS:
-            # 尝试获取实时数据
-            try:
-                df = ak.stock_individual_info_em(symbol=code)
-                
-                # 提取关键指标
-                info = {"symbol": code, "name": name}
-                
-                for _, row in df.iterrows():
-                    item = row.get("item", "")
-                    value = row.get("value", 0)
-                    
-                    if "总市值" in item:
-                        # 处理市值数据，如 "2.10万亿" -> 210000000000
-                        if "万亿" in str(value):
-                            info["market_cap"] = float(str(value).replace("万亿", "")) * 1e12
-                        elif "亿" in str(value):
-                            info["market_cap"] = float(str(value).replace("亿", "")) * 1e8
-                        else:
-                            info["market_cap"] = float(value) if value else 0
-                    elif "市盈率" in item:
-                        info["pe"] = float(value) if value and value != "--" else 0
-                    elif "股息" in item and "率" in item:
-                        info["dividend_yield"] = float(value.replace("%", ""))/100 if value and value != "--" else 0
-                    elif "净资产收益率" in item or "ROE" in item:
-                        info["roe"] = float(value.replace("%", "")) if value and value != "--" else 0
-                
-                # 如果没有获取到数据，给默认值
-                if "market_cap" not in info:
-                    info["market_cap"] = 1e11  # 假设1000亿
-                if "pe" not in info:
-                    info["pe"] = 15
-                if "dividend_yield" not in info:
-                    info["dividend_yield"] = 0.02
-                if "roe" not in info:
-                    info["roe"] = 15
-                    
-                result.append(info)
-            except Exception as e:
-                # 如果获取失败，使用默认值
-                result.append({
-                    "symbol": code,
-                    "name": name,
-                    "market_cap": 1e11,
-                    "pe": 15,
-                    "dividend_yield": 0.02,
-                    "roe": 15
-                })
-        
-        df = pd.DataFrame(result)
-        return df
+        snapshot_cache = None
+        snapshot = None
+        if self.cache is not None:
+            snapshot_cache = SnapshotCache(self.cache.root / "fundamentals.parquet", ttl)
+            if not refresh:
+                snapshot = snapshot_cache.get()
+
+        if snapshot is None:
+            if self.limiter:
+                self.limiter.acquire()
+            snapshot = mark_missing(self.provider.fundamentals())
+            if snapshot_cache is not None:
+                snapshot_cache.put(snapshot)
+
+        if symbols is not None:
+            snapshot = snapshot[snapshot["symbol"].isin(list(symbols))].reset_index(drop=True)
+        return snapshot
 
 
 def get_stock_name(symbol: str) -> str:
     """获取股票名称"""
-    for code, name in TEST_STOCKS:
-        if code == symbol:
-            return name
-    return symbol
\ No newline at end of file
+    from data.universe import default_registry
+
+    return default_registry().name(symbol)
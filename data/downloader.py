@@ -0,0 +1,124 @@
+"""批量下载工具：令牌桶限流、指数退避重试与线程池并发。"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+
+class TokenBucket:
+    """线程安全的令牌桶：平均每秒 rate 次请求，允许 burst 次突发"""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = burst or max(int(rate), 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+@dataclass
+class RetryPolicy:
+    """指数退避重试：第 n 次重试前等待 base_delay * 2^(n-1)，上限 max_delay，并乘以随机抖动"""
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    jitter: float = 0.5
+
+    def delay(self, attempt: int) -> float:
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return backoff * random.uniform(1 - self.jitter, 1)
+
+
+@dataclass
+class FetchFailure:
+    """单只股票下载失败的记录"""
+
+    symbol: str
+    error: str
+    attempts: int
+
+
+@dataclass
+class DownloadReport:
+    """批量下载结果汇总"""
+
+    succeeded: list[str] = field(default_factory=list)
+    failed: list[FetchFailure] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def failed_symbols(self) -> list[str]:
+        return [f.symbol for f in self.failed]
+
+    def to_frame(self) -> pd.DataFrame:
+        """失败明细表 (symbol, error, attempts)"""
+        return pd.DataFrame([vars(f) for f in self.failed], columns=["symbol", "error", "attempts"])
+
+    def summary(self) -> str:
+        return f"成功 {len(self.succeeded)} 只, 失败 {len(self.failed)} 只, 耗时 {self.elapsed:.1f}s"
+
+
+class InsufficientData(Exception):
+    """数据不足（不是网络错误，不重试）"""
+
+
+def download_many(fetch, symbols, max_workers: int = 8, retry: RetryPolicy | None = None):
+    """
+    并发执行 fetch(symbol)，返回 ({symbol: DataFrame}, DownloadReport)
+
+    fetch 抛出 InsufficientData 时直接记为失败；其它异常按 retry 策略重试。
+    """
+    retry = retry or RetryPolicy()
+    symbols = list(dict.fromkeys(symbols))  # 去重并保持顺序
+    report = DownloadReport()
+    frames = {}
+    started = time.monotonic()
+
+    def run(symbol):
+        for attempt in range(1, retry.max_attempts + 1):
+            try:
+                return fetch(symbol), attempt
+            except InsufficientData as e:
+                return e, attempt
+            except Exception as e:
+                if attempt == retry.max_attempts:
+                    return e, attempt
+                time.sleep(retry.delay(attempt))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run, symbol): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            result, attempts = future.result()
+            if isinstance(result, Exception):
+                report.failed.append(FetchFailure(symbol, f"{type(result).__name__}: {result}", attempts))
+            else:
+                frames[symbol] = result
+                report.succeeded.append(symbol)
+
+    # 按输入顺序返回，便于调用方展示
+    order = {symbol: i for i, symbol in enumerate(symbols)}
+    report.succeeded.sort(key=order.get)
+    report.failed.sort(key=lambda f: order[f.symbol])
+    report.elapsed = time.monotonic() - started
+    return {symbol: frames[symbol] for symbol in report.succeeded}, report
@@ -0,0 +1,74 @@
+"""全市场基本面快照：批量拉取、向量化单位解析与带有效期的本地缓存。"""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# 选股因子字段（与 FundamentalSelector 的输入一致）
+FACTOR_COLUMNS = ["market_cap", "pe", "dividend_yield", "roe"]
+
+UNIT_MULTIPLIERS = {"万亿": 1e12, "亿": 1e8, "万": 1e4, "%": 0.01}
+
+_NUMBER_PATTERN = r"^\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)\s*(万亿|亿|万|%)?\s*$"
+
+
+def parse_cn_number(values: pd.Series) -> pd.Series:
+    """
+    向量化解析带中文单位的数值列
+
+    "2.10万亿" -> 2.1e12, "350亿" -> 3.5e10, "3.5%" -> 0.035,
+    "--"、空串等无法解析的值 -> NaN；已经是数值类型的列原样转为 float。
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+
+    parts = values.astype(str).str.extract(_NUMBER_PATTERN)
+    number = pd.to_numeric(parts[0], errors="coerce")
+    multiplier = parts[1].map(UNIT_MULTIPLIERS).fillna(1.0)
+    return number * multiplier
+
+
+def mark_missing(df: pd.DataFrame, columns=FACTOR_COLUMNS) -> pd.DataFrame:
+    """
+    缺失值保持为 NaN（不再用假设值填充），并新增 missing 列列出缺失的字段名
+
+    例如 "pe,roe"；字段齐全时为空字符串。
+    """
+    df = df.copy()
+    isna = df[columns].isna().to_numpy()
+    names = np.array([f"{col}," for col in columns], dtype=object)
+    # 逐列拼接缺失字段名，避免逐行 apply
+    missing = np.full(len(df), "", dtype=object)
+    for i, name in enumerate(names):
+        missing = np.where(isna[:, i], missing + name, missing)
+    df["missing"] = pd.Series(missing, index=df.index).str.rstrip(",")
+    return df
+
+
+class SnapshotCache:
+    """单文件快照缓存：超过 ttl 秒视为过期"""
+
+    def __init__(self, path: str | Path, ttl: float):
+        self.path = Path(path)
+        self.ttl = ttl
+
+    def age(self) -> float | None:
+        """快照已存在的秒数，无快照时返回 None"""
+        if not self.path.exists():
+            return None
+        return time.time() - self.path.stat().st_mtime
+
+    def get(self) -> pd.DataFrame | None:
+        age = self.age()
+        if age is None or age > self.ttl:
+            return None
+        return pd.read_parquet(self.path)
+
+    def put(self, df: pd.DataFrame):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(self.path, index=False)
@@ -1,19 +1,25 @@
-"""获取沪深300成分股列表"""
-import akshare as ak
+"""获取沪深300成分股列表，保存为 data/hs300_stocks.csv"""
+from pathlib import Path
 
-# 获取沪深300成分股
-print("获取沪深300成分股...")
-df = ak.stock_hs300_stocks_symbol()
+import pandas as pd
 
-# 显示前几行
-print(df.head(10))
-print(f"\n总数: {len(df)}")
+from data.providers import get_provider
 
-# 清理数据
-df = df[['代码', '名称']].rename(columns={'代码': 'code', '名称': 'name'})
-df['code'] = df['code'].astype(str).str.zfill(6)
+CSV_PATH = Path(__file__).resolve().parent / "hs300_stocks.csv"
 
-# 保存
-df.to_csv('hs300_stocks.csv', index=False, encoding='utf-8')
-print(f"已保存到 hs300_stocks.csv")
-print(df.head(20))
\ No newline at end of file
+
+def fetch_hs300(provider=None, path=CSV_PATH):
+    """从数据源获取沪深300成分股并保存（provider 默认取 ASTOCK_PROVIDER）"""
+    provider = provider or get_provider()
+    print("获取沪深300成分股...")
+    df = pd.DataFrame(provider.constituents("000300"), columns=["code", "name"])
+    df["code"] = df["code"].astype(str).str.zfill(6)
+    df = df.drop_duplicates("code")
+
+    df.to_csv(path, index=False, encoding="utf-8")
+    print(f"已保存到 {path}，总数: {len(df)}")
+    return df
+
+
+if __name__ == "__main__":
+    print(fetch_hs300().head(20))
@@ -1,6 +1,6 @@
 """沪深300成分股列表 - 常用核心股票"""
 # 格式: (代码, 名称)
-# 这里包含沪深300中市值最大的50只，可扩展
+# 这里包含沪深300中市值较大的核心股票（已去重），可扩展
 
 HS300_CORE_STOCKS = [
     ("600519", "贵州茅台"),
@@ -28,7 +28,6 @@ HS300_CORE_STOCKS = [
     ("002415", "海康威视"),
     ("000651", "格力电器"),
     ("000002", "万科A"),
-    ("600030", "中信证券"),
     ("600104", "上汽集团"),
     ("600031", "三一重工"),
     ("600585", "海螺水泥"),
@@ -38,19 +37,10 @@ HS300_CORE_STOCKS = [
     ("600438", "通威股份"),
     ("601669", "中国电建"),
     ("600089", "特变电工"),
-    ("601288", "农业银行"),
-    ("601398", "工商银行"),
-    ("601939", "建设银行"),
-    ("601988", "中国银行"),
-    ("600000", "浦发银行"),
     ("600015", "华夏银行"),
     ("601229", "上海银行"),
     ("601818", "光大银行"),
     ("601928", "平安银行"),
-    ("600016", "民生银行"),
-    ("601328", "交通银行"),
-    ("601166", "兴业银行"),
-    ("600036", "招商银行"),
 ]
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+"""
+分钟线存储：分块流式入库，读取时按需聚合为更大周期
+
+目录结构: <root>/minute/<period>/<symbol>/<YYYY-MM>.parquet
+每个月一个分区文件。入库时一次只持有一个下载块和一个分区，读取时逐个分区聚合后再拼接，
+十年的 1 分钟线也只占用一个月分区的内存。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+MINUTE_COLUMNS = ["datetime", "open", "high", "low", "close", "volume", "amount"]
+
+# A股连续竞价时段：上午 9:30-11:30，下午 13:00-15:00，每天 240 根 1 分钟线
+MORNING_OPEN = 9 * 60 + 30
+AFTERNOON_OPEN = 13 * 60
+SESSION_MINUTES = 120
+MINUTES_PER_DAY = 240
+
+
+def session_minute(times) -> np.ndarray:
+    """
+    K线结束时间 -> 当日第几分钟（0..239）
+
+    9:31 为 0，11:30 为 119，13:01 为 120，15:00 为 239；
+    9:30 的开盘集合竞价并入第一分钟。
+    """
+    stamps = pd.DatetimeIndex(times)
+    minute_of_day = stamps.hour.to_numpy() * 60 + stamps.minute.to_numpy()
+    index = np.where(minute_of_day > AFTERNOON_OPEN,
+                     SESSION_MINUTES + minute_of_day - AFTERNOON_OPEN - 1,
+                     minute_of_day - MORNING_OPEN - 1)
+    return np.clip(index, 0, MINUTES_PER_DAY - 1)
+
+
+def aggregate_minutes(df: pd.DataFrame, minutes: int) -> pd.DataFrame:
+    """
+    把分钟线聚合为 minutes 分钟线（不跨越午休和交易日）
+
+    例如 60 分钟线为 10:30、11:30、14:00、15:00 四根；minutes=240 即日线。
+    datetime 取每根聚合K线中最后一根分钟线的时间。
+    """
+    if len(df) == 0 or minutes <= 1:
+        return df.reset_index(drop=True)
+
+    times = df["datetime"].to_numpy(dtype="datetime64[ns]")
+    day = times.astype("datetime64[D]").astype(np.int64)
+    key = day * MINUTES_PER_DAY + session_minute(times) // minutes
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+
+    return pd.DataFrame({
+        "datetime": times[ends],
+        "open": df["open"].to_numpy()[starts],
+        "high": np.fmax.reduceat(df["high"].to_numpy(dtype=float), starts),
+        "low": np.fmin.reduceat(df["low"].to_numpy(dtype=float), starts),
+        "close": df["close"].to_numpy()[ends],
+        "volume": np.add.reduceat(df["volume"].to_numpy(dtype=float), starts),
+        "amount": np.add.reduceat(df["amount"].to_numpy(dtype=float), starts),
+    })
+
+
+class MinuteBarStore:
+    """按 (周期, 股票, 月份) 分区的分钟线存储"""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root) / "minute"
+
+    def _folder(self, symbol: str, period: str) -> Path:
+        return self.root / str(period) / symbol
+
+    def partitions(self, symbol: str, period: str = "1", start=None, end=None) -> list[Path]:
+        """[start, end] 涉及的月份分区（按时间排序）"""
+        folder = self._folder(symbol, period)
+        if not folder.exists():
+            return []
+        paths = sorted(folder.glob("*.parquet"))
+        lo = None if start is None else pd.Timestamp(start).strftime("%Y-%m")
+        hi = None if end is None else pd.Timestamp(end).strftime("%Y-%m")
+        return [p for p in paths if (lo is None or p.stem >= lo) and (hi is None or p.stem <= hi)]
+
+    def last_timestamp(self, symbol: str, period: str = "1") -> pd.Timestamp | None:
+        """已入库的最后一根分钟线时间"""
+        paths = self.partitions(symbol, period)
+        if not paths:
+            return None
+        return pd.read_parquet(paths[-1], columns=["datetime"])["datetime"].max()
+
+    def append(self, symbol: str, chunk: pd.DataFrame, period: str = "1") -> int:
+        """把一个下载块按月份拆分后合并进对应分区，返回写入的行数"""
+        if len(chunk) == 0:
+            return 0
+        folder = self._folder(symbol, period)
+        folder.mkdir(parents=True, exist_ok=True)
+
+        chunk = chunk[[col for col in MINUTE_COLUMNS if col in chunk.columns]]
+        months = chunk["datetime"].dt.strftime("%Y-%m")
+        for month, part in chunk.groupby(months.to_numpy(), sort=True):
+            path = folder / f"{month}.parquet"
+            if path.exists():
+                part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+            part = part.drop_duplicates("datetime", keep="last").sort_values("datetime")
+            part.reset_index(drop=True).to_parquet(path, index=False)
+        return len(chunk)
+
+    def iter_bars(self, symbol: str, start=None, end=None, minutes: int = 1, period: str = "1"):
+        """逐个月份分区读取并聚合，生成 minutes 分钟线 DataFrame"""
+        filters = []
+        if start is not None:
+            filters.append(("datetime", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("datetime", "<=", pd.Timestamp(end)))
+        for path in self.partitions(symbol, period, start, end):
+            part = pd.read_parquet(path, filters=filters or None)
+            if len(part):
+                yield aggregate_minutes(part, minutes)
+
+    def read(self, symbol: str, start=None, end=None, minutes: int = 1, period: str = "1") -> pd.DataFrame:
+        """读取并聚合为 minutes 分钟线（一次只在内存中保留一个月的原始分钟线）"""
+        parts = list(self.iter_bars(symbol, start, end, minutes, period))
+        if not parts:
+            return pd.DataFrame(columns=MINUTE_COLUMNS)
+        return pd.concat(parts, ignore_index=True)
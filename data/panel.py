@@ -0,0 +1,132 @@
+"""
+全市场面板存储：日期 × 股票 对齐的内存映射数组
+
+目录结构:
+    <root>/meta.json     字段、形状、股票列表
+    <root>/dates.npy     交易日 (datetime64[D])
+    <root>/<field>.bin   每个字段一个连续的二进制数组
+
+数组按列优先 (Fortran order) 存放，单只股票的整段历史在文件中是连续的，
+取某只股票的序列是零拷贝视图；多个进程打开同一面板时共享操作系统的页缓存。
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# 字段 -> 存储类型；价格缺失（停牌/未上市）为 NaN，成交量为 0
+# 价格保持 float64：前复权价格不是两位小数，降低精度会改变回测结果
+FIELD_DTYPES = {
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "int64",
+}
+
+
+class Panel:
+    """只读面板，字段数组按需以 numpy.memmap 打开"""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        meta = json.loads((self.root / "meta.json").read_text(encoding="utf-8"))
+        self.fields = meta["fields"]
+        self.symbols = meta["symbols"]
+        self.shape = tuple(meta["shape"])
+        self.dates = np.load(self.root / "dates.npy")
+        self._columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._arrays = {}
+
+    def __getitem__(self, field: str) -> np.memmap:
+        """整个字段的 (日期 × 股票) 数组"""
+        if field not in self._arrays:
+            self._arrays[field] = np.memmap(self.root / f"{field}.bin", dtype=self.fields[field],
+                                            mode="r", shape=self.shape, order="F")
+        return self._arrays[field]
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._columns
+
+    def column(self, symbol: str) -> int:
+        return self._columns[symbol]
+
+    def date_slice(self, start=None, end=None) -> slice:
+        """日期区间 [start, end] 对应的行切片"""
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), "D"))
+        hi = len(self.dates) if end is None else np.searchsorted(
+            self.dates, np.datetime64(pd.Timestamp(end), "D"), side="right")
+        return slice(int(lo), int(hi))
+
+    def series(self, field: str, symbol: str, start=None, end=None) -> np.ndarray:
+        """单只股票某字段的序列（零拷贝视图）"""
+        return self[field][self.date_slice(start, end), self.column(symbol)]
+
+    def frame(self, symbol: str, start=None, end=None) -> pd.DataFrame:
+        """单只股票的日线 DataFrame（去掉无行情的日期），可直接用于 backtrader"""
+        rows = self.date_slice(start, end)
+        j = self.column(symbol)
+        data = {"date": pd.DatetimeIndex(self.dates[rows])}
+        for field in self.fields:
+            data[field] = self[field][rows, j]
+        df = pd.DataFrame(data)
+        if "close" in df.columns:
+            df = df[df["close"].notna()].reset_index(drop=True)
+        return df
+
+
+def write_panel(root: str | Path, frames: dict[str, pd.DataFrame], dates=None) -> Panel:
+    """
+    把 {symbol: 日线DataFrame} 写成面板
+
+    dates 为共享交易日历；不传时取所有股票日期的并集。
+    先写入临时目录再整体替换，读者不会看到写了一半的面板。
+    """
+    root = Path(root)
+    symbols = list(frames)
+    if dates is None:
+        all_dates = [df["date"].to_numpy(dtype="datetime64[D]") for df in frames.values() if len(df)]
+        dates = np.unique(np.concatenate(all_dates)) if all_dates else np.array([], dtype="datetime64[D]")
+    else:
+        dates = np.asarray(dates, dtype="datetime64[D]")
+    shape = (len(dates), len(symbols))
+    if 0 in shape:
+        raise ValueError("面板为空：没有股票或没有交易日")
+
+    tmp = root.with_name(root.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    for field, dtype in FIELD_DTYPES.items():
+        array = np.memmap(tmp / f"{field}.bin", dtype=dtype, mode="w+", shape=shape, order="F")
+        array[:] = np.nan if np.issubdtype(np.dtype(dtype), np.floating) else 0
+        for j, symbol in enumerate(symbols):
+            df = frames[symbol]
+            if len(df) == 0 or field not in df.columns:
+                continue
+            bar_dates = df["date"].to_numpy(dtype="datetime64[D]")
+            rows = np.searchsorted(dates, bar_dates)
+            # 不在日历上的日期直接丢弃
+            valid = (rows < len(dates)) & (dates[np.minimum(rows, len(dates) - 1)] == bar_dates)
+            values = df[field].to_numpy()[valid]
+            if not np.issubdtype(np.dtype(dtype), np.floating):
+                values = np.nan_to_num(values).astype(dtype)
+            array[rows[valid], j] = values
+        array.flush()
+        del array
+
+    np.save(tmp / "dates.npy", dates)
+    meta = {"fields": FIELD_DTYPES, "symbols": symbols, "shape": list(shape)}
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    if root.exists():
+        shutil.rmtree(root)
+    tmp.rename(root)
+    return Panel(root)
@@ -0,0 +1,538 @@
+"""
+行情数据源
+
+所有数据源实现同一接口 DataProvider，AShareDataLoader 只依赖这个接口：
+- AkShareProvider: AkShare（东方财富/新浪），无需账号
+- TushareProvider: Tushare Pro，需要 token
+- FixtureProvider: 本地 Parquet/CSV 夹具目录，完全离线、结果确定，适合性能基准
+- FakeProvider: 按代码生成的确定性随机数据，可模拟延迟与失败
+
+用 get_provider(name) 或环境变量 ASTOCK_PROVIDER 选择数据源。
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.fundamentals import parse_cn_number
+from data.minute_store import MINUTE_COLUMNS
+from data.trade_calendar import TradingCalendar
+from data.universe import exchange_of
+
+
+# AkShare 中文字段 -> 标准字段
+AK_RENAME_MAP = {
+    "日期": "date",
+    "开盘": "open",
+    "最高": "high",
+    "最低": "low",
+    "收盘": "close",
+    "成交量": "volume",
+    "成交额": "amount",
+}
+
+# 缓存与返回的标准日线字段
+BAR_COLUMNS = ["date", "open", "high", "low", "close", "volume", "amount"]
+
+
+class DataProvider:
+    """
+    数据源接口
+
+    bars 返回标准日线字段 BAR_COLUMNS（date 为 Timestamp）；
+    factors 返回后复权因子 (date, hfq_factor)，用于在本地由不复权价格还原复权价格；
+    fundamentals 返回全市场快照 (symbol, name, market_cap, pe, dividend_yield, roe)；
+    constituents 返回指数成分股 (代码, 名称) 列表。
+    name 为本地缓存的子目录名，不同数据源的缓存互不混用；
+    offline 为真的数据源（假数据、夹具）不访问网络，不需要缓存和限速。
+    """
+
+    offline = False
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    def bars(self, symbol: str, start: str, end: str, adjust: str = "qfq") -> pd.DataFrame:
+        raise NotImplementedError
+
+    def minute_bars(self, symbol: str, start: str, end: str, period: str = "1",
+                    adjust: str = "") -> pd.DataFrame:
+        raise NotImplementedError(f"{type(self).__name__} 不提供分钟线")
+
+    def factors(self, symbol: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def fundamentals(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def constituents(self, index_code: str) -> list[tuple[str, str]]:
+        raise NotImplementedError
+
+
+class AkShareProvider(DataProvider):
+    """AkShare 数据源（东方财富日线 + 新浪复权因子）"""
+
+    name = "akshare"
+
+    def bars(self, symbol: str, start: str, end: str, adjust: str = "qfq") -> pd.DataFrame:
+        """下载日线并标准化字段"""
+        import akshare as ak
+
+        df = ak.stock_zh_a_hist(symbol=symbol, period="daily",
+                                start_date=start, end_date=end, adjust=adjust)
+        df = df.rename(columns=AK_RENAME_MAP)
+        if "date" not in df.columns:
+            return pd.DataFrame()
+        df = df[[col for col in BAR_COLUMNS if col in df.columns]].copy()
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def minute_bars(self, symbol: str, start: str, end: str, period: str = "1",
+                    adjust: str = "") -> pd.DataFrame:
+        """
+        下载分钟线（东方财富），period 为 '1'/'5'/'15'/'30'/'60'
+
+        东方财富只提供最近约5个交易日的1分钟线，更早的历史需用5分钟及以上周期。
+        """
+        import akshare as ak
+
+        df = ak.stock_zh_a_hist_min_em(symbol=symbol, period=period, adjust=adjust,
+                                       start_date=pd.Timestamp(start).strftime("%Y-%m-%d 09:30:00"),
+                                       end_date=pd.Timestamp(end).strftime("%Y-%m-%d 15:00:00"))
+        df = df.rename(columns={"时间": "datetime", **AK_RENAME_MAP})
+        if "datetime" not in df.columns:
+            return pd.DataFrame(columns=MINUTE_COLUMNS)
+        df = df[[col for col in MINUTE_COLUMNS if col in df.columns]].copy()
+        df["datetime"] = pd.to_datetime(df["datetime"])
+        return df
+
+    def factors(self, symbol: str) -> pd.DataFrame:
+        """下载后复权因子表 (date, hfq_factor)"""
+        import akshare as ak
+
+        df = ak.stock_zh_a_daily(symbol=f"{exchange_of(symbol).lower()}{symbol}", adjust="hfq-factor")
+        df["date"] = pd.to_datetime(df["date"])
+        df["hfq_factor"] = df["hfq_factor"].astype(float)
+        return df[["date", "hfq_factor"]].sort_values("date").reset_index(drop=True)
+
+    def fundamentals(self) -> pd.DataFrame:
+        """
+        全市场基本面快照（3 次批量请求）
+
+        总市值、动态市盈率来自东方财富实时行情；ROE、股息率来自最近一期年报。
+        年报类数据获取失败时对应列为 NaN，而不是整表失败。
+        """
+        import akshare as ak
+
+        spot = ak.stock_zh_a_spot_em()
+        df = pd.DataFrame({
+            "symbol": spot["代码"].astype(str).str.zfill(6),
+            "name": spot["名称"],
+            "market_cap": parse_cn_number(spot["总市值"]),
+            "pe": parse_cn_number(spot["市盈率-动态"]),
+        })
+
+        # 最近一期已披露的年报（年报在次年4月底前披露完毕）
+        today = datetime.now()
+        report_date = f"{today.year - 1 if today.month > 4 else today.year - 2}1231"
+
+        try:
+            roe = ak.stock_yjbb_em(date=report_date)
+            roe = pd.DataFrame({
+                "symbol": roe["股票代码"].astype(str).str.zfill(6),
+                "roe": parse_cn_number(roe["净资产收益率"]),
+            })
+            df = df.merge(roe.drop_duplicates("symbol"), on="symbol", how="left")
+        except Exception as e:
+            print(f"获取ROE失败: {e}")
+            df["roe"] = np.nan
+
+        try:
+            dividend = ak.stock_fhps_em(date=report_date)
+            dividend = pd.DataFrame({
+                "symbol": dividend["代码"].astype(str).str.zfill(6),
+                # 东财返回的股息率为小数（0.035 表示 3.5%）
+                "dividend_yield": parse_cn_number(dividend["现金分红-股息率"]),
+            })
+            df = df.merge(dividend.drop_duplicates("symbol"), on="symbol", how="left")
+        except Exception as e:
+            print(f"获取股息率失败: {e}")
+            df["dividend_yield"] = np.nan
+
+        return df[["symbol", "name", "market_cap", "pe", "dividend_yield", "roe"]]
+
+    def constituents(self, index_code: str) -> list[tuple[str, str]]:
+        """中证指数成分股 (代码, 名称)，如 000300 沪深300、000905 中证500"""
+        import akshare as ak
+
+        df = ak.index_stock_cons_csindex(symbol=index_code)
+        return list(zip(df["成分券代码"].astype(str).str.zfill(6), df["成分券名称"]))
+
+
+def _hash_uniform(keys: np.ndarray, salt: int) -> np.ndarray:
+    """整数键 -> [0, 1) 均匀分布（splitmix64 哈希，向量化）"""
+    with np.errstate(over="ignore"):
+        z = keys + np.uint64(0x9E3779B97F4A7C15) * np.uint64(salt + 1)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+class TushareProvider(DataProvider):
+    """
+    Tushare Pro 数据源
+
+    token 不传时依次读取环境变量 TUSHARE_TOKEN 与 token_path 文件。
+    成交量单位与 AkShare 一致为"手"，成交额换算为元。
+    """
+
+    name = "tushare"
+    # 中证指数代码 -> Tushare 指数代码
+    INDEX_SUFFIX = {"000": "SH", "399": "SZ"}
+
+    def __init__(self, token: str | None = None, token_path: str | Path = ".token"):
+        self.token = token or os.environ.get("TUSHARE_TOKEN")
+        if not self.token and Path(token_path).exists():
+            self.token = Path(token_path).read_text(encoding="utf-8").strip()
+        if not self.token:
+            raise ValueError("未设置 Tushare token（参数、TUSHARE_TOKEN 或 .token 文件）")
+        self._pro = None
+
+    @property
+    def pro(self):
+        if self._pro is None:
+            import tushare as ts
+
+            self._pro = ts.pro_api(self.token)
+        return self._pro
+
+    @staticmethod
+    def _ts_code(symbol: str) -> str:
+        return f"{symbol}.{exchange_of(symbol)}"
+
+    def bars(self, symbol: str, start: str, end: str, adjust: str = "qfq") -> pd.DataFrame:
+        import tushare as ts
+
+        df = ts.pro_bar(ts_code=self._ts_code(symbol), api=self.pro, asset="E", adj=adjust or None,
+                        start_date=pd.Timestamp(start).strftime("%Y%m%d"),
+                        end_date=pd.Timestamp(end).strftime("%Y%m%d"))
+        if df is None or len(df) == 0:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        df = pd.DataFrame({
+            "date": pd.to_datetime(df["trade_date"]),
+            "open": df["open"],
+            "high": df["high"],
+            "low": df["low"],
+            "close": df["close"],
+            "volume": df["vol"],
+            "amount": df["amount"] * 1000,
+        })
+        return df.sort_values("date").reset_index(drop=True)
+
+    def factors(self, symbol: str) -> pd.DataFrame:
+        df = self.pro.adj_factor(ts_code=self._ts_code(symbol))
+        df = pd.DataFrame({"date": pd.to_datetime(df["trade_date"]),
+                           "hfq_factor": df["adj_factor"].astype(float)})
+        return df.sort_values("date").reset_index(drop=True)
+
+    def _names(self) -> pd.DataFrame:
+        return self.pro.stock_basic(exchange="", list_status="L", fields="symbol,name")
+
+    def fundamentals(self) -> pd.DataFrame:
+        """
+        全市场基本面快照：最近交易日的 daily_basic + 最近一期年报的 ROE
+
+        daily_basic 的总市值单位为万元、股息率为百分数，统一换算为元与小数。
+        """
+        end = datetime.now().strftime("%Y%m%d")
+        start = (pd.Timestamp(end) - pd.Timedelta(days=14)).strftime("%Y%m%d")
+        trade_dates = self.pro.trade_cal(exchange="SSE", start_date=start, end_date=end, is_open="1")
+        # 当天收盘数据可能尚未更新，取倒数第二个交易日更稳妥
+        trade_date = sorted(trade_dates["cal_date"])[-2]
+        basic = self.pro.daily_basic(trade_date=trade_date, fields="ts_code,total_mv,pe_ttm,dv_ratio")
+        df = pd.DataFrame({
+            "symbol": basic["ts_code"].str[:6],
+            "market_cap": basic["total_mv"].astype(float) * 1e4,
+            "pe": basic["pe_ttm"].astype(float),
+            "dividend_yield": basic["dv_ratio"].astype(float) / 100,
+        })
+        df = self._names().merge(df, on="symbol", how="right")
+
+        today = datetime.now()
+        report_date = f"{today.year - 1 if today.month > 4 else today.year - 2}1231"
+        try:
+            roe = self.pro.fina_indicator_vip(period=report_date, fields="ts_code,roe")
+            roe = pd.DataFrame({"symbol": roe["ts_code"].str[:6], "roe": roe["roe"].astype(float)})
+            df = df.merge(roe.drop_duplicates("symbol"), on="symbol", how="left")
+        except Exception as e:
+            print(f"获取ROE失败: {e}")
+            df["roe"] = np.nan
+
+        return df[["symbol", "name", "market_cap", "pe", "dividend_yield", "roe"]]
+
+    def constituents(self, index_code: str) -> list[tuple[str, str]]:
+        """指数最近一次权重披露的成分股"""
+        ts_index = f"{index_code}.{self.INDEX_SUFFIX.get(index_code[:3], 'SH')}"
+        end = datetime.now().strftime("%Y%m%d")
+        start = (pd.Timestamp(end) - pd.Timedelta(days=45)).strftime("%Y%m%d")
+        weights = self.pro.index_weight(index_code=ts_index, start_date=start, end_date=end)
+        latest = weights[weights["trade_date"] == weights["trade_date"].max()]
+        symbols = latest["con_code"].str[:6]
+        names = dict(self._names().itertuples(index=False))
+        return [(symbol, names.get(symbol, symbol)) for symbol in symbols]
+
+
+class FixtureProvider(DataProvider):
+    """
+    本地夹具数据源：从目录读取事先保存的数据，完全不访问网络
+
+    目录结构（每个文件可以是 .parquet 或 .csv）:
+        <root>/bars/<symbol>        不复权日线
+        <root>/factors/<symbol>     后复权因子，缺失时视为无除权（因子恒为 1）
+        <root>/minute/<period>/<symbol>  分钟线
+        <root>/fundamentals         全市场快照
+        <root>/constituents/<index_code> 指数成分股 (code, name)
+
+    用 record() 把任意数据源的数据录制为夹具。
+    """
+
+    offline = True
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    @property
+    def name(self) -> str:
+        # 不同夹具目录的数据各自缓存
+        return f"fixture-{zlib.crc32(str(self.root.resolve()).encode()):08x}"
+
+    def _read(self, *parts: str) -> pd.DataFrame:
+        base = self.root.joinpath(*parts)
+        parquet, csv = base.with_name(base.name + ".parquet"), base.with_name(base.name + ".csv")
+        if parquet.exists():
+            return pd.read_parquet(parquet)
+        if csv.exists():
+            return pd.read_csv(csv, dtype={"symbol": str, "code": str})
+        raise FileNotFoundError(f"夹具不存在: {base}.parquet / .csv")
+
+    def bars(self, symbol: str, start: str, end: str, adjust: str = "qfq") -> pd.DataFrame:
+        df = self._read("bars", symbol)
+        df["date"] = pd.to_datetime(df["date"])
+        df = df[(df["date"] >= pd.Timestamp(start)) & (df["date"] <= pd.Timestamp(end))]
+        df = df[[col for col in BAR_COLUMNS if col in df.columns]].reset_index(drop=True)
+        if adjust:
+            from data.bar_store import adjust_prices
+
+            df = adjust_prices(df, self.factors(symbol), adjust)
+        return df
+
+    def minute_bars(self, symbol: str, start: str, end: str, period: str = "1",
+                    adjust: str = "") -> pd.DataFrame:
+        df = self._read("minute", str(period), symbol)
+        df["datetime"] = pd.to_datetime(df["datetime"])
+        days = df["datetime"].dt.normalize()
+        df = df[(days >= pd.Timestamp(start)) & (days <= pd.Timestamp(end))]
+        return df[[col for col in MINUTE_COLUMNS if col in df.columns]].reset_index(drop=True)
+
+    def factors(self, symbol: str) -> pd.DataFrame:
+        try:
+            df = self._read("factors", symbol)
+        except FileNotFoundError:
+            return pd.DataFrame({"date": [pd.Timestamp("1990-01-01")], "hfq_factor": [1.0]})
+        df["date"] = pd.to_datetime(df["date"])
+        return df[["date", "hfq_factor"]].sort_values("date").reset_index(drop=True)
+
+    def fundamentals(self) -> pd.DataFrame:
+        df = self._read("fundamentals")
+        df["symbol"] = df["symbol"].astype(str).str.zfill(6)
+        return df
+
+    def constituents(self, index_code: str) -> list[tuple[str, str]]:
+        df = self._read("constituents", index_code)
+        return list(zip(df["code"].astype(str).str.zfill(6), df["name"]))
+
+    @classmethod
+    def record(cls, root: str | Path, provider: DataProvider, symbols, start: str, end: str,
+               index_codes=(), fundamentals: bool = False) -> "FixtureProvider":
+        """从 provider 下载不复权日线、复权因子等并保存为 Parquet 夹具"""
+        root = Path(root)
+        for folder in ("bars", "factors", "constituents"):
+            (root / folder).mkdir(parents=True, exist_ok=True)
+        for symbol in symbols:
+            provider.bars(symbol, start, end, adjust="").to_parquet(root / "bars" / f"{symbol}.parquet", index=False)
+            provider.factors(symbol).to_parquet(root / "factors" / f"{symbol}.parquet", index=False)
+        for index_code in index_codes:
+            pd.DataFrame(provider.constituents(index_code), columns=["code", "name"]).to_parquet(
+                root / "constituents" / f"{index_code}.parquet", index=False)
+        if fundamentals:
+            provider.fundamentals().to_parquet(root / "fundamentals.parquet", index=False)
+        return cls(root)
+
+
+class FakeProvider(DataProvider):
+    """
+    离线假数据源，用于测试与性能基准
+
+    每只股票按代码在交易日历的交易日上生成确定性的随机游走K线（同一代码、同一日期的价格始终相同，
+    分段下载后拼接的结果与一次性下载一致），并可模拟网络延迟与随机失败。
+    """
+
+    name = "fake"
+    offline = True
+    BASE_DATE = "2000-01-03"
+    UNIVERSE_SIZE = 5000
+    INDEX_SIZES = {"000300": 300, "000905": 500}
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 fail_symbols=(), seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_symbols = set(fail_symbols)
+        self.seed = seed
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate_network(self, symbol: str):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if symbol in self.fail_symbols:
+            raise ValueError(f"{symbol} 不存在")
+        if failed:
+            raise ConnectionError(f"模拟网络错误: {symbol}")
+
+    def bars(self, symbol: str, start: str, end: str, adjust: str = "qfq") -> pd.DataFrame:
+        self._simulate_network(symbol)
+
+        # 只在交易日历中的交易日生成K线（与 build_panel 对齐的日期一致），节假日没有K线
+        dates = pd.DatetimeIndex(TradingCalendar.load().sessions(self.BASE_DATE, end).astype("datetime64[ns]"))
+        # 每个字段用独立的随机流，任一日期的取值与 end 无关
+        seed = zlib.crc32(symbol.encode())
+        rng = [np.random.default_rng([seed, stream]) for stream in range(5)]
+        # 日收益限制在涨跌停范围内
+        returns = np.clip(rng[0].normal(0.0003, 0.02, len(dates)), -0.095, 0.095)
+        close = 10.0 * np.exp(np.cumsum(returns))
+        prev_close = np.concatenate([[10.0], close[:-1]])
+        open_ = prev_close * (1 + np.clip(rng[1].normal(0, 0.005, len(dates)), -0.02, 0.02))
+        high = np.maximum(open_, close) * (1 + np.abs(rng[2].normal(0, 0.005, len(dates))))
+        low = np.minimum(open_, close) * (1 - np.abs(rng[3].normal(0, 0.005, len(dates))))
+        volume = rng[4].integers(1_000, 100_000, len(dates)) * 100
+
+        df = pd.DataFrame({
+            "date": dates,
+            "open": open_.round(2),
+            "high": high.round(2),
+            "low": low.round(2),
+            "close": close.round(2),
+            "volume": volume.astype(float),
+            "amount": (volume * close).round(2),
+        })
+        mask = (df["date"] >= pd.Timestamp(start)) & (df["date"] <= pd.Timestamp(end))
+        return df[mask].reset_index(drop=True)
+
+    def minute_bars(self, symbol: str, start: str, end: str, period: str = "1",
+                    adjust: str = "") -> pd.DataFrame:
+        """在日线的开盘价与收盘价之间生成每天 240/period 根分钟线"""
+        daily = self.bars(symbol, start, end, adjust)
+        step = int(period)
+        per_day = 240 // step
+        n = len(daily) * per_day
+        if n == 0:
+            return pd.DataFrame(columns=MINUTE_COLUMNS)
+
+        # 每根K线的结束时间：9:30 + k*step（上午），13:00 + k*step（下午）
+        ends = np.arange(1, per_day + 1) * step
+        offsets = np.where(ends <= 120, 9 * 60 + 30 + ends, 13 * 60 + ends - 120)
+        times = (daily["date"].to_numpy(dtype="datetime64[m]")[:, None]
+                 + offsets[None, :].astype("timedelta64[m]")).ravel()
+
+        # 噪声由 (代码, 日期, 分钟) 哈希得到，分段下载与一次性下载结果一致
+        days = daily["date"].to_numpy(dtype="datetime64[D]").astype(np.uint64)
+        keys = (days[:, None] * np.uint64(240) + np.arange(per_day, dtype=np.uint64)[None, :]
+                + np.uint64(zlib.crc32(f"{symbol}:{period}".encode()) << 32))
+        noise = [_hash_uniform(keys, salt) - 0.5 for salt in range(4)]
+
+        open_ = daily["open"].to_numpy()
+        close_ = daily["close"].to_numpy()
+        # 日内从开盘价随机游走到收盘价（布朗桥）
+        frac = np.arange(1, per_day + 1) / per_day
+        walk = np.cumsum(noise[0] * 0.004, axis=1)
+        walk -= walk[:, -1:] * frac
+        path = (open_[:, None] + (close_ - open_)[:, None] * frac) * np.exp(walk)
+        prev = np.concatenate([open_[:, None], path[:, :-1]], axis=1)
+        high = np.maximum(prev, path) * (1 + np.abs(noise[1]) * 0.002)
+        low = np.minimum(prev, path) * (1 - np.abs(noise[2]) * 0.002)
+        volume = np.floor((noise[3] + 0.5) * 990 + 10) * 100
+
+        return pd.DataFrame({
+            "datetime": pd.DatetimeIndex(times.astype("datetime64[ns]")),
+            "open": prev.ravel().round(2),
+            "high": high.ravel().round(2),
+            "low": low.ravel().round(2),
+            "close": path.ravel().round(2),
+            "volume": volume.ravel().astype(float),
+            "amount": (volume * path).ravel().round(2),
+        })
+
+    def factors(self, symbol: str) -> pd.DataFrame:
+        self._simulate_network(symbol)
+        return pd.DataFrame({"date": [pd.Timestamp(self.BASE_DATE)], "hfq_factor": [1.0]})
+
+    def fundamentals(self) -> pd.DataFrame:
+        """生成 UNIVERSE_SIZE 只股票的基本面快照，每个因子约 5% 缺失"""
+        self._simulate_network("fundamentals")
+
+        rng = np.random.default_rng(self.seed)
+        n = self.UNIVERSE_SIZE
+        half = n // 2
+        symbols = [f"{600000 + i}" for i in range(half)] + [f"{i + 1:06d}" for i in range(n - half)]
+        df = pd.DataFrame({
+            "symbol": symbols,
+            "name": [f"股票{symbol}" for symbol in symbols],
+            "market_cap": rng.lognormal(23.5, 1.2, n),
+            "pe": rng.normal(20, 15, n),
+            "dividend_yield": rng.uniform(0, 0.06, n),
+            "roe": rng.normal(10, 8, n),
+        })
+        for col in ["market_cap", "pe", "dividend_yield", "roe"]:
+            df.loc[rng.random(n) < 0.05, col] = np.nan
+        return df
+
+    def constituents(self, index_code: str) -> list[tuple[str, str]]:
+        """取假全市场快照的前 N 只作为指数成分股"""
+        size = self.INDEX_SIZES.get(index_code, 100)
+        df = self.fundamentals().head(size)
+        return list(zip(df["symbol"], df["name"]))
+
+
+# 默认夹具目录，可用环境变量 ASTOCK_FIXTURE_DIR 覆盖
+DEFAULT_FIXTURE_DIR = Path(os.environ.get("ASTOCK_FIXTURE_DIR", Path(__file__).resolve().parent / "fixtures"))
+
+PROVIDERS = {
+    "akshare": AkShareProvider,
+    "tushare": TushareProvider,
+    "fixture": lambda **kwargs: FixtureProvider(kwargs.get("root", DEFAULT_FIXTURE_DIR)),
+    "fake": FakeProvider,
+}
+
+
+def get_provider(name: str | None = None, **kwargs) -> DataProvider:
+    """按名称创建数据源，name 默认取环境变量 ASTOCK_PROVIDER（未设置时为 akshare）"""
+    name = (name or os.environ.get("ASTOCK_PROVIDER", "akshare")).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"未知数据源: {name}，可选: {list(PROVIDERS)}")
+    return PROVIDERS[name](**kwargs)
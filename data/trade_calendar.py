@@ -0,0 +1,170 @@
+"""A股交易日历：对齐、停牌标记与周/月线重采样（全部向量化）。"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# 随仓库分发的沪深交易所交易日（离线可用），用 `python -m data.trade_calendar` 从 AkShare 更新
+CALENDAR_PATH = Path(__file__).resolve().parent / "trade_calendar.csv"
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+
+def period_codes(dates, freq: str) -> np.ndarray:
+    """
+    每个日期所属周期的整数编号
+
+    W: 周（周一为一周开始）；M: 月；Q: 季；Y: 年
+    """
+    days = np.asarray(dates, dtype="datetime64[D]")
+    if freq == "W":
+        # 1970-01-01 是周四，+3 使周一成为每周的第一天
+        return (days.astype(np.int64) + 3) // 7
+    if freq == "M":
+        return days.astype("datetime64[M]").astype(np.int64)
+    if freq == "Q":
+        return days.astype("datetime64[M]").astype(np.int64) // 3
+    if freq == "Y":
+        return days.astype("datetime64[Y]").astype(np.int64)
+    raise ValueError(f"不支持的周期: {freq}")
+
+
+class TradingCalendar:
+    """交易日历，日期保存为有序的 datetime64[D] 数组"""
+
+    _default = None
+
+    def __init__(self, dates):
+        self.dates = np.unique(np.asarray(dates, dtype="datetime64[D]"))
+        self._period_ends = {}
+
+    @classmethod
+    def load(cls, path: str | Path | None = None) -> "TradingCalendar":
+        """读取随仓库分发的交易日历（默认日历只读取一次）"""
+        if path is None and cls._default is not None:
+            return cls._default
+        df = pd.read_csv(path or CALENDAR_PATH)
+        calendar = cls(df["trade_date"].to_numpy(dtype="datetime64[D]"))
+        if path is None:
+            cls._default = calendar
+        return calendar
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def sessions(self, start=None, end=None) -> np.ndarray:
+        """[start, end] 内的交易日"""
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), "D"))
+        hi = len(self.dates) if end is None else np.searchsorted(
+            self.dates, np.datetime64(pd.Timestamp(end), "D"), side="right")
+        return self.dates[lo:hi]
+
+    def is_session(self, dates) -> np.ndarray:
+        """逐个判断是否交易日"""
+        days = np.atleast_1d(np.asarray(dates, dtype="datetime64[D]"))
+        rows = np.minimum(np.searchsorted(self.dates, days), len(self.dates) - 1)
+        return self.dates[rows] == days
+
+    def offset(self, date, n: int) -> np.datetime64:
+        """date 之后（n>0）或之前（n<0）的第 |n| 个交易日"""
+        day = np.datetime64(pd.Timestamp(date), "D")
+        i = np.searchsorted(self.dates, day)
+        if n > 0 and (i >= len(self.dates) or self.dates[i] != day):
+            n -= 1
+        return self.dates[int(np.clip(i + n, 0, len(self.dates) - 1))]
+
+    def period_ends(self, freq: str = "M") -> np.ndarray:
+        """每周/月/季/年的最后一个交易日（预计算并缓存），常用作调仓日"""
+        if freq not in self._period_ends:
+            codes = period_codes(self.dates, freq)
+            last = np.r_[codes[1:] != codes[:-1], True]
+            self._period_ends[freq] = self.dates[last]
+        return self._period_ends[freq]
+
+    def align(self, df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+        """
+        把单只股票的日线对齐到交易日历
+
+        - 区间从 max(start, 首根K线) 到 end（默认日历最后一天不超过今天）
+        - 日历上有、数据中没有的日期视为停牌：suspended=True，价格取前收盘价，成交量为 0
+        - 不在日历上的K线（脏数据）被丢弃
+        """
+        bar_dates = df["date"].to_numpy(dtype="datetime64[D]")
+        if len(bar_dates) == 0:
+            return df.assign(suspended=pd.Series(dtype=bool))
+
+        first = bar_dates[0] if start is None else max(bar_dates[0], np.datetime64(pd.Timestamp(start), "D"))
+        if end is None:
+            end = min(self.dates[-1], np.datetime64(pd.Timestamp.now().date(), "D"))
+        sessions = self.sessions(first, end)
+
+        rows = np.searchsorted(sessions, bar_dates)
+        valid = (rows < len(sessions)) & (sessions[np.minimum(rows, len(sessions) - 1)] == bar_dates)
+        rows = rows[valid]
+
+        has_bar = np.zeros(len(sessions), dtype=bool)
+        has_bar[rows] = True
+        # 每个交易日对应的最近一根K线（停牌日指向停牌前最后一根）
+        last_bar = np.maximum.accumulate(np.where(has_bar, np.arange(len(sessions)), -1))
+        source = np.full(len(sessions), -1)
+        source[rows] = np.flatnonzero(valid)
+        source = source[np.maximum(last_bar, 0)]
+
+        out = {"date": pd.DatetimeIndex(sessions)}
+        close = df["close"].to_numpy(dtype=float)[source] if "close" in df.columns else None
+        for col in df.columns:
+            if col == "date":
+                continue
+            values = df[col].to_numpy()[source]
+            if col in PRICE_COLUMNS and close is not None:
+                # 停牌日的开高低收都等于停牌前收盘价
+                values = np.where(has_bar, values.astype(float), close)
+            elif np.issubdtype(values.dtype, np.number):
+                values = np.where(has_bar, values, 0)
+            out[col] = values
+        aligned = pd.DataFrame(out)
+        aligned["suspended"] = ~has_bar
+        # 区间开头没有K线的日期（数据缺失而非停牌）去掉
+        return aligned[last_bar >= 0].reset_index(drop=True)
+
+    def resample(self, df: pd.DataFrame, freq: str = "W") -> pd.DataFrame:
+        """
+        把日线聚合为周/月/季/年线（np.reduceat 一次完成，无逐组 Python 循环）
+
+        date 取周期内最后一个有K线的交易日；停牌日（suspended=True）不参与聚合。
+        """
+        if "suspended" in df.columns:
+            df = df[~df["suspended"].to_numpy()]
+        if len(df) == 0:
+            return df.drop(columns="suspended", errors="ignore")
+
+        dates = df["date"].to_numpy(dtype="datetime64[ns]")
+        codes = period_codes(dates, freq)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)] - 1
+
+        out = {"date": dates[ends]}
+        if "open" in df.columns:
+            out["open"] = df["open"].to_numpy()[starts]
+        if "high" in df.columns:
+            out["high"] = np.fmax.reduceat(df["high"].to_numpy(dtype=float), starts)
+        if "low" in df.columns:
+            out["low"] = np.fmin.reduceat(df["low"].to_numpy(dtype=float), starts)
+        if "close" in df.columns:
+            out["close"] = df["close"].to_numpy()[ends]
+        for col in ("volume", "amount"):
+            if col in df.columns:
+                out[col] = np.add.reduceat(df[col].to_numpy(), starts)
+        return pd.DataFrame(out)
+
+
+if __name__ == "__main__":
+    import akshare as ak
+
+    dates = ak.tool_trade_date_hist_sina()["trade_date"]
+    pd.DataFrame({"trade_date": pd.to_datetime(dates).dt.strftime("%Y-%m-%d")}).to_csv(CALENDAR_PATH, index=False)
+    print(f"已更新交易日历，共{len(dates)}天")
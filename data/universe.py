@@ -0,0 +1,146 @@
+"""股票池注册表：去重后的股票列表、交易所/板块信息与按名称获取的股票池。"""
+
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent
+
+# 代码前缀 -> (交易所, 板块)；先查3位前缀，再查1位前缀
+PREFIX_TABLE = {
+    "600": ("SH", "主板"),
+    "601": ("SH", "主板"),
+    "603": ("SH", "主板"),
+    "605": ("SH", "主板"),
+    "688": ("SH", "科创板"),
+    "689": ("SH", "科创板"),
+    "000": ("SZ", "主板"),
+    "001": ("SZ", "主板"),
+    "002": ("SZ", "主板"),
+    "003": ("SZ", "主板"),
+    "300": ("SZ", "创业板"),
+    "301": ("SZ", "创业板"),
+    "920": ("BJ", "北交所"),
+    "4": ("BJ", "北交所"),
+    "8": ("BJ", "北交所"),
+    "6": ("SH", "主板"),
+    "0": ("SZ", "主板"),
+    "3": ("SZ", "创业板"),
+}
+
+
+def _classify(symbol: str) -> tuple[str, str]:
+    info = PREFIX_TABLE.get(symbol[:3]) or PREFIX_TABLE.get(symbol[:1])
+    if info is None:
+        raise ValueError(f"无法识别的股票代码: {symbol}")
+    return info
+
+
+def exchange_of(symbol: str) -> str:
+    """交易所代码: SH / SZ / BJ"""
+    return _classify(symbol)[0]
+
+
+def board_of(symbol: str) -> str:
+    """板块: 主板 / 科创板 / 创业板 / 北交所"""
+    return _classify(symbol)[1]
+
+
+@dataclass(frozen=True)
+class StockInfo:
+    symbol: str
+    name: str
+    exchange: str
+    board: str
+
+
+class UniverseRegistry:
+    """
+    股票池注册表
+
+    - 所有股票池共用一张 symbol -> StockInfo 哈希表，名称/交易所/板块查询为 O(1)
+    - 股票池注册时按代码去重（保留首次出现的顺序）
+    - 需要联网的股票池（全市场、中证500等）以加载函数注册，首次使用时才加载
+    """
+
+    def __init__(self):
+        self._stocks: dict[str, StockInfo] = {}
+        self._universes: dict[str, list[str]] = {}
+        self._loaders = {}
+
+    def add(self, name: str, stocks) -> list[str]:
+        """注册股票池，stocks 为 (代码, 名称) 序列，返回去重后的代码列表"""
+        symbols = []
+        for code, stock_name in stocks:
+            code = str(code).zfill(6)
+            if code not in self._stocks:
+                exchange, board = _classify(code)
+                self._stocks[code] = StockInfo(code, stock_name, exchange, board)
+            symbols.append(code)
+        self._universes[name] = list(dict.fromkeys(symbols))
+        return self._universes[name]
+
+    def add_csv(self, name: str, path: str | Path) -> list[str]:
+        """从 code,name 格式的 CSV 注册股票池"""
+        with open(path, "r", encoding="utf-8") as f:
+            return self.add(name, ((row["code"], row["name"]) for row in csv.DictReader(f)))
+
+    def register_loader(self, name: str, loader):
+        """注册延迟加载的股票池，loader() 返回 (代码, 名称) 序列"""
+        self._loaders[name] = loader
+
+    def names(self) -> list[str]:
+        return list(dict.fromkeys([*self._universes, *self._loaders]))
+
+    def universe(self, name: str) -> list[str]:
+        """股票池的代码列表"""
+        if name not in self._universes:
+            if name not in self._loaders:
+                raise KeyError(f"未知股票池: {name}，可选: {self.names()}")
+            self.add(name, self._loaders[name]())
+        return self._universes[name]
+
+    def stocks(self, name: str) -> list[tuple[str, str]]:
+        """股票池的 (代码, 名称) 列表，供批量回测遍历"""
+        return [(symbol, self._stocks[symbol].name) for symbol in self.universe(name)]
+
+    def info(self, symbol: str) -> StockInfo:
+        if symbol in self._stocks:
+            return self._stocks[symbol]
+        exchange, board = _classify(symbol)
+        return StockInfo(symbol, symbol, exchange, board)
+
+    def name(self, symbol: str) -> str:
+        info = self._stocks.get(symbol)
+        return info.name if info else symbol
+
+    def attach_loader(self, data_loader):
+        """注册依赖数据源的股票池：ALL（全市场）、CSI300、CSI500"""
+        self.register_loader("ALL", lambda: data_loader.load_factor_universe()[["symbol", "name"]].itertuples(index=False))
+        self.register_loader("CSI300", lambda: data_loader.provider.constituents("000300"))
+        self.register_loader("CSI500", lambda: data_loader.provider.constituents("000905"))
+        return self
+
+
+_default_registry = None
+
+
+def default_registry() -> UniverseRegistry:
+    """内置股票池：HS300（data/hs300_stocks.csv）、HS300_CORE、TEST"""
+    global _default_registry
+    if _default_registry is None:
+        from data.data_loader import TEST_STOCKS
+        from data.hs300_stocks import HS300_CORE_STOCKS
+
+        registry = UniverseRegistry()
+        registry.add("TEST", TEST_STOCKS)
+        registry.add("HS300_CORE", HS300_CORE_STOCKS)
+        csv_path = DATA_DIR / "hs300_stocks.csv"
+        if csv_path.exists():
+            registry.add_csv("HS300", csv_path)
+        else:
+            registry.add("HS300", HS300_CORE_STOCKS)
+        _default_registry = registry
+    return _default_registry
@@ -2,12 +2,16 @@
 
 from __future__ import annotations
 
+from array import array
 from dataclasses import dataclass
 
 import backtrader as bt
 import numpy as np
 import pandas as pd
 
+from strategy import kernels
+from strategy.streaming import StreamingSupertrend
+
 
 @dataclass
 class SupertrendConfig:
@@ -44,8 +48,46 @@ class StrategyBase(bt.Strategy):
         return max(int(budget // price), 0)
 
 
+class Supertrend(bt.Indicator):
+    """
+    Supertrend 指标（backtrader），数值与 SupertrendCalculator 逐位一致。
+
+    runonce 模式下 once() 用 strategy.kernels 对整段数组一次算完；
+    逐根模式（runonce=False）用 StreamingSupertrend 每根K线 O(1) 更新。
+    """
+
+    lines = ("supertrend", "trend", "atr")
+    params = (("period", 10), ("multiplier", 3.0))
+    plotinfo = dict(subplot=False)
+    plotlines = dict(trend=dict(_plotskip=True), atr=dict(_plotskip=True))
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+        self._state = StreamingSupertrend(self.p.period, self.p.multiplier)
+        self._bulk = None
+
+    def prenext(self):
+        self._state.update(self.data.high[0], self.data.low[0], self.data.close[0])
+
+    def next(self):
+        atr, line, trend = self._state.update(self.data.high[0], self.data.low[0], self.data.close[0])
+        self.lines.atr[0] = atr
+        self.lines.supertrend[0] = line
+        self.lines.trend[0] = trend
+
+    def once(self, start, end):
+        if self._bulk is None:
+            size = self.data.buflen()
+            self._bulk = kernels.supertrend(
+                np.asarray(self.data.high.array[:size]), np.asarray(self.data.low.array[:size]),
+                np.asarray(self.data.close.array[:size]), self.p.period, self.p.multiplier,
+            )
+        for line, values in zip((self.lines.atr, self.lines.supertrend, self.lines.trend), self._bulk):
+            line.array[start:end] = array("d", values[start:end].tolist())
+
+
 class SupertrendCalculator:
-    """使用 Pandas 计算 Supertrend（可用于离线选股/信号预计算）。"""
+    """Supertrend 计算（可用于离线选股/信号预计算），数值内核见 strategy.kernels。"""
 
     @staticmethod
     def calculate(df: pd.DataFrame, config: SupertrendConfig | None = None) -> pd.DataFrame:
@@ -56,35 +98,31 @@ class SupertrendCalculator:
         输出新增列：atr, supertrend, trend(1/-1)
         """
         config = config or SupertrendConfig()
-        data = df.copy()
-
-        hl = data["high"] - data["low"]
-        hc = (data["high"] - data["close"].shift(1)).abs()
-        lc = (data["low"] - data["close"].shift(1)).abs()
-        tr = pd.concat([hl, hc, lc], axis=1).max(axis=1)
-        data["atr"] = tr.rolling(config.atr_period).mean()
-
-        mid = (data["high"] + data["low"]) / 2
-        upper = mid + config.multiplier * data["atr"]
-        lower = mid - config.multiplier * data["atr"]
-
-        trend = np.ones(len(data), dtype=int)
-        supertrend = np.full(len(data), np.nan)
-
-        for i in range(1, len(data)):
-            if data["close"].iloc[i] > upper.iloc[i - 1]:
-                trend[i] = 1
-            elif data["close"].iloc[i] < lower.iloc[i - 1]:
-                trend[i] = -1
-            else:
-                trend[i] = trend[i - 1]
-                if trend[i] == 1:
-                    lower.iloc[i] = max(lower.iloc[i], lower.iloc[i - 1])
-                else:
-                    upper.iloc[i] = min(upper.iloc[i], upper.iloc[i - 1])
-
-            supertrend[i] = lower.iloc[i] if trend[i] == 1 else upper.iloc[i]
-
-        data["supertrend"] = supertrend
-        data["trend"] = trend
-        return data
+        atr, line, trend = kernels.supertrend(
+            df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(),
+            config.atr_period, config.multiplier,
+        )
+        return df.assign(atr=atr, supertrend=line, trend=trend)
+
+    @staticmethod
+    def calculate_panel(panel, config: SupertrendConfig | None = None,
+                        start=None, end=None) -> dict[str, np.ndarray]:
+        """
+        一次计算面板（日期 × 股票）中所有股票的 Supertrend。
+
+        返回 {"atr", "supertrend", "trend"} 三个与 panel 同形状的数组；
+        每只股票按去掉无行情日期后的序列计算，与对 panel.frame(symbol) 调用 calculate 的结果逐位一致。
+        无行情的日期 atr/supertrend 为 NaN，trend 为 0。
+        """
+        config = config or SupertrendConfig()
+        rows = panel.date_slice(start, end)
+        close = np.asarray(panel["close"][rows])
+        order, counts = kernels.compact_columns(~np.isnan(close))
+        high, low, close = (np.take_along_axis(np.asarray(panel[field][rows]), order, axis=0)
+                            for field in ("high", "low", "close"))
+        atr, line, trend = kernels.supertrend(high, low, close, config.atr_period, config.multiplier)
+        return {
+            "atr": kernels.scatter_columns(atr, order, counts),
+            "supertrend": kernels.scatter_columns(line, order, counts),
+            "trend": kernels.scatter_columns(trend, order, counts, fill=0),
+        }
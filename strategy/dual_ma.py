@@ -0,0 +1,77 @@
+"""均线策略：双均线金叉死叉、突破均线"""
+
+import backtrader as bt
+
+from strategy.feeds import indicator
+
+
+# ============== 策略1: 双均线金叉死叉 ==============
+class DualMAStrategy(bt.Strategy):
+    params = dict(fast=5, slow=20)
+
+    @staticmethod
+    def indicators(p):
+        return [("sma", {"period": p["fast"]}), ("sma", {"period": p["slow"]})]
+
+    def __init__(self):
+        self.fast = indicator(self, "sma", self.params.fast)
+        self.slow = indicator(self, "sma", self.params.slow)
+        self.prev_fast = 0
+
+    def next(self):
+        if len(self.data) < self.params.slow + 5:
+            return
+
+        fast_now = self.fast[0]
+        slow_now = self.slow[0]
+        fast_prev = self.fast[-1]
+        slow_prev = self.slow[-1]
+
+        # 金叉买入
+        if fast_now > slow_now and fast_prev <= slow_prev:
+            if not self.position:
+                price = self.data.close[0]
+                if price > 0:
+                    size = int(self.broker.getcash() * 0.95 / price / 100) * 100
+                    if size >= 100:
+                        self.buy(size=size)
+
+        # 死叉卖出
+        elif fast_now < slow_now and fast_prev >= slow_prev:
+            if self.position:
+                self.close()
+
+        self.prev_fast = fast_now
+
+
+# ============== 策略2: 突破20日均线 ==============
+class BreakoutStrategy(bt.Strategy):
+    params = dict(period=20)
+
+    @staticmethod
+    def indicators(p):
+        return [("sma", {"period": p["period"]})]
+
+    def __init__(self):
+        self.sma = indicator(self, "sma", self.params.period)
+
+    def next(self):
+        if len(self.data) < self.params.period + 5:
+            return
+
+        close = self.data.close[0]
+        prev_close = self.data.close[-1]
+        sma_now = self.sma[0]
+        sma_prev = self.sma[-1]
+
+        # 突破买入
+        if prev_close <= sma_prev and close > sma_now:
+            if not self.position:
+                size = int(self.broker.getcash() * 0.95 / close / 100) * 100
+                if size >= 100:
+                    self.buy(size=size)
+
+        # 跌破卖出
+        elif prev_close >= sma_prev and close < sma_now:
+            if self.position:
+                self.close()
@@ -2,6 +2,8 @@
 
 import backtrader as bt
 
+from strategy.feeds import indicator
+
 
 class DualMAWithMartingale(bt.Strategy):
     """
@@ -21,12 +23,14 @@ class DualMAWithMartingale(bt.Strategy):
         stop_loss=-0.15,    # 止损线 -15%
     )
     
+    @staticmethod
+    def indicators(p):
+        return [("sma", {"period": p["fast_period"]}), ("sma", {"period": p["slow_period"]})]
+    
     def __init__(self):
         # 双均线
-        self.fast_ma = bt.indicators.SimpleMovingAverage(
-            self.data.close, period=self.params.fast_period)
-        self.slow_ma = bt.indicators.SimpleMovingAverage(
-            self.data.close, period=self.params.slow_period)
+        self.fast_ma = indicator(self, "sma", self.params.fast_period)
+        self.slow_ma = indicator(self, "sma", self.params.slow_period)
         
         # 马丁策略参数
         self.avg_price = 0      # 平均持仓成本
@@ -131,11 +135,13 @@ class DualMAWithPyramid(bt.Strategy):
         stop_loss=-0.10,     # 止损10%
     )
     
+    @staticmethod
+    def indicators(p):
+        return [("sma", {"period": p["fast_period"]}), ("sma", {"period": p["slow_period"]})]
+    
     def __init__(self):
-        self.fast_ma = bt.indicators.SimpleMovingAverage(
-            self.data.close, period=self.params.fast_period)
-        self.slow_ma = bt.indicators.SimpleMovingAverage(
-            self.data.close, period=self.params.slow_period)
+        self.fast_ma = indicator(self, "sma", self.params.fast_period)
+        self.slow_ma = indicator(self, "sma", self.params.slow_period)
         
         self.avg_price = 0
         self.add_count = 0
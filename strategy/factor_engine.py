@@ -0,0 +1,147 @@
+"""
+截面因子引擎：在 日期 × 股票 的因子面板上批量执行 FundamentalSelector 的选股规则
+
+因子面板为 {因子名: (日期 × 股票) 数组}，缺失为 NaN。筛选、百分位打分和取前 N 名
+对所有调仓日一次完成：百分位排名按行排序后对并列值取平均名次（与 pandas
+rank(pct=True) 相同），前 N 名用 np.partition 部分选择，不做整行排序。
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from data.fundamentals import FACTOR_COLUMNS
+from data.trade_calendar import period_codes
+from strategy.selectors import FundamentalSelector
+
+
+def pivot_factors(df: pd.DataFrame, columns=FACTOR_COLUMNS):
+    """
+    长表 (date, symbol, 因子...) -> (dates, symbols, {因子名: 日期 × 股票 数组})
+
+    同一日期同一股票出现多行时保留最后一行。
+    """
+    dates, rows = np.unique(df["date"].to_numpy(dtype="datetime64[D]"), return_inverse=True)
+    symbols, cols = np.unique(df["symbol"].astype(str).to_numpy(), return_inverse=True)
+    factors = {}
+    for col in columns:
+        values = np.full((len(dates), len(symbols)), np.nan)
+        values[rows, cols] = df[col].to_numpy(dtype=float)
+        factors[col] = values
+    return dates, list(symbols), factors
+
+
+def rebalance_rows(dates, freq: str = "M") -> np.ndarray:
+    """每周/月/季/年最后一个日期所在的行号"""
+    codes = period_codes(dates, freq)
+    return np.flatnonzero(np.r_[codes[1:] != codes[:-1], True])
+
+
+def percentile_rank(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    逐行百分位排名，只在 valid 的位置之间比较；并列取平均名次，结果为 名次 / 有效个数
+
+    与对每一行的有效值调用 pandas rank(pct=True) 逐位一致，无效位置为 NaN。
+    """
+    n_cols = values.shape[1]
+    key = np.where(valid, values, np.inf)
+    order = np.argsort(key, axis=1, kind="stable")
+    ordered = np.take_along_axis(key, order, axis=1)
+
+    # 每个位置所在并列段的起止下标
+    pos = np.arange(n_cols)
+    first = np.ones(ordered.shape, dtype=bool)
+    first[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    last = np.ones(ordered.shape, dtype=bool)
+    last[:, :-1] = first[:, 1:]
+    start = np.maximum.accumulate(np.where(first, pos, 0), axis=1)
+    end = np.minimum.accumulate(np.where(last, pos, n_cols - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    ranks = np.empty(ordered.shape)
+    np.put_along_axis(ranks, order, (start + end + 2) / 2, axis=1)
+    count = valid.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(valid, ranks / count, np.nan)
+
+
+def select_top(score: np.ndarray, n: int) -> np.ndarray:
+    """
+    每行得分最高的 n 列（降序），不足 n 个有效值时用 -1 补齐
+
+    先用 np.partition 求每行第 n 大的分数，再取高于它的全部列和等于它的前几列，
+    同分按列顺序取舍，结果确定。
+    """
+    rows, n_cols = score.shape
+    n = min(n, n_cols)
+    if n == 0:
+        return np.empty((rows, 0), dtype=np.int64)
+    key = np.where(np.isnan(score), -np.inf, score)
+    kth = -np.partition(-key, n - 1, axis=1)[:, n - 1:n]
+    above = key > kth
+    tied = (key == kth) & (np.cumsum(key == kth, axis=1) <= n - above.sum(axis=1, keepdims=True))
+    chosen = (above | tied) & ~np.isnan(score)
+
+    # 每行选中的列按 (-得分, 列号) 排序
+    r, c = np.nonzero(chosen)
+    order = np.lexsort((c, -key[r, c], r))
+    r, c = r[order], c[order]
+    slot = np.arange(len(r)) - np.searchsorted(r, r)
+    out = np.full((rows, n), -1, dtype=np.int64)
+    out[r, slot] = c
+    return out
+
+
+class FactorEngine:
+    """按 FundamentalSelector 的阈值对历史因子面板批量选股"""
+
+    def __init__(self, selector: FundamentalSelector | None = None):
+        self.selector = selector or FundamentalSelector()
+
+    def mask(self, factors: dict[str, np.ndarray]) -> np.ndarray:
+        """通过全部筛选条件的位置（NaN 视为不通过）"""
+        s = self.selector
+        pe = factors["pe"]
+        with np.errstate(invalid="ignore"):
+            return (
+                (factors["market_cap"] >= s.min_market_cap)
+                & (pe > 0)
+                & (pe <= s.max_pe)
+                & (factors["dividend_yield"] >= s.min_dividend_yield)
+                & (factors["roe"] >= s.min_roe)
+            )
+
+    def score(self, factors: dict[str, np.ndarray], mask: np.ndarray | None = None) -> np.ndarray:
+        """候选股的综合得分：1/PE、股息率、ROE 三个截面百分位之和；非候选为 NaN"""
+        if mask is None:
+            mask = self.mask(factors)
+        with np.errstate(divide="ignore"):
+            inv_pe = 1 / factors["pe"]
+        return (
+            percentile_rank(inv_pe, mask)
+            + percentile_rank(factors["dividend_yield"], mask)
+            + percentile_rank(factors["roe"], mask)
+        )
+
+    def screen(self, dates, symbols, factors: dict[str, np.ndarray], top_n: int = 20,
+               freq: str | None = "M") -> pd.DataFrame:
+        """
+        历史选股：每个调仓日的前 top_n 名
+
+        freq 为调仓频率（W/M/Q/Y，取每期最后一个日期），None 表示面板中的每个日期。
+        返回长表 date, rank, symbol, score（rank 从 1 开始）。
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        rows = np.arange(len(dates)) if freq is None else rebalance_rows(dates, freq)
+        sliced = {name: np.asarray(factors[name], dtype=float)[rows] for name in FACTOR_COLUMNS}
+        score = self.score(sliced)
+        picks = select_top(score, top_n)
+
+        r, slot = np.nonzero(picks >= 0)
+        cols = picks[r, slot]
+        return pd.DataFrame({
+            "date": pd.DatetimeIndex(dates[rows][r]),
+            "rank": slot + 1,
+            "symbol": np.asarray(symbols, dtype=object)[cols],
+            "score": score[r, cols],
+        })
@@ -0,0 +1,148 @@
+"""
+backtrader 数据源：把预先计算好的指标数组随行情一起送入 Cerebro
+
+指标数组挂在数据源的 precomputed 属性上（{列名: 数组}），不作为额外的数据列逐根加载。
+策略通过 indicator() 取指标：数据源带有对应数组时直接使用，否则回退到 backtrader 内置指标，
+两种方式数值逐位一致，因此同一个策略类在有无指标缓存时结果相同。
+"""
+
+from __future__ import annotations
+
+from array import array
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+from backtrader.utils import date2num
+
+from strategy.indicator_cache import default_cache, line_name
+
+FEED_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# 没有预计算数组时使用的 backtrader 指标
+FALLBACK_INDICATORS = {
+    "sma": bt.indicators.SimpleMovingAverage,
+    "ema": bt.indicators.ExponentialMovingAverage,
+}
+
+
+class Precomputed(bt.Indicator):
+    """
+    把预计算的指标数组包装成指标
+
+    只复制数值，不做计算；最小周期设为 period，使策略 next() 的调用时机
+    与使用对应的 backtrader 指标时相同。
+    """
+
+    lines = ("value",)
+    params = (("values", None), ("period", 1))
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def next(self):
+        self.lines.value[0] = self.p.values[len(self.data) - 1]
+
+    def once(self, start, end):
+        self.lines.value.array[start:end] = array("d", self.p.values[start:end].tolist())
+
+
+def make_feed(df: pd.DataFrame, precomputed: dict[str, np.ndarray] | None = None, **kwargs):
+    """
+    由日线 DataFrame（含 date 列）构造 backtrader 数据源
+
+    precomputed 为 {列名: 与 df 等长的数组}，如 IndicatorCache.lines() 的返回值。
+    """
+    frame = df[FEED_COLUMNS].copy()
+    frame.index = pd.DatetimeIndex(df["date"])
+    feed = bt.feeds.PandasData(dataname=frame, **kwargs)
+    feed.precomputed = dict(precomputed or {})
+    return feed
+
+
+def strategy_params(strategy_class, params: dict | None = None) -> dict:
+    """策略参数：类默认值与传入参数合并"""
+    return {**dict(strategy_class.params._getitems()), **(params or {})}
+
+
+def required_indicators(strategy_class, params: dict | None = None) -> list:
+    """策略需要的指标 [(指标名, 参数字典)]，由策略类的 indicators(params) 声明"""
+    declare = getattr(strategy_class, "indicators", None)
+    return list(declare(strategy_params(strategy_class, params))) if declare else []
+
+
+def cached_feed(symbol: str, df: pd.DataFrame, strategy_classes, params=None, cache=None, **kwargs):
+    """
+    为一组策略构造共享的数据源：所有策略需要的指标从缓存中取出（各只计算一次）
+
+    strategy_classes 为策略类序列，params 为与之对应的参数字典序列（可省略）。
+    """
+    return make_feed(df, shared_indicators(symbol, df, strategy_classes, params, cache), **kwargs)
+
+
+def shared_indicators(symbol: str, df: pd.DataFrame, strategy_classes, params=None, cache=None) -> dict:
+    """一组策略需要的所有指标 {列名: 数组}，各只计算一次（cached_feed 的指标部分）"""
+    cache = cache or default_cache()
+    params = params or [None] * len(strategy_classes)
+    specs = {}
+    for strategy_class, strategy_param in zip(strategy_classes, params):
+        for name, indicator_params in required_indicators(strategy_class, strategy_param):
+            specs[line_name(name, **indicator_params)] = (name, indicator_params)
+    return cache.lines(symbol, df, specs.values())
+
+
+class SharedBars:
+    """
+    一只股票的日线与指标，只准备一次，供多个 Cerebro 各自的数据源共享
+
+    各列在构造时转为列表（日期转为 backtrader 的数值时间），feed() 返回的
+    SharedBarsData 只做列表取值，加载结果与 make_feed 的 PandasData 相同。
+    """
+
+    def __init__(self, df: pd.DataFrame, precomputed: dict[str, np.ndarray] | None = None):
+        self.datetimes = [date2num(ts.to_pydatetime()) for ts in pd.DatetimeIndex(df["date"])]
+        self.columns = {col: df[col].tolist() for col in FEED_COLUMNS}
+        self.precomputed = dict(precomputed or {})
+
+    def __len__(self):
+        return len(self.datetimes)
+
+    def feed(self):
+        return SharedBarsData(bars=self)
+
+
+class SharedBarsData(bt.feed.DataBase):
+    """从 SharedBars 加载的数据源；precomputed 与 make_feed 的数据源相同"""
+
+    params = (("bars", None),)
+
+    def __init__(self):
+        self.precomputed = self.p.bars.precomputed
+
+    def start(self):
+        super().start()
+        self._idx = -1
+        self._columns = [(getattr(self.lines, col), values) for col, values in self.p.bars.columns.items()]
+        self._datetimes = self.p.bars.datetimes
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= len(self._datetimes):
+            return False
+        for line, values in self._columns:
+            line[0] = values[self._idx]
+        self.lines.datetime[0] = self._datetimes[self._idx]
+        return True
+
+
+def indicator(strategy, name: str, period: int, data=None):
+    """
+    在策略 __init__ 中取指标线
+
+    数据源带有预计算数组（如 sma_20）时直接使用，否则创建 backtrader 指标。
+    """
+    data = data if data is not None else strategy.data
+    values = getattr(data, "precomputed", {}).get(line_name(name, period=period))
+    if values is not None:
+        return Precomputed(data, values=values, period=period)
+    return FALLBACK_INDICATORS[name](data.close, period=period)
@@ -0,0 +1,135 @@
+"""
+指标缓存：同一只股票、同一份数据上的同一指标只计算一次
+
+键为 (股票, 数据版本, 指标名, 参数)。数据版本是行情内容的哈希，数据更新（新K线、
+复权因子变化）后版本随之改变，旧结果自然失效。内存中按 LRU 淘汰，可选磁盘层
+（每个指标一个 .npy 文件）在进程之间、多次运行之间复用。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from strategy import kernels
+
+
+def _sma(df: pd.DataFrame, period: int) -> np.ndarray:
+    return kernels.sma(df["close"].to_numpy(dtype=float), period)
+
+
+def _ema(df: pd.DataFrame, period: int) -> np.ndarray:
+    return kernels.ema(df["close"].to_numpy(dtype=float), period)
+
+
+def _atr(df: pd.DataFrame, period: int) -> np.ndarray:
+    return kernels.atr(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), period)
+
+
+# 指标名 -> 计算函数 (df, **params) -> 与 df 等长的数组
+INDICATORS = {
+    "sma": _sma,
+    "ema": _ema,
+    "atr": _atr,
+}
+
+
+def data_version(df: pd.DataFrame) -> str:
+    """行情数据的内容哈希（日期与开高低收）"""
+    digest = hashlib.blake2b(digest_size=8)
+    for col in ("date", "open", "high", "low", "close"):
+        if col in df.columns:
+            digest.update(np.ascontiguousarray(df[col].to_numpy()).tobytes())
+    return digest.hexdigest()
+
+
+def line_name(name: str, **params) -> str:
+    """指标在数据源中的列名，如 sma_5、ema_144"""
+    return "_".join([name, *(str(value) for _, value in sorted(params.items()))])
+
+
+class IndicatorCache:
+    """
+    指标数组的 LRU 缓存
+
+    max_items: 内存中最多保留的指标数组个数
+    disk_dir: 磁盘层目录（<disk_dir>/<symbol>/<version>/<line>.npy），为空时只用内存
+    """
+
+    def __init__(self, max_items: int = 1024, disk_dir: str | Path | None = None):
+        self.max_items = max_items
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, symbol: str, version: str, name: str, params: dict) -> Path:
+        return self.disk_dir / symbol / version / f"{line_name(name, **params)}.npy"
+
+    def get(self, symbol: str, df: pd.DataFrame, name: str, version: str | None = None,
+            **params) -> np.ndarray:
+        """取指标数组，未缓存时计算并缓存（返回的数组只读，不要原地修改）"""
+        version = version or data_version(df)
+        key = (symbol, version, name, tuple(sorted(params.items())))
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        path = self._disk_path(symbol, version, name, params) if self.disk_dir else None
+        if path is not None and path.exists():
+            values = np.load(path)
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            values = INDICATORS[name](df, **params)
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                np.save(path, values)
+            with self._lock:
+                self.misses += 1
+        values.flags.writeable = False
+
+        with self._lock:
+            self._items[key] = values
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return values
+
+    def lines(self, symbol: str, df: pd.DataFrame, specs) -> dict[str, np.ndarray]:
+        """
+        批量取指标，specs 为 (指标名, 参数字典) 序列
+
+        返回 {列名: 数组}，可直接交给 strategy.feeds.make_feed 作为额外数据列。
+        """
+        version = data_version(df)
+        return {line_name(name, **params): self.get(symbol, df, name, version, **params)
+                for name, params in specs}
+
+    def stats(self) -> dict:
+        return {"items": len(self._items), "hits": self.hits,
+                "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_default_cache = None
+
+
+def default_cache() -> IndicatorCache:
+    """进程内共享的指标缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IndicatorCache()
+    return _default_cache
@@ -0,0 +1,198 @@
+"""
+指标计算内核：直接在 NumPy 数组上计算，不做逐元素的 pandas 访问
+
+所有函数同时接受一维（单只股票）和二维（日期 × 股票）数组：
+- rolling_mean/atr/supertrend 与 SupertrendCalculator 原先基于 pandas 的实现逐位一致，
+  滚动均值沿用 pandas 的 rolling().mean()（Cython 实现，带 Kahan 补偿求和）
+- sma/ema 与 backtrader 的 SimpleMovingAverage / ExponentialMovingAverage 逐位一致
+- sma_sign 只比较两条 SMA 的大小（结果与比较 sma() 相同），用前缀和近似、仅在差值接近 0 时精确重算
+- 递推部分逐日循环、对所有股票一次向量化；单只股票时用 Python 浮点数循环
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+    """与 pd.Series(values).rolling(period).mean() 逐位一致的滚动均值（二维时按列计算）"""
+    if np.ndim(values) == 1:
+        return pd.Series(values).rolling(period).mean().to_numpy()
+    return pd.DataFrame(values).rolling(period).mean().to_numpy()
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """backtrader SMA：每个窗口 math.fsum(窗口) / period（精确求和），前 period-1 个为 NaN"""
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 2:
+        return np.stack([sma(values[:, j], period) for j in range(values.shape[1])], axis=1)
+    out = np.full(len(values), np.nan)
+    src = values.tolist()
+    out[period - 1:] = [math.fsum(src[i - period + 1:i + 1]) / period for i in range(period - 1, len(src))]
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    backtrader EMA：以前 period 个值的 SMA 为种子，之后 prev * (1 - alpha) + x * alpha
+
+    alpha = 2 / (1 + period)；前 period-1 个为 NaN。
+    """
+    values = np.asarray(values, dtype=float)
+    alpha = 2.0 / (1.0 + period)
+    alpha1 = 1.0 - alpha
+    out = np.full(values.shape, np.nan)
+    if len(values) < period:
+        return out
+    if values.ndim == 2:
+        prev = np.array([math.fsum(values[:period, j].tolist()) / period for j in range(values.shape[1])])
+        out[period - 1] = prev
+        for i in range(period, len(values)):
+            out[i] = prev = prev * alpha1 + values[i] * alpha
+        return out
+    src = values.tolist()
+    prev = math.fsum(src[:period]) / period
+    line = [prev]
+    for x in src[period:]:
+        prev = prev * alpha1 + x * alpha
+        line.append(prev)
+    out[period - 1:] = line
+    return out
+
+
+def _sma_estimate(values: np.ndarray, period: int) -> tuple[np.ndarray, np.ndarray]:
+    """前缀和算出的 SMA 近似值及其与 sma() 结果之差的上界；period 为 0 时即原值（误差为 0）"""
+    if period == 0:
+        return values, np.zeros(values.shape)
+    zero = np.zeros((1,) + values.shape[1:])
+    csum = np.concatenate([zero, np.cumsum(values, axis=0)])
+    cabs = np.concatenate([zero, np.cumsum(np.abs(values), axis=0)])
+    approx = np.full(values.shape, np.nan)
+    approx[period - 1:] = (csum[period:] - csum[:-period]) / period
+    # 顺序累加 n 个数的误差不超过 n·u·Σ|x|，再加上相减、相除和 fsum 结果本身的舍入，放宽 4 倍
+    u = np.finfo(float).eps / 2
+    bound = np.full(values.shape, np.inf)
+    bound[period - 1:] = 4 * (len(values) * u * cabs[period:] / period + 2 * u * np.abs(approx[period - 1:]))
+    return approx, bound
+
+
+def sma_sign(values: np.ndarray, left: int, right: int) -> np.ndarray:
+    """
+    sign(SMA_left - SMA_right)，与比较 sma() 结果得到的大小关系逐位一致；period 为 0 表示原值
+
+    先用前缀和近似计算（整段数组向量化），只有差值落在误差范围内的位置才用 fsum 精确重算，
+    因此比先算两条精确 SMA 快得多。任一侧为 NaN 时结果为 NaN。
+    """
+    values = np.asarray(values, dtype=float)
+    a, ea = _sma_estimate(values, left)
+    b, eb = _sma_estimate(values, right)
+    diff = a - b
+    sign = np.sign(diff)
+    with np.errstate(invalid="ignore"):
+        unsure = np.abs(diff) <= ea + eb
+    if unsure.any():
+        flat = values.reshape(len(values), -1)
+        sign_flat = sign.reshape(len(values), -1)
+        for i, j in zip(*np.nonzero(unsure.reshape(len(values), -1))):
+            exact = [math.fsum(flat[i - p + 1:i + 1, j].tolist()) / p if p else flat[i, j] for p in (left, right)]
+            sign_flat[i, j] = np.sign(exact[0] - exact[1])
+    return sign
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """真实波幅 max(H-L, |H-C前|, |L-C前|)，第一根K线为 H-L；保留输入的浮点精度"""
+    prev_close = np.empty_like(close)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
+    hl = high - low
+    hc = np.abs(high - prev_close)
+    lc = np.abs(low - prev_close)
+    # fmax 忽略 NaN，与 DataFrame.max(axis=1) 的 skipna 行为一致
+    return np.fmax(np.fmax(hl, hc), lc)
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 10) -> np.ndarray:
+    """平均真实波幅（真实波幅的简单移动平均）"""
+    return rolling_mean(true_range(high, low, close), period)
+
+
+def supertrend(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+               period: int = 10, multiplier: float = 3.0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Supertrend，返回 (atr, supertrend, trend)
+
+    trend 为 1（多头）/ -1（空头）；第一根K线的 supertrend 为 NaN。
+    """
+    high, low, close = np.asarray(high), np.asarray(low), np.asarray(close)
+    atr_ = atr(high, low, close, period)
+    mid = (high + low) / 2
+    upper = mid + multiplier * atr_
+    lower = mid - multiplier * atr_
+    if close.ndim == 1:
+        trend, line = _supertrend_1d(close, upper, lower)
+    else:
+        trend, line = _supertrend_2d(close, upper, lower)
+    return atr_, line, trend
+
+
+def _supertrend_1d(close, upper, lower):
+    n = len(close)
+    close, upper, lower = close.tolist(), upper.tolist(), lower.tolist()
+    trend = [1] * n
+    line = [np.nan] * n
+    for i in range(1, n):
+        if close[i] > upper[i - 1]:
+            trend[i] = 1
+        elif close[i] < lower[i - 1]:
+            trend[i] = -1
+        else:
+            trend[i] = trend[i - 1]
+            # 与内置 max/min 相同：只有前值严格更优时才替换（NaN 不替换）
+            if trend[i] == 1:
+                if lower[i - 1] > lower[i]:
+                    lower[i] = lower[i - 1]
+            elif upper[i - 1] < upper[i]:
+                upper[i] = upper[i - 1]
+        line[i] = lower[i] if trend[i] == 1 else upper[i]
+    return np.array(trend, dtype=int), np.array(line, dtype=float)
+
+
+def _supertrend_2d(close, upper, lower):
+    """逐日递推，每一步对所有股票向量化（数组按行连续存放）"""
+    close = np.ascontiguousarray(close)
+    upper = np.array(upper, order="C")
+    lower = np.array(lower, order="C")
+    trend = np.ones(close.shape, dtype=int)
+    line = np.full(close.shape, np.nan)
+    for i in range(1, len(close)):
+        bull = close[i] > upper[i - 1]
+        bear = ~bull & (close[i] < lower[i - 1])
+        hold = ~(bull | bear)
+        t = np.where(bull, 1, np.where(bear, -1, trend[i - 1]))
+        np.copyto(lower[i], lower[i - 1], where=hold & (t == 1) & (lower[i - 1] > lower[i]))
+        np.copyto(upper[i], upper[i - 1], where=hold & (t == -1) & (upper[i - 1] < upper[i]))
+        trend[i] = t
+        line[i] = np.where(t == 1, lower[i], upper[i])
+    return trend, line
+
+
+def compact_columns(valid: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    二维数组按列压缩：每列有效的行移到最前面（保持原有顺序）
+
+    返回 (order, counts)：arr 按 np.take_along_axis(arr, order, axis=0) 取出后，
+    第 j 列的前 counts[j] 行就是该股票去掉停牌/未上市日期后的序列。
+    """
+    order = np.argsort(~valid, axis=0, kind="stable")
+    return order, valid.sum(axis=0)
+
+
+def scatter_columns(compact: np.ndarray, order: np.ndarray, counts: np.ndarray, fill=np.nan) -> np.ndarray:
+    """compact_columns 的逆操作：把压缩后的结果放回原来的行，其余位置填 fill"""
+    out = np.full(compact.shape, fill, dtype=np.result_type(compact.dtype, fill))
+    rows = np.arange(len(compact))[:, None] < counts[None, :]
+    np.put_along_axis(out, order, np.where(rows, compact, fill), axis=0)
+    return out
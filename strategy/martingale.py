@@ -31,7 +31,7 @@ class MartingaleStrategy(bt.Strategy):
         self.total_trades = 0    # 交易次数
         
     def notify_order(self, order):
-        if order.status in [order.Submitted, order.Acpected]:
+        if order.status in [order.Submitted, order.Accepted]:
             return
         if order.status in [order.Completed]:
             if order.isbuy():
@@ -0,0 +1,280 @@
+"""
+全市场趋势翻转扫描：Supertrend 转向、SMA 金叉/死叉、维加斯隧道突破
+
+批量模式（FlipScanner）直接在面板上向量化计算，输出某个日期或日期区间内所有股票的翻转；
+增量模式（IncrementalScanner）为每只股票保存增量指标状态，收盘后只处理最新一根K线。
+
+翻转的判定与对应的策略相同：
+- supertrend：趋势由空转多（+1）/ 由多转空（-1），同 SupertrendStrategy
+- sma_cross：快线上穿（+1）/ 下穿（-1）慢线，同 DualMAStrategy
+- vegas：收盘价上穿隧道上沿且 EMA 576 高于 3 根K线前（+1）/ 跌破隧道下沿（-1），同 VegasTunnelStrategy
+
+每只股票按去掉停牌/未上市日期后的序列计算（与 panel.frame(symbol) 一致）。
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from strategy import kernels
+from strategy.streaming import StreamingEMA, StreamingSMA, StreamingSupertrend, restore
+
+SIGNALS = ("supertrend", "sma_cross", "vegas")
+
+SCAN_COLUMNS = ["date", "symbol", "signal", "direction", "close"]
+
+
+@dataclass
+class ScanConfig:
+    """扫描参数。"""
+
+    atr_period: int = 10
+    multiplier: float = 3.0
+    fast: int = 5
+    slow: int = 20
+    ema_fast: int = 144
+    ema_mid: int = 169
+    ema_slow: int = 576
+
+
+def _cross(a, b, a_prev, b_prev):
+    """上穿为 1，下穿为 -1，否则为 0（含 NaN 的比较为 False）"""
+    up = (a > b) & (a_prev <= b_prev)
+    down = (a < b) & (a_prev >= b_prev)
+    return np.where(up, 1, np.where(down, -1, 0))
+
+
+def _shift(values: np.ndarray, n: int = 1) -> np.ndarray:
+    """沿时间轴后移 n 行，前 n 行为 NaN"""
+    out = np.full(values.shape, np.nan)
+    out[n:] = values[:-n]
+    return out
+
+
+def _window(values: np.ndarray, base: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """压缩后的二维数组中，第 j 列取 [base[j], counts[j]) 行，上对齐，不足处为 NaN"""
+    length = int((counts - base).max(initial=0))
+    rows = base[None, :] + np.arange(length)[:, None]
+    inside = rows < counts[None, :]
+    picked = np.take_along_axis(values, np.minimum(rows, len(values) - 1), axis=0)
+    return np.where(inside, picked, np.nan)
+
+
+def supertrend_flips(trend: np.ndarray) -> np.ndarray:
+    """Supertrend 翻转方向（+1 / -1 / 0）"""
+    flips = np.zeros(trend.shape, dtype=int)
+    flips[1:] = np.where(trend[1:] != trend[:-1], trend[1:], 0)
+    return flips
+
+
+def vegas_flips(close: np.ndarray, ema_f: np.ndarray, ema_m: np.ndarray, ema_s: np.ndarray) -> np.ndarray:
+    """维加斯隧道突破方向（+1 / -1 / 0）"""
+    with np.errstate(invalid="ignore"):
+        top, bottom = np.maximum(ema_f, ema_m), np.minimum(ema_f, ema_m)
+        prev_close = _shift(close)
+        up = (prev_close <= _shift(top)) & (close > top) & (ema_s > _shift(ema_s, 3))
+        down = (prev_close >= _shift(bottom)) & (close < bottom)
+    return np.where(up, 1, np.where(down, -1, 0))
+
+
+class FlipScanner:
+    """在面板上批量扫描翻转"""
+
+    def __init__(self, panel, config: ScanConfig | None = None):
+        self.panel = panel
+        self.config = config or ScanConfig()
+
+    def scan(self, start=None, end=None, signals=SIGNALS) -> pd.DataFrame:
+        """
+        [start, end] 内发生的全部翻转，返回 date, symbol, signal, direction, close
+
+        指标从面板第一天开始计算（EMA、Supertrend 依赖全部历史），start 只限定输出区间；
+        SMA 只需要 start 之前 slow 根K线，按列截取窗口计算。
+        """
+        cfg = self.config
+        rows = self.panel.date_slice(None, end)
+        dates = self.panel.dates[rows]
+        lo = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), "D"))) if start is not None else 0
+
+        valid = ~np.isnan(np.asarray(self.panel["close"][rows]))
+        order, counts = kernels.compact_columns(valid)
+        high, low, close = (np.take_along_axis(np.asarray(self.panel[field][rows]), order, axis=0)
+                            for field in ("high", "low", "close"))
+        # 压缩后第 j 列从第 first[j] 行起落在输出区间内
+        first = valid[:lo].sum(axis=0)
+        in_range = ((np.arange(len(order))[:, None] >= first[None, :])
+                    & (np.arange(len(order))[:, None] < counts[None, :]))
+
+        flips = {}
+        if "supertrend" in signals:
+            _, _, trend = kernels.supertrend(high, low, close, cfg.atr_period, cfg.multiplier)
+            flips["supertrend"] = supertrend_flips(trend)
+        if "sma_cross" in signals:
+            base = np.maximum(first - cfg.slow, 0)
+            window = _window(close, base, counts)
+            fast, slow = kernels.sma(window, cfg.fast), kernels.sma(window, cfg.slow)
+            with np.errstate(invalid="ignore"):
+                crossed = _cross(fast, slow, _shift(fast), _shift(slow))
+            flips["sma_cross"] = np.zeros(order.shape, dtype=int)
+            k, j = np.nonzero(crossed)
+            flips["sma_cross"][base[j] + k, j] = crossed[k, j]
+        if "vegas" in signals:
+            flips["vegas"] = vegas_flips(close, kernels.ema(close, cfg.ema_fast),
+                                         kernels.ema(close, cfg.ema_mid), kernels.ema(close, cfg.ema_slow))
+
+        symbols = np.asarray(self.panel.symbols, dtype=object)
+        frames = []
+        for name, direction in flips.items():
+            k, j = np.nonzero((direction != 0) & in_range)
+            frames.append(pd.DataFrame({
+                "date": pd.DatetimeIndex(dates[order[k, j]]),
+                "symbol": symbols[j],
+                "signal": name,
+                "direction": direction[k, j],
+                "close": close[k, j],
+            }))
+        if not frames:
+            return pd.DataFrame(columns=SCAN_COLUMNS)
+        return pd.concat(frames, ignore_index=True).sort_values(
+            ["date", "symbol", "signal"], kind="stable", ignore_index=True)
+
+
+class SymbolState:
+    """单只股票的增量扫描状态：各指标的增量状态与判定翻转所需的前值"""
+
+    def __init__(self, config: ScanConfig):
+        self.supertrend = StreamingSupertrend(config.atr_period, config.multiplier)
+        self.fast = StreamingSMA(config.fast)
+        self.slow = StreamingSMA(config.slow)
+        self.ema_fast = StreamingEMA(config.ema_fast)
+        self.ema_mid = StreamingEMA(config.ema_mid)
+        self.ema_slow = StreamingEMA(config.ema_slow)
+        self.count = 0
+        self.trend = 1
+        self.prev = {"fast": np.nan, "slow": np.nan, "close": np.nan, "top": np.nan, "bottom": np.nan}
+        # 最近 3 根K线的 EMA 576（判断长期趋势）
+        self.ema_slow_history = [np.nan] * 3
+
+    def update(self, high: float, low: float, close: float) -> dict[str, int]:
+        """喂入一根K线，返回该K线上发生的翻转 {信号名: 方向}"""
+        flips = {}
+        _, _, trend = self.supertrend.update(high, low, close)
+        if self.count > 0 and trend != self.trend:
+            flips["supertrend"] = trend
+        self.trend = trend
+
+        prev = self.prev
+        fast, slow = self.fast.update(close), self.slow.update(close)
+        cross = int(_cross(fast, slow, prev["fast"], prev["slow"]))
+        if cross:
+            flips["sma_cross"] = cross
+
+        ema_f, ema_m = self.ema_fast.update(close), self.ema_mid.update(close)
+        ema_s = self.ema_slow.update(close)
+        top, bottom = max(ema_f, ema_m), min(ema_f, ema_m)
+        if ema_f != ema_f or ema_m != ema_m:
+            top = bottom = np.nan
+        if prev["close"] <= prev["top"] and close > top and ema_s > self.ema_slow_history[0]:
+            flips["vegas"] = 1
+        elif prev["close"] >= prev["bottom"] and close < bottom:
+            flips["vegas"] = -1
+
+        self.prev = {"fast": fast, "slow": slow, "close": close, "top": top, "bottom": bottom}
+        self.ema_slow_history = self.ema_slow_history[1:] + [ema_s]
+        self.count += 1
+        return flips
+
+    def to_dict(self) -> dict:
+        indicators = ("supertrend", "fast", "slow", "ema_fast", "ema_mid", "ema_slow")
+        state = {name: getattr(self, name).to_dict() for name in indicators}
+        state.update(count=self.count, trend=self.trend, prev=self.prev, ema_slow_history=self.ema_slow_history)
+        return state
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "SymbolState":
+        obj = cls.__new__(cls)
+        for name in ("supertrend", "fast", "slow", "ema_fast", "ema_mid", "ema_slow"):
+            setattr(obj, name, restore(state[name]))
+        obj.count = state["count"]
+        obj.trend = state["trend"]
+        obj.prev = dict(state["prev"])
+        obj.ema_slow_history = list(state["ema_slow_history"])
+        return obj
+
+
+class IncrementalScanner:
+    """
+    增量扫描：每只股票一份 SymbolState，收盘后只处理最新一根K线
+
+    第一次用 from_panel() 从面板历史建立状态（逐根重放，较慢，只需一次），
+    之后 save()/load() 持久化为 JSON，每天调用 update() 即可。
+    """
+
+    def __init__(self, config: ScanConfig | None = None, states: dict[str, SymbolState] | None = None,
+                 last_date=None):
+        self.config = config or ScanConfig()
+        self.states = states or {}
+        self.last_date = last_date
+
+    @classmethod
+    def from_panel(cls, panel, config: ScanConfig | None = None, end=None, symbols=None) -> "IncrementalScanner":
+        """用面板中截至 end 的历史建立每只股票的状态"""
+        scanner = cls(config)
+        rows = panel.date_slice(None, end)
+        for symbol in symbols or panel.symbols:
+            j = panel.column(symbol)
+            close = np.asarray(panel["close"][rows, j])
+            valid = ~np.isnan(close)
+            if not valid.any():
+                continue
+            state = SymbolState(scanner.config)
+            for h, l, c in zip(np.asarray(panel["high"][rows, j])[valid].tolist(),
+                               np.asarray(panel["low"][rows, j])[valid].tolist(), close[valid].tolist()):
+                state.update(h, l, c)
+            scanner.states[symbol] = state
+        scanner.last_date = str(panel.dates[rows][-1]) if len(panel.dates[rows]) else None
+        return scanner
+
+    def update(self, date, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        喂入某个交易日的K线（symbol, high, low, close 列，停牌股票不出现），返回当天的翻转
+
+        新出现的股票从这一根K线开始建立状态。
+        """
+        day = str(np.datetime64(pd.Timestamp(date), "D"))
+        if self.last_date is not None and day <= self.last_date:
+            raise ValueError(f"{day} 不晚于已处理的最后一个交易日 {self.last_date}")
+        records = []
+        for symbol, high, low, close in zip(bars["symbol"].astype(str), bars["high"].tolist(),
+                                            bars["low"].tolist(), bars["close"].tolist()):
+            if close != close:
+                continue
+            state = self.states.get(symbol)
+            if state is None:
+                state = self.states[symbol] = SymbolState(self.config)
+            for name, direction in state.update(high, low, close).items():
+                records.append((symbol, name, direction, close))
+        self.last_date = day
+        out = pd.DataFrame(records, columns=SCAN_COLUMNS[1:])
+        out.insert(0, "date", pd.Timestamp(day))
+        return out.sort_values(["symbol", "signal"], kind="stable", ignore_index=True)
+
+    def save(self, path: str | Path):
+        state = {
+            "config": asdict(self.config),
+            "last_date": self.last_date,
+            "states": {symbol: s.to_dict() for symbol, s in self.states.items()},
+        }
+        Path(path).write_text(json.dumps(state), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path) -> "IncrementalScanner":
+        state = json.loads(Path(path).read_text(encoding="utf-8"))
+        config = ScanConfig(**state["config"])
+        states = {symbol: SymbolState.from_dict(s) for symbol, s in state["states"].items()}
+        return cls(config, states, state["last_date"])
@@ -0,0 +1,233 @@
+"""
+预计算信号：先对整段数组向量化算出买卖信号，回测时 next() 只读取信号列
+
+SignalPandasData 在标准行情之外带 entry/exit 两列（以及可选的指标列），
+SignalStrategy 读取这两列下单。DualMAStrategy、BreakoutStrategy 的信号在这里有
+逐根等价的向量化版本（均线取自指标缓存，与 backtrader SMA 逐位一致），回测结果相同。
+"""
+
+from __future__ import annotations
+
+import backtrader as bt
+import numpy as np
+from backtrader.utils import date2num
+import pandas as pd
+
+from strategy import kernels
+from strategy.dual_ma import BreakoutStrategy, DualMAStrategy
+from strategy.feeds import FEED_COLUMNS, strategy_params
+from strategy.indicator_cache import default_cache
+
+
+def cross_up(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a 上穿 b：a[i] > b[i] 且 a[i-1] <= b[i-1]（含 NaN 的比较为 False）"""
+    out = np.zeros(len(a), dtype=bool)
+    out[1:] = (a[1:] > b[1:]) & (a[:-1] <= b[:-1])
+    return out
+
+
+def cross_down(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a 下穿 b：a[i] < b[i] 且 a[i-1] >= b[i-1]"""
+    out = np.zeros(len(a), dtype=bool)
+    out[1:] = (a[1:] < b[1:]) & (a[:-1] >= b[:-1])
+    return out
+
+
+def crossings(sign: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    由 sign(a - b)（如 kernels.sma_sign 的结果）得到 (上穿, 下穿)，沿第一维（时间）判断
+
+    与 cross_up / cross_down 对 a、b 直接比较的结果相同，一维、二维数组均可。
+    """
+    prev = np.full(sign.shape, np.nan)
+    prev[1:] = sign[:-1]
+    with np.errstate(invalid="ignore"):
+        return (sign > 0) & (prev <= 0), (sign < 0) & (prev >= 0)
+
+
+def _warm(n: int, bars: int, ndim: int = 1) -> np.ndarray:
+    """策略 next() 中 len(self.data) >= bars 的位置（二维时为一列，可按列广播）"""
+    return (np.arange(n) >= bars - 1).reshape((n,) + (1,) * (ndim - 1))
+
+
+def dual_ma_arrays(close: np.ndarray, fast: int = 5, slow: int = 20) -> tuple[np.ndarray, np.ndarray]:
+    """dual_ma_signals 的数组版本：只返回 (entry, exit)，均线大小关系由 kernels.sma_sign 判断"""
+    close = np.asarray(close, dtype=float)
+    up, down = crossings(kernels.sma_sign(close, fast, slow))
+    warm = _warm(len(close), slow + 5, close.ndim)
+    return up & warm & (close > 0), down & warm
+
+
+def breakout_arrays(close: np.ndarray, period: int = 20) -> tuple[np.ndarray, np.ndarray]:
+    """breakout_signals 的数组版本：只返回 (entry, exit)"""
+    close = np.asarray(close, dtype=float)
+    up, down = crossings(kernels.sma_sign(close, 0, period))
+    warm = _warm(len(close), period + 5, close.ndim)
+    entry = up & warm
+    return entry, down & warm & ~entry
+
+
+def dual_ma_signals(df: pd.DataFrame, fast: int = 5, slow: int = 20, symbol: str | None = None,
+                    cache=None) -> dict[str, np.ndarray]:
+    """双均线金叉买、死叉卖（对应 DualMAStrategy）"""
+    close = df["close"].to_numpy(dtype=float)
+    if symbol is not None:
+        cache = cache or default_cache()
+        fast_ma = cache.get(symbol, df, "sma", period=fast)
+        slow_ma = cache.get(symbol, df, "sma", period=slow)
+    else:
+        fast_ma, slow_ma = kernels.sma(close, fast), kernels.sma(close, slow)
+    warm = _warm(len(close), slow + 5)
+    return {
+        "entry": cross_up(fast_ma, slow_ma) & warm & (close > 0),
+        "exit": cross_down(fast_ma, slow_ma) & warm,
+        f"sma_{fast}": fast_ma,
+        f"sma_{slow}": slow_ma,
+    }
+
+
+def breakout_signals(df: pd.DataFrame, period: int = 20, symbol: str | None = None,
+                     cache=None) -> dict[str, np.ndarray]:
+    """收盘价上穿均线买、下穿卖（对应 BreakoutStrategy）"""
+    close = df["close"].to_numpy(dtype=float)
+    if symbol is not None:
+        sma = (cache or default_cache()).get(symbol, df, "sma", period=period)
+    else:
+        sma = kernels.sma(close, period)
+    warm = _warm(len(close), period + 5)
+    entry = cross_up(close, sma) & warm
+    return {
+        "entry": entry,
+        "exit": cross_down(close, sma) & warm & ~entry,
+        f"sma_{period}": sma,
+    }
+
+
+def supertrend_signals(df: pd.DataFrame, period: int = 10, multiplier: float = 3.0,
+                       **_) -> dict[str, np.ndarray]:
+    """Supertrend 由空转多买、由多转空卖"""
+    _, line, trend = kernels.supertrend(df["high"].to_numpy(), df["low"].to_numpy(),
+                                        df["close"].to_numpy(), period, multiplier)
+    prev = np.r_[trend[:1], trend[:-1]]
+    warm = _warm(len(trend), period)
+    return {
+        "entry": (trend > 0) & (prev < 0) & warm,
+        "exit": (trend < 0) & (prev > 0) & warm,
+        "supertrend": line,
+    }
+
+
+SIGNALS = {
+    "dual_ma": dual_ma_signals,
+    "breakout": breakout_signals,
+    "supertrend": supertrend_signals,
+}
+
+# 信号名 -> 数组版本 (close, **params) -> (entry, exit)，供向量化回测使用
+SIGNAL_ARRAYS = {
+    "dual_ma": dual_ma_arrays,
+    "breakout": breakout_arrays,
+}
+
+# 可被 SignalStrategy 等价替换的策略 -> (信号名, 策略参数 -> 信号参数)
+SIGNAL_EQUIVALENTS = {
+    DualMAStrategy: ("dual_ma", lambda p: {"fast": p["fast"], "slow": p["slow"]}),
+    BreakoutStrategy: ("breakout", lambda p: {"period": p["period"]}),
+}
+
+
+def precompute_signals(df: pd.DataFrame, name: str, symbol: str | None = None, cache=None,
+                       **params) -> pd.DataFrame:
+    """在日线上追加 entry/exit（0/1）与信号用到的指标列"""
+    columns = SIGNALS[name](df, symbol=symbol, cache=cache, **params)
+    out = df.copy()
+    for col, values in columns.items():
+        out[col] = values.astype(float)
+    return out
+
+
+class SignalPandasData(bt.feeds.PandasData):
+    """
+    带 entry/exit 信号列的数据源，用 with_lines() 追加指标列
+
+    PandasData 每根K线对每一列做一次 DataFrame.iloc 取值，列越多越慢；
+    这里在 start() 时把各列一次性转为列表，_load() 只做列表取值，加载结果相同。
+    """
+
+    lines = ("entry", "exit")
+    params = (("entry", "entry"), ("exit", "exit"))
+
+    _subclasses = {}
+
+    def start(self):
+        super().start()
+        frame = self.p.dataname
+        self._columns = [
+            (getattr(self.lines, field), frame.iloc[:, col].tolist())
+            for field, col in self._colmapping.items()
+            if field != "datetime" and col is not None
+        ]
+        coldtime = self._colmapping["datetime"]
+        stamps = frame.index if coldtime is None else frame.iloc[:, coldtime]
+        self._datetimes = [date2num(ts.to_pydatetime()) for ts in stamps]
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= len(self._datetimes):
+            return False
+        for line, values in self._columns:
+            line[0] = values[self._idx]
+        self.lines.datetime[0] = self._datetimes[self._idx]
+        return True
+
+    @classmethod
+    def with_lines(cls, *names):
+        """带额外数据列（如 sma_5）的子类，按列名组合缓存"""
+        names = tuple(names)
+        if names not in cls._subclasses:
+            cls._subclasses[names] = type(cls.__name__, (cls,), {
+                "lines": names, "params": tuple((name, name) for name in names)})
+        return cls._subclasses[names]
+
+
+def signal_feed(df: pd.DataFrame, name: str, symbol: str | None = None, cache=None,
+                indicator_lines: bool = False, **params):
+    """预计算信号并构造 SignalPandasData；indicator_lines=True 时指标列也作为数据列送入"""
+    data = precompute_signals(df, name, symbol, cache, **params)
+    extra = [col for col in data.columns if col not in df.columns and col not in ("entry", "exit")]
+    keep = FEED_COLUMNS + ["entry", "exit"] + (extra if indicator_lines else [])
+    frame = data[keep]
+    frame.index = pd.DatetimeIndex(df["date"])
+    feed_class = SignalPandasData.with_lines(*extra) if indicator_lines and extra else SignalPandasData
+    return feed_class(dataname=frame)
+
+
+class SignalStrategy(bt.Strategy):
+    """
+    按预计算信号交易：entry 时用 95% 现金买入（整手），exit 时清仓
+
+    与 DualMAStrategy / BreakoutStrategy 的下单规则相同。
+    """
+
+    def next(self):
+        if self.data.entry[0]:
+            if not self.position:
+                price = self.data.close[0]
+                size = int(self.broker.getcash() * 0.95 / price / 100) * 100
+                if size >= 100:
+                    self.buy(size=size)
+        elif self.data.exit[0]:
+            if self.position:
+                self.close()
+
+
+def as_signal_strategy(strategy_class, params: dict | None = None):
+    """
+    策略 -> 等价的 (SignalStrategy, 信号名, 信号参数)；没有等价信号版本时返回 None
+
+    批量回测可以据此把逐根判断的策略换成只读信号列的版本。
+    """
+    if strategy_class not in SIGNAL_EQUIVALENTS:
+        return None
+    name, convert = SIGNAL_EQUIVALENTS[strategy_class]
+    return SignalStrategy, name, convert(strategy_params(strategy_class, params))
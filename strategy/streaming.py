@@ -0,0 +1,300 @@
+"""
+增量指标：每根新K线 O(1) 更新，状态可序列化
+
+用于收盘后更新信号：每只股票保存一份指标状态（to_dict 后存为 JSON），
+次日只需把当天一根K线喂给 update()，无需重放全部历史。
+
+数值与批量实现逐位一致：
+- StreamingSMA / StreamingEMA 对应 backtrader 的 SMA / EMA（strategy.kernels.sma / ema）
+- StreamingATR / StreamingSupertrend 对应 SupertrendCalculator（pandas rolling().mean() 的
+  Kahan 补偿求和，状态需从序列第一根K线开始累积，可用 extend() 一次性建立）
+
+每次更新只修改固定大小的环形缓冲区和标量状态，不创建数组。
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+NAN = float("nan")
+
+
+def _grow(partials: list, x: float):
+    """Shewchuk 精确求和：把 x 加入互不重叠的部分和列表（与 math.fsum 的算法相同）"""
+    i = 0
+    for y in partials:
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            partials[i] = lo
+            i += 1
+        x = hi
+    del partials[i:]
+    partials.append(x)
+
+
+class StreamingIndicator:
+    """增量指标基类：序列化为只含基本类型的字典"""
+
+    __slots__ = ()
+
+    def to_dict(self) -> dict:
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state["type"] = type(self).__name__
+        return state
+
+    def extend(self, *columns):
+        """依次喂入整段历史（如 high, low, close 数组），用于第一次建立状态；返回自身"""
+        for row in zip(*(np.asarray(col).tolist() for col in columns)):
+            self.update(*row)
+        return self
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        obj = cls.__new__(cls)
+        for name in cls.__slots__:
+            value = state[name]
+            setattr(obj, name, list(value) if isinstance(value, list) else value)
+        return obj
+
+
+class StreamingSMA(StreamingIndicator):
+    """
+    简单移动平均，与 backtrader SMA 逐位一致
+
+    backtrader 每根K线计算 math.fsum(窗口) / period（精确求和后舍入一次）。
+    这里用 Shewchuk 部分和精确维护窗口和：加入新值、减去移出的值都无舍入误差，
+    因此结果与对整个窗口调用 fsum 相同，而每根K线只需常数时间。
+    """
+
+    __slots__ = ("period", "ring", "pos", "count", "partials", "nonfinite")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.ring = [0.0] * period
+        self.pos = 0
+        self.count = 0
+        self.partials = []
+        # 窗口内 NaN/inf 的个数；不为 0 时退回对窗口直接 fsum
+        self.nonfinite = 0
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        old = self.ring[self.pos]
+        if self.count >= self.period:
+            if math.isfinite(old):
+                _grow(self.partials, -old)
+            else:
+                self.nonfinite -= 1
+        if math.isfinite(x):
+            _grow(self.partials, x)
+        else:
+            self.nonfinite += 1
+        self.ring[self.pos] = x
+        self.pos = (self.pos + 1) % self.period
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.count < self.period:
+            return NAN
+        if self.nonfinite:
+            return math.fsum(self.ring) / self.period
+        return math.fsum(self.partials) / self.period
+
+
+class StreamingEMA(StreamingIndicator):
+    """
+    指数移动平均，与 backtrader EMA 逐位一致
+
+    前 period 根K线的 SMA 作为种子，之后 prev * (1 - alpha) + x * alpha，alpha = 2 / (1 + period)。
+    """
+
+    __slots__ = ("period", "alpha", "alpha1", "count", "seed", "prev")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (1.0 + period)
+        self.alpha1 = 1.0 - self.alpha
+        self.count = 0
+        self.seed = []
+        self.prev = NAN
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        self.count += 1
+        if self.count < self.period:
+            self.seed.append(x)
+        elif self.count == self.period:
+            self.seed.append(x)
+            self.prev = math.fsum(self.seed) / self.period
+            self.seed = []
+        else:
+            self.prev = self.prev * self.alpha1 + x * self.alpha
+        return self.prev
+
+    @property
+    def value(self) -> float:
+        return self.prev
+
+
+class StreamingATR(StreamingIndicator):
+    """
+    平均真实波幅，与 SupertrendCalculator / kernels.atr 逐位一致
+
+    真实波幅的滚动均值按 pandas rolling().mean() 的算法累积：加入与移出分别做 Kahan 补偿，
+    并保留 pandas 对全同值窗口、全正/全负窗口的修正。
+    """
+
+    __slots__ = ("period", "ring", "pos", "count", "prev_close",
+                 "nobs", "sum_x", "neg_ct", "comp_add", "comp_remove", "same_count", "prev_value")
+
+    def __init__(self, period: int = 10):
+        self.period = period
+        self.ring = [NAN] * period
+        self.pos = 0
+        self.count = 0
+        self.prev_close = NAN
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_count = 0
+        self.prev_value = NAN
+
+    def true_range(self, high: float, low: float, close: float) -> float:
+        hl = high - low
+        hc = abs(high - self.prev_close)
+        lc = abs(low - self.prev_close)
+        # 与 np.fmax 相同：忽略 NaN
+        tr = hl
+        for x in (hc, lc):
+            if x > tr or tr != tr:
+                tr = x
+        return tr
+
+    def _add(self, val: float):
+        if val == val:
+            self.nobs += 1
+            y = val - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct += 1
+            if val == self.prev_value:
+                self.same_count += 1
+            else:
+                self.same_count = 1
+            self.prev_value = val
+
+    def _remove(self, val: float):
+        if val == val:
+            self.nobs -= 1
+            y = -val - self.comp_remove
+            t = self.sum_x + y
+            self.comp_remove = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct -= 1
+
+    def update(self, high: float, low: float, close: float) -> float:
+        high, low, close = float(high), float(low), float(close)
+        tr = self.true_range(high, low, close)
+        self.prev_close = close
+
+        if self.count == 0 or self.period == 1:
+            # pandas 在第一个窗口（以及窗口长度为 1 时的每个窗口）重新初始化累加状态
+            self.nobs = self.neg_ct = self.same_count = 0
+            self.sum_x = self.comp_add = self.comp_remove = 0.0
+            self.prev_value = tr
+        elif self.count >= self.period:
+            self._remove(self.ring[self.pos])
+        self._add(tr)
+
+        self.ring[self.pos] = tr
+        self.pos = (self.pos + 1) % self.period
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.nobs < self.period or self.nobs == 0:
+            return NAN
+        result = self.sum_x / self.nobs
+        if self.same_count >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+
+class StreamingSupertrend(StreamingIndicator):
+    """
+    Supertrend 上下轨与趋势，与 SupertrendCalculator.calculate 逐位一致
+
+    update() 返回 (atr, supertrend, trend)。
+    """
+
+    __slots__ = ("multiplier", "atr", "count", "upper", "lower", "trend", "line")
+
+    def __init__(self, period: int = 10, multiplier: float = 3.0):
+        self.multiplier = multiplier
+        self.atr = StreamingATR(period)
+        self.count = 0
+        self.upper = NAN
+        self.lower = NAN
+        self.trend = 1
+        self.line = NAN
+
+    def update(self, high: float, low: float, close: float) -> tuple[float, float, int]:
+        high, low, close = float(high), float(low), float(close)
+        atr = self.atr.update(high, low, close)
+        mid = (high + low) / 2
+        upper = mid + self.multiplier * atr
+        lower = mid - self.multiplier * atr
+
+        if self.count > 0:
+            if close > self.upper:
+                self.trend = 1
+            elif close < self.lower:
+                self.trend = -1
+            elif self.trend == 1:
+                if self.lower > lower:
+                    lower = self.lower
+            elif self.upper < upper:
+                upper = self.upper
+            self.line = lower if self.trend == 1 else upper
+
+        self.upper, self.lower = upper, lower
+        self.count += 1
+        return atr, self.line, self.trend
+
+    def to_dict(self) -> dict:
+        state = super().to_dict()
+        state["atr"] = self.atr.to_dict()
+        return state
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        obj = super().from_dict(state)
+        obj.atr = StreamingATR.from_dict(state["atr"])
+        return obj
+
+
+
+# 类名 -> 类，用于从 to_dict() 的结果恢复
+STREAMING_TYPES = {cls.__name__: cls for cls in (StreamingSMA, StreamingEMA, StreamingATR, StreamingSupertrend)}
+
+
+def restore(state: dict) -> StreamingIndicator:
+    """由 to_dict() 的结果恢复任意增量指标"""
+    return STREAMING_TYPES[state["type"]].from_dict(state)
@@ -0,0 +1,40 @@
+"""Supertrend 择时策略"""
+
+from strategy.base import StrategyBase, Supertrend
+
+
+class SupertrendStrategy(StrategyBase):
+    """
+    Supertrend 趋势跟随
+
+    买入：趋势由空转多（收盘价上穿上轨）
+    卖出：趋势由多转空（收盘价跌破下轨）
+    仓位：以 Supertrend 线为止损位，单笔风险为资金的 risk_per_trade，
+          最多用 95% 现金，按 100 股一手取整
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.st = Supertrend(self.data, period=self.params.atr_period,
+                             multiplier=self.params.atr_multiplier)
+
+    def next(self):
+        if self.order:
+            return
+
+        trend_now = self.st.trend[0]
+        trend_prev = self.st.trend[-1]
+
+        if trend_now > 0 and trend_prev < 0:
+            if not self.position:
+                close = self.data.close[0]
+                cash = self.broker.getcash()
+                risk = close - self.st.supertrend[0]
+                size = int(cash * self.params.risk_per_trade / risk) if risk > 0 else 0
+                size = min(size, int(cash * 0.95 / close)) // 100 * 100
+                if size >= 100:
+                    self.order = self.buy(size=size)
+
+        elif trend_now < 0 and trend_prev > 0:
+            if self.position:
+                self.order = self.close()
@@ -0,0 +1,70 @@
+"""维加斯隧道策略"""
+
+import backtrader as bt
+
+from strategy.feeds import indicator
+
+
+# ============== 维加斯隧道策略 ==============
+class VegasTunnelStrategy(bt.Strategy):
+    """
+    维加斯隧道交易法
+    - EMA 144 和 EMA 169：短期/中期趋势分水岭
+    - EMA 576：长期趋势确认
+
+    三条 EMA 由数据源预计算（见 strategy.feeds.cached_feed），没有时退回 backtrader EMA。
+    next() 从 EMA 576 有值的第一根K线开始调用，不再固定等待 600 根。
+    """
+    params = dict(
+        ema_fast=144,
+        ema_mid=169,
+        ema_slow=576,
+        stop_loss=0.05,
+        start_bar=0,    # 从第几根K线开始交易，之前的K线只用于预热指标
+    )
+
+    @staticmethod
+    def indicators(p):
+        return [("ema", {"period": p["ema_fast"]}), ("ema", {"period": p["ema_mid"]}),
+                ("ema", {"period": p["ema_slow"]})]
+
+    def __init__(self):
+        self.order = None
+        self.entry_price = 0
+        self.ema_f = indicator(self, "ema", self.params.ema_fast)
+        self.ema_m = indicator(self, "ema", self.params.ema_mid)
+        self.ema_s = indicator(self, "ema", self.params.ema_slow)
+
+    def next(self):
+        if len(self) <= self.params.start_bar:
+            return
+
+        close_now = self.data.close[0]
+        close_prev = self.data.close[-1]
+
+        # 隧道上下界
+        ema_f, ema_m = self.ema_f[0], self.ema_m[0]
+        ema_f_prev, ema_m_prev = self.ema_f[-1], self.ema_m[-1]
+        tunnel_top = max(ema_f, ema_m)
+        tunnel_bottom = min(ema_f, ema_m)
+        tunnel_top_prev = max(ema_f_prev, ema_m_prev)
+        tunnel_bottom_prev = min(ema_f_prev, ema_m_prev)
+
+        # 判断
+        if not self.position:
+            # 买入：价格上穿隧道 且 长期趋势向上（EMA 576 高于3根K线前；前3根无前值时为 NaN，不成立）
+            above_tunnel = close_prev <= tunnel_top_prev and close_now > tunnel_top
+            long_trend_up = self.ema_s[0] > self.ema_s[-3]
+
+            if above_tunnel and long_trend_up:
+                size = int(self.broker.getcash() * 0.95 / close_now / 100) * 100
+                if size >= 100:
+                    self.buy(size=size)
+                    self.entry_price = close_now
+
+        else:
+            below_tunnel = close_prev >= tunnel_bottom_prev and close_now < tunnel_bottom
+            stop_triggered = close_now < self.entry_price * (1 - self.params.stop_loss)
+
+            if below_tunnel or stop_triggered:
+                self.close()